@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+End-to-end control latency benchmark
+Runs a headless DriverStation against in-process simulated robots and
+measures joystick sample -> packet on wire -> robot parse latency,
+send jitter, discovery handshake time and CPU cost per robot.
+"""
+
+import argparse
+import json
+import selectors
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+from demo_mode import SIM_PORT_BASE, SimulatedRobot
+from driver_station import DriverStation
+from packets import CONTROLLER_PACKET_SIZE, PROTOCOL_V2, ROBOT_NAME_SIZE, V2_HEADER
+from load_generator import summarize
+
+# Sample sequence numbers ride in leftX/leftY, so they wrap at 16 bits
+SEQ_SPACE = 1 << 16
+
+class BenchRobot:
+    """A SimulatedRobot with plain sockets, serviced by the receiver thread"""
+
+    def __init__(self, index: int, port_base: int, protocol_v2: bool = True):
+        self.index = index
+        self.robot = SimulatedRobot(f"Bench{index:03d}", discovery_port=port_base + index,
+                                    open_sockets=False, verbose=False, estop_acks=False,
+                                    protocol_v2=protocol_v2)
+        self.discovery_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.discovery_socket.bind(('127.0.0.1', self.robot.discovery_port))
+        self.command_socket = None
+        self.arrivals: List[float] = []
+
+    def handshake(self, target, timeout: float = 2.0) -> Optional[float]:
+        """Send DISCOVER and wait for PORT; returns the round trip in seconds"""
+        self.discovery_socket.settimeout(timeout)
+        start = time.perf_counter()
+        self.discovery_socket.sendto(self.robot.discovery_message(), target)
+        try:
+            while True:
+                data, _ = self.discovery_socket.recvfrom(1024)
+                if self.robot.handle_packet(data) == "port":
+                    break
+        except socket.timeout:
+            return None
+        elapsed = time.perf_counter() - start
+
+        self.command_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.command_socket.bind(('127.0.0.1', self.robot.assigned_port))
+        self.command_socket.setblocking(False)
+        return elapsed
+
+    def close(self):
+        self.discovery_socket.close()
+        if self.command_socket is not None:
+            self.command_socket.close()
+
+class LatencyBenchmark:
+    """Wires a headless station, an input thread and a receiver thread together"""
+
+    def __init__(self, robots: int, transmit_rate: float, input_rate: float,
+                 port_base: int = SIM_PORT_BASE, fleet_encoder: bool = False,
+                 connected_sockets: bool = False, protocol: int = PROTOCOL_V2):
+        self.transmit_rate = transmit_rate
+        self.input_rate = input_rate
+        # Deadband 0 so every fresh sample goes out on the next transmit tick
+        self.station = DriverStation(transmit_rate=transmit_rate, deadband=0,
+                                     headless=True, discovery_port=0,
+                                     fleet_encoder=fleet_encoder,
+                                     connected_sockets=connected_sockets,
+                                     protocol=protocol)
+        self.robots = [BenchRobot(i, port_base, protocol >= PROTOCOL_V2) for i in range(robots)]
+        self.robot_index: Dict[str, int] = {bench.robot.robot_id: bench.index for bench in self.robots}
+        self.sample_times = [[0.0] * SEQ_SPACE for _ in range(robots)]
+        self.sequences = [0] * robots
+
+        self.measuring = False
+        self.running = True
+        self.wire_latencies: List[float] = []
+        self.parse_latencies: List[float] = []
+        self.thread_cpu: Dict[str, float] = {}
+
+    def _on_sent(self, robot_id: str, packet: bytearray):
+        now = time.perf_counter()
+        if not self.measuring:
+            return
+        index = self.robot_index.get(robot_id)
+        if index is not None:
+            axes = ROBOT_NAME_SIZE if len(packet) == CONTROLLER_PACKET_SIZE else V2_HEADER.size
+            seq = packet[axes] | (packet[axes + 1] << 8)
+            self.wire_latencies.append(now - self.sample_times[index][seq])
+
+    def _input_loop(self):
+        """Produce a fresh, sequence-numbered sample on every controller"""
+        cpu_start = time.thread_time()
+        period = 1.0 / self.input_rate
+        next_deadline = time.perf_counter()
+        while self.running:
+            for index in range(len(self.robots)):
+                seq = (self.sequences[index] + 1) % SEQ_SPACE
+                self.sequences[index] = seq
+                self.station.set_virtual_controller(index, seq & 0xFF, seq >> 8, 127, 127)
+                self.sample_times[index][seq] = time.perf_counter()
+            self.station._publish_controller_snapshots()
+
+            next_deadline += period
+            delay = next_deadline - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_deadline = time.perf_counter()
+        self.thread_cpu["input"] = time.thread_time() - cpu_start
+
+    def _receive_loop(self):
+        """Parse controller packets exactly as the demo robot does"""
+        cpu_start = time.thread_time()
+        selector = selectors.DefaultSelector()
+        for bench in self.robots:
+            selector.register(bench.command_socket, selectors.EVENT_READ, bench)
+        while self.running:
+            for key, _ in selector.select(0.05):
+                bench = key.data
+                while True:
+                    try:
+                        data = bench.command_socket.recv(1024)
+                    except (BlockingIOError, InterruptedError):
+                        break
+                    now = time.perf_counter()
+                    if bench.robot.handle_packet(data) != "controller" or not self.measuring:
+                        continue
+                    axes = bench.robot.axes
+                    seq = axes[0] | (axes[1] << 8)
+                    self.parse_latencies.append(now - self.sample_times[bench.index][seq])
+                    bench.arrivals.append(now)
+        selector.close()
+        self.thread_cpu["receive"] = time.thread_time() - cpu_start
+
+    def run(self, duration: float, warmup: float) -> dict:
+        station = self.station
+        target = ('127.0.0.1', station.udp_socket.getsockname()[1])
+        threads = []
+        try:
+            handshakes = []
+            for bench in self.robots:
+                elapsed = bench.handshake(target)
+                if elapsed is None:
+                    raise RuntimeError(f"{bench.robot.robot_id} got no PORT reply")
+                handshakes.append(elapsed)
+
+            for bench in self.robots:
+                station.set_virtual_controller(bench.index, 0, 0, 127, 127)
+                station.pair(bench.robot.robot_id, bench.index)
+            station.set_game_status("teleop")
+            station.send_observer = self._on_sent
+
+            threads = [threading.Thread(target=self._input_loop, daemon=True),
+                       threading.Thread(target=self._receive_loop, daemon=True)]
+            for thread in threads:
+                thread.start()
+            station.transmit_scheduler.start()
+
+            time.sleep(warmup)
+            scheduler = station.transmit_scheduler
+            missed_start = scheduler.missed_ticks
+            cpu_start = time.process_time()
+            self.measuring = True
+            time.sleep(duration)
+            self.measuring = False
+            cpu_total = time.process_time() - cpu_start
+            missed = scheduler.missed_ticks - missed_start
+        finally:
+            self.running = False
+            for thread in threads:
+                thread.join(timeout=2.0)
+            station.send_observer = None
+            station.shutdown()
+            for bench in self.robots:
+                bench.close()
+
+        # Per-thread CPU covers warmup too; scale it to the measured window
+        scale = duration / (duration + warmup)
+        helper_cpu = sum(self.thread_cpu.values()) * scale
+        station_cpu = max(0.0, cpu_total - helper_cpu)
+
+        period = 1.0 / self.transmit_rate
+        jitter = [
+            abs((later - earlier) - period)
+            for bench in self.robots
+            for earlier, later in zip(bench.arrivals, bench.arrivals[1:])
+        ]
+        received = sum(len(bench.arrivals) for bench in self.robots)
+
+        return {
+            "config": {
+                "robots": len(self.robots),
+                "transmit_rate_hz": self.transmit_rate,
+                "input_rate_hz": self.input_rate,
+                "fleet_encoder": self.station.fleet_packets is not None,
+                "connected_sockets": self.station.socket_pool is not None,
+                "protocol": self.station.protocol,
+                "duration_s": duration,
+                "warmup_s": warmup,
+                "python": sys.version.split()[0],
+                "platform": sys.platform,
+                "commit": _git_commit(),
+            },
+            "discovery_handshake_s": summarize(handshakes),
+            "sample_to_wire_s": summarize(self.wire_latencies),
+            "sample_to_parse_s": summarize(self.parse_latencies),
+            "send_jitter_s": summarize(jitter),
+            "packets_received": received,
+            "packets_per_robot_hz": received / len(self.robots) / duration,
+            "transmit_missed_ticks": missed,
+            "transmit_max_lateness_s": scheduler.max_lateness,
+            "cpu": {
+                "station_s": station_cpu,
+                "station_pct": 100.0 * station_cpu / duration,
+                "per_robot_pct": 100.0 * station_cpu / duration / len(self.robots),
+            },
+        }
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# (label, result key, stat) rows shown in reports and comparisons
+REPORT_ROWS = [
+    ("Handshake p50", "discovery_handshake_s", "p50"),
+    ("Sample->wire p50", "sample_to_wire_s", "p50"),
+    ("Sample->wire p99", "sample_to_wire_s", "p99"),
+    ("Sample->parse p50", "sample_to_parse_s", "p50"),
+    ("Sample->parse p99", "sample_to_parse_s", "p99"),
+    ("Sample->parse p99.9", "sample_to_parse_s", "p99.9"),
+    ("Send jitter p99", "send_jitter_s", "p99"),
+]
+
+def print_report(result: dict, baseline: Optional[dict] = None):
+    config = result["config"]
+    print(f"{config['robots']} robots, transmit {config['transmit_rate_hz']:g} Hz, "
+          f"input {config['input_rate_hz']:g} Hz, {config['duration_s']:g} s "
+          f"(commit {config['commit'] or 'unknown'})")
+    for label, key, stat in REPORT_ROWS:
+        value = result[key][stat]
+        line = f"  {label:<22} {'-' if value is None else f'{value * 1000:8.3f} ms'}"
+        if baseline is not None:
+            old = baseline.get(key, {}).get(stat)
+            if old and value is not None:
+                line += f"   ({(value - old) / old:+.1%} vs {old * 1000:.3f} ms)"
+        print(line)
+    print(f"  Packets/s per robot    {result['packets_per_robot_hz']:8.1f}")
+    print(f"  Missed transmit ticks  {result['transmit_missed_ticks']:8d}")
+    cpu = result["cpu"]
+    line = f"  Station CPU            {cpu['station_pct']:8.1f} %  ({cpu['per_robot_pct']:.2f} % per robot)"
+    if baseline is not None and baseline.get("cpu", {}).get("per_robot_pct"):
+        old = baseline["cpu"]["per_robot_pct"]
+        line += f"   ({(cpu['per_robot_pct'] - old) / old:+.1%})"
+    print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end driver station latency benchmark")
+    parser.add_argument("--robots", type=int, default=8, help="Number of simulated robots")
+    parser.add_argument("--rate", type=float, default=100.0, help="Transmit rate in Hz")
+    parser.add_argument("--input-rate", type=float, default=500.0,
+                        help="Controller sample rate in Hz (keep above --rate)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=1.0, help="Seconds discarded at start")
+    parser.add_argument("--port-base", type=int, default=SIM_PORT_BASE,
+                        help="Robot i listens for PORT replies on port-base + i")
+    parser.add_argument("--fleet-encoder", action="store_true",
+                        help="Use the NumPy fleet encoder in the driver station")
+    parser.add_argument("--connected-sockets", action="store_true",
+                        help="Send on per-robot connect()ed sockets")
+    parser.add_argument("--protocol", type=int, choices=(1, PROTOCOL_V2), default=PROTOCOL_V2,
+                        help="Highest controller protocol the station offers")
+    parser.add_argument("--json", default=None, help="Write results to this file")
+    parser.add_argument("--compare", default=None, help="Baseline results JSON to compare against")
+    args = parser.parse_args()
+
+    benchmark = LatencyBenchmark(args.robots, args.rate, args.input_rate, port_base=args.port_base,
+                                 fleet_encoder=args.fleet_encoder,
+                                 connected_sockets=args.connected_sockets,
+                                 protocol=args.protocol)
+    result = benchmark.run(args.duration, args.warmup)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Results written to {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for the controller packet encode/decode hot path
+Reports ns/packet, peak transient bytes/packet and blocks left allocated
+per packet for each encoder and decoder variant.
+"""
+
+import argparse
+import json
+import struct
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from fleet import HAVE_NUMPY, FleetPackets
+from packets import (CONTROLLER_DATA, CONTROLLER_PACKET_SIZE, NEUTRAL_AXIS, ROBOT_NAME_SIZE,
+                     ControllerPacket, ControllerPacketV2, controller_values, decode_v2,
+                     encode_robot_name)
+
+# Whole packet in one Struct: name prefix, 6 axes, 2 button bytes
+PACKET = struct.Struct(f'{ROBOT_NAME_SIZE}s8B')
+
+def legacy_encode(robot_id: str, controller) -> bytes:
+    """The original per-send encoder: fresh bytes for every field, then concatenate"""
+    robot_name_bytes = robot_id.encode('utf-8')[:15].ljust(16, b'\x00')
+    axes = struct.pack('BBBBBB',
+        controller.left_x,
+        controller.left_y,
+        controller.right_x,
+        controller.right_y,
+        127,
+        127
+    )
+    button_byte_0 = (
+        (1 if controller.cross else 0) |
+        ((1 if controller.circle else 0) << 1) |
+        ((1 if controller.square else 0) << 2) |
+        ((1 if controller.triangle else 0) << 3)
+    )
+    buttons = struct.pack('BB', button_byte_0, 0)
+    return robot_name_bytes + axes + buttons
+
+class StructEncoder:
+    """One precompiled Struct per packet, name bytes encoded once"""
+
+    def __init__(self, robot_id: str):
+        self.name = encode_robot_name(robot_id)
+
+    def encode(self, values: Tuple[int, ...]) -> bytes:
+        return PACKET.pack(self.name, *values)
+
+class FleetEncoder:
+    """Packs every robot's packet into one contiguous buffer with a single call
+
+    Packet i is buffer[i * 24:(i + 1) * 24]; views are handed out once and
+    stay valid, so sendto() can take them without copying.
+    """
+
+    def __init__(self, robot_ids: Sequence[str]):
+        count = len(robot_ids)
+        self.fleet = struct.Struct(f'{ROBOT_NAME_SIZE}s8B' * count)
+        self.buffer = bytearray(self.fleet.size)
+        view = memoryview(self.buffer)
+        self.packets = [view[i * CONTROLLER_PACKET_SIZE:(i + 1) * CONTROLLER_PACKET_SIZE]
+                        for i in range(count)]
+        # Flat argument list: name, 8 values, name, 8 values, ...
+        self._args: List = []
+        for robot_id in robot_ids:
+            self._args.append(encode_robot_name(robot_id))
+            self._args.extend((NEUTRAL_AXIS,) * 6 + (0, 0))
+
+    def encode(self, fleet_values: Sequence[Tuple[int, ...]]):
+        args = self._args
+        for i, values in enumerate(fleet_values):
+            start = i * 9 + 1
+            args[start:start + 8] = values
+        self.fleet.pack_into(self.buffer, 0, *args)
+
+def legacy_decode(data) -> Tuple[list, list]:
+    """What SimulatedRobot.handle_packet does with controller data"""
+    return list(data[16:22]), list(data[22:24])
+
+def struct_decode(data) -> Tuple[int, ...]:
+    return CONTROLLER_DATA.unpack_from(data, ROBOT_NAME_SIZE)
+
+class _Controller:
+    """Just the ControllerState fields the encoders read"""
+
+    def __init__(self, seed: int):
+        self.left_x = seed % 256
+        self.left_y = (seed * 7) % 256
+        self.right_x = (seed * 13) % 256
+        self.right_y = (seed * 29) % 256
+        # The original encoder always sent neutral for the extra axes
+        self.left_trigger = self.right_trigger = NEUTRAL_AXIS
+        self.cross = seed % 2 == 0
+        self.circle = seed % 3 == 0
+        self.square = False
+        self.triangle = seed % 5 == 0
+
+def build_cases(robots: int) -> Dict[str, Tuple[Callable[[], object], int]]:
+    """name -> (operation, packets per call); each operation encodes or decodes live data"""
+    robot_ids = [f"robot{i}" for i in range(robots)]
+    controllers = [_Controller(i) for i in range(robots)]
+    fleet_values = [controller_values(c) for c in controllers]
+    robot_id, controller, values = robot_ids[0], controllers[0], fleet_values[0]
+
+    struct_encoder = StructEncoder(robot_id)
+    template = ControllerPacket(robot_id)
+    template_v2 = ControllerPacketV2(robot_id, 0)
+    fleet = FleetEncoder(robot_ids)
+    wire = bytes(legacy_encode(robot_id, controller))
+
+    cases = {
+        "encode/legacy": (lambda: legacy_encode(robot_id, controller), 1),
+        "encode/struct": (lambda: struct_encoder.encode(values), 1),
+        "encode/pack_into": (lambda: template.update(values), 1),
+        "encode/values+pack_into": (lambda: template.update(controller_values(controller)), 1),
+        "encode/v2 pack_into+stamp": (lambda: (template_v2.update(values), template_v2.stamp(1.0)), 1),
+        f"encode/fleet x{robots}": (lambda: fleet.encode(fleet_values), robots),
+    }
+    if HAVE_NUMPY:
+        numpy_fleet = FleetPackets(robots)
+        for rid in robot_ids:
+            numpy_fleet.packet(rid)
+        cases[f"encode/numpy fleet x{robots}"] = (lambda: numpy_fleet.update(robot_ids, fleet_values), robots)
+    cases["decode/legacy"] = (lambda: legacy_decode(wire), 1)
+    cases["decode/struct"] = (lambda: struct_decode(wire), 1)
+    wire_v2 = bytes(template_v2.buffer)
+    cases["decode/v2"] = (lambda: decode_v2(wire_v2), 1)
+    return cases
+
+def time_case(operation: Callable[[], object], packets: int, min_time: float = 0.2,
+              repeat: int = 5) -> float:
+    """Best-of-repeat nanoseconds per packet"""
+    loops = 1
+    while True:
+        start = time.perf_counter_ns()
+        for _ in range(loops):
+            operation()
+        elapsed = time.perf_counter_ns() - start
+        if elapsed >= min_time * 1e9 / repeat:
+            break
+        loops *= 2
+    best = elapsed
+    for _ in range(repeat - 1):
+        start = time.perf_counter_ns()
+        for _ in range(loops):
+            operation()
+        best = min(best, time.perf_counter_ns() - start)
+    return best / loops / packets
+
+def allocations(operation: Callable[[], object], packets: int, calls: int = 1000) -> Tuple[float, float]:
+    """(peak transient bytes, blocks left allocated) per packet, via tracemalloc
+
+    CPython has no per-call allocation counter, so this reports the largest
+    burst of live memory inside one call and the objects each call leaves
+    behind (results are kept alive so nothing it returns is freed early).
+    """
+    operation()  # warm caches and lazily created objects
+    results = [None] * calls
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        operation()
+        _, peak = tracemalloc.get_traced_memory()
+
+        before = tracemalloc.take_snapshot()
+        for i in range(calls):
+            results[i] = operation()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename')
+                 if stat.traceback[0].filename != tracemalloc.__file__)
+    del results
+    return (peak - base) / packets, max(0, blocks) / calls / packets
+
+def run(robots: int = 8, min_time: float = 0.2) -> Dict[str, dict]:
+    results = {}
+    for name, (operation, packets) in build_cases(robots).items():
+        peak_bytes, blocks = allocations(operation, packets)
+        results[name] = {
+            "ns_per_packet": time_case(operation, packets, min_time),
+            "peak_bytes_per_packet": peak_bytes,
+            "allocations_per_packet": blocks,
+        }
+    return results
+
+def print_report(results: Dict[str, dict]):
+    print(f"{'case':<26} {'ns/packet':>10} {'allocs/packet':>14} {'peak B/packet':>14}")
+    for name, stats in results.items():
+        print(f"{name:<26} {stats['ns_per_packet']:10.1f} {stats['allocations_per_packet']:14.2f} "
+              f"{stats['peak_bytes_per_packet']:14.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Controller packet encode/decode microbenchmarks")
+    parser.add_argument("--robots", type=int, default=8, help="Fleet size for the multi-robot encoder")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Seconds per timing run")
+    parser.add_argument("--json", default=None, help="Write results to this file")
+    args = parser.parse_args()
+
+    results = run(args.robots, args.min_time)
+    print(f"Python {sys.version.split()[0]}, fleet of {args.robots}")
+    print_report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
+
+if __name__ == "__main__":
+    main()
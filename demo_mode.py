@@ -9,41 +9,171 @@ import time
 import threading
 import random
 
+from estop import FEATURE_ESTOP_ACK
+from packets import (FEATURE_PROTOCOL_V2, PROTOCOL_V1, PROTOCOL_V2, V2_PACKET_SIZE, decode_v2,
+                     sequence_newer)
+
 DISCOVERY_PORT = 12345
+# Simulated robots listen for PORT replies on SIM_PORT_BASE + index. Kept well
+# clear of the driver station's command ports (12346+), which simulated
+# robots also bind once assigned.
+SIM_PORT_BASE = 20000
 
 class SimulatedRobot:
     """Simulates a robot for testing"""
 
-    def __init__(self, robot_id, ip="127.0.0.1"):
+    def __init__(self, robot_id, ip="127.0.0.1", discovery_port=None, open_sockets=True,
+                 verbose=True, estop_acks=True, protocol_v2=True):
         self.robot_id = robot_id
         self.ip = ip
         self.running = True
         self.assigned_port = None
+        self.verbose = verbose
+        self.game_status = "standby"
+        self.emergency_stop = False
+        # Acknowledge sequenced e-stops, like firmware advertising FEATURE_ESTOP_ACK
+        self.estop_acks = estop_acks
+        self.estop_sequence = None
+        self.pending_ack = None
+        self.acks_sent = 0
+        # Offer protocol v2; the PORT reply says whether it was accepted
+        self.protocol_v2 = protocol_v2
+        self.protocol = PROTOCOL_V1
+        self.slot = None
+        self.last_sequence = None
+        self.last_timestamp = None
+        self.stale_packets = 0
+        self.axes = [127] * 6
+        self.buttons = [0, 0]
+        self.controller_packets = 0
+        self._name_prefix = robot_id.encode('utf-8')[:15].ljust(16, b'\x00')
 
-        # Create discovery socket (listens on DISCOVERY_PORT like real ESP32)
-        self.discovery_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.discovery_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.discovery_socket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-        # Bind to unique port for this robot so multiple can run
-        self.discovery_port = DISCOVERY_PORT + 1 + hash(robot_id) % 10
-        self.discovery_socket.bind(('', self.discovery_port))
-        self.discovery_socket.settimeout(0.5)
+        # Bind to unique port for this robot so multiple can run; without one,
+        # the OS picks a free port once the socket is bound
+        self.discovery_port = discovery_port if discovery_port is not None else 0
 
         # Command socket (created after port assignment)
+        self.discovery_socket = None
         self.command_socket = None
 
-        print(f"Simulated robot '{robot_id}' created on port {self.discovery_port}")
-    
+        if open_sockets:
+            # Create discovery socket (listens for PORT like real ESP32)
+            self.discovery_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.discovery_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.discovery_socket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+            self.discovery_socket.bind(('', self.discovery_port))
+            self.discovery_port = self.discovery_socket.getsockname()[1]
+            self.discovery_socket.settimeout(0.5)
+
+        self._log(f"Simulated robot '{robot_id}' created on port {self.discovery_port}", prefix=False)
+
+    def _log(self, message, prefix=True):
+        if self.verbose:
+            print(f"[{self.robot_id}] {message}" if prefix else message)
+
+    def discovery_message(self):
+        """Discovery payload, including the port PORT replies should go to"""
+        message = f"DISCOVER:{self.robot_id}:{self.ip}:{self.discovery_port}"
+        features = []
+        if self.estop_acks:
+            features.append(FEATURE_ESTOP_ACK)
+        if self.protocol_v2:
+            features.append(FEATURE_PROTOCOL_V2)
+        if features:
+            message += ":" + ",".join(features)
+        return message.encode()
+
     def send_discovery(self):
         """Send discovery broadcast"""
-        message = f"DISCOVER:{self.robot_id}:{self.ip}:{self.discovery_port}"
+        message = self.discovery_message()
         sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
         # Send to broadcast and localhost
-        sock.sendto(message.encode(), ('255.255.255.255', DISCOVERY_PORT))
-        sock.sendto(message.encode(), ('127.0.0.1', DISCOVERY_PORT))
+        sock.sendto(message, ('255.255.255.255', DISCOVERY_PORT))
+        sock.sendto(message, ('127.0.0.1', DISCOVERY_PORT))
         sock.close()
-        print(f"[{self.robot_id}] Sent discovery: {message}")
+        self._log(f"Sent discovery: {message.decode()}")
+
+    def handle_packet(self, data):
+        """Apply one packet from the driver station; returns what kind it was
+
+        Returns "port", "status", "estop", "estop_off", "controller" or None.
+        A sequenced e-stop leaves its acknowledgement in pending_ack, and v2
+        controller packets that are late or out of order are dropped.
+        """
+        # Controller data (binary, v1)
+        if len(data) == 24 and data[:16] == self._name_prefix:
+            self.axes = list(data[16:22])
+            self.buttons = list(data[22:24])
+            self.controller_packets += 1
+            self._log(f"Controller data: axes={self.axes}, buttons={self.buttons}")
+            return "controller"
+
+        # Controller data (binary, v2)
+        if self.protocol == PROTOCOL_V2 and len(data) == V2_PACKET_SIZE and data[0] == PROTOCOL_V2:
+            slot, sequence, timestamp, values = decode_v2(data)
+            if slot != self.slot:
+                return None
+            if self.last_sequence is not None and not sequence_newer(sequence, self.last_sequence):
+                self.stale_packets += 1
+                return None
+            self.last_sequence = sequence
+            self.last_timestamp = timestamp
+            self.axes = list(values[:6])
+            self.buttons = list(values[6:])
+            self.controller_packets += 1
+            self._log(f"Controller data #{sequence}: axes={self.axes}, buttons={self.buttons}")
+            return "controller"
+
+        message = data.decode('utf-8', errors='ignore')
+
+        # Check for port assignment
+        if message.startswith("PORT:"):
+            parts = message.split(":")
+            if len(parts) >= 3 and parts[1] == self.robot_id and self.assigned_port is None:
+                self.assigned_port = int(parts[2])
+                # "PORT:<id>:<port>:v2:<slot>" accepts protocol v2
+                if self.protocol_v2 and len(parts) >= 5 and parts[3] == FEATURE_PROTOCOL_V2:
+                    self.protocol = PROTOCOL_V2
+                    self.slot = int(parts[4])
+                else:
+                    self.protocol = PROTOCOL_V1
+                self.last_sequence = None
+                self._log(f"Assigned port: {self.assigned_port} (protocol v{self.protocol})")
+                return "port"
+            return None
+
+        # Sequenced emergency stop: acknowledge every copy, apply only newer ones
+        if self.estop_acks and message.startswith(("ESTOP:", "ESTOP_OFF:")):
+            command, _, sequence = message.partition(":")
+            try:
+                sequence = int(sequence)
+            except ValueError:
+                return None
+            self.pending_ack = f"ESTOP_ACK:{self.robot_id}:{sequence}".encode()
+            if self.estop_sequence is not None and sequence <= self.estop_sequence:
+                return None  # a resend, or overtaken by a newer change
+            self.estop_sequence = sequence
+            message = command
+
+        # Check for emergency stop
+        if message == "ESTOP":
+            self.emergency_stop = True
+            self._log("EMERGENCY STOP!")
+            return "estop"
+
+        if message == "ESTOP_OFF":
+            self.emergency_stop = False
+            self._log("Emergency stop released")
+            return "estop_off"
+
+        # Check for game status
+        if message.startswith(self.robot_id + ":"):
+            self.game_status = message[len(self.robot_id) + 1:]
+            self._log(f"Game status: {self.game_status}")
+            return "status"
+
+        return None
     
     def listen_for_commands(self):
         """Listen for port assignment and commands"""
@@ -51,45 +181,23 @@ class SimulatedRobot:
             try:
                 # Listen on discovery socket if not assigned yet
                 if self.assigned_port is None:
-                    data, addr = self.discovery_socket.recvfrom(1024)
+                    sock = self.discovery_socket
                 else:
-                    data, addr = self.command_socket.recvfrom(1024)
-
-                message = data.decode('utf-8', errors='ignore')
-
-                # Check for port assignment
-                if message.startswith("PORT:"):
-                    parts = message.split(":")
-                    if len(parts) >= 3 and parts[1] == self.robot_id:
-                        self.assigned_port = int(parts[2])
-                        print(f"[{self.robot_id}] Assigned port: {self.assigned_port}")
-
-                        # Create command socket
-                        self.command_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-                        self.command_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-                        self.command_socket.bind(('', self.assigned_port))
-                        self.command_socket.settimeout(0.5)
-                
-                # Check for game status
-                elif message.startswith(self.robot_id):
-                    sep_index = message.index(":")
-                    status = message[sep_index + 1:]
-                    print(f"[{self.robot_id}] Game status: {status}")
-                
-                # Check for emergency stop
-                elif message == "ESTOP":
-                    print(f"[{self.robot_id}] EMERGENCY STOP!")
-                
-                elif message == "ESTOP_OFF":
-                    print(f"[{self.robot_id}] Emergency stop released")
-                
-                # Controller data (binary)
-                elif len(data) == 24:
-                    robot_name = data[:16].rstrip(b'\x00').decode('utf-8', errors='ignore')
-                    if robot_name == self.robot_id:
-                        axes = data[16:22]
-                        buttons = data[22:24]
-                        print(f"[{self.robot_id}] Controller data: axes={list(axes)}, buttons={list(buttons)}")
+                    sock = self.command_socket
+                data, addr = sock.recvfrom(1024)
+
+                kind = self.handle_packet(data)
+                if self.pending_ack is not None:
+                    sock.sendto(self.pending_ack, addr)
+                    self.pending_ack = None
+                    self.acks_sent += 1
+
+                if kind == "port":
+                    # Create command socket
+                    self.command_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                    self.command_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                    self.command_socket.bind(('', self.assigned_port))
+                    self.command_socket.settimeout(0.5)
             
             except socket.timeout:
                 pass
@@ -110,7 +218,8 @@ class SimulatedRobot:
     def stop(self):
         """Stop the simulated robot"""
         self.running = False
-        self.discovery_socket.close()
+        if self.discovery_socket:
+            self.discovery_socket.close()
         if self.command_socket:
             self.command_socket.close()
 
@@ -140,8 +249,8 @@ def main():
     print("Press Ctrl+C to stop\n")
     
     # Create two simulated robots
-    robot1 = SimulatedRobot("Robot1")
-    robot2 = SimulatedRobot("Robot2")
+    robot1 = SimulatedRobot("Robot1", discovery_port=SIM_PORT_BASE)
+    robot2 = SimulatedRobot("Robot2", discovery_port=SIM_PORT_BASE + 1)
     
     # Start robots in threads
     thread1 = threading.Thread(target=robot1.run, daemon=True)
@@ -1,27 +1,105 @@
 #!/usr/bin/env python3
 """
 GUI Driver Station for Minibot Control System
-Supports 2 robots with PS5 controller pairing via pygame
+Supports many robots with PS5 controller pairing via pygame
 """
 
+import argparse
+import heapq
+import logging
+import os
 import pygame
 import socket
-import struct
 import threading
 import time
-from typing import Dict, Optional, Tuple
+from collections import OrderedDict
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Sequence, Tuple
 from dataclasses import dataclass
 from datetime import datetime
 
+from estop import (
+    ESTOP_ACK_PREFIX, ESTOP_BURSTS, FEATURE_ESTOP_ACK, EstopTarget, ReliableEstop, parse_estop_ack
+)
+from fleet import HAVE_NUMPY, FleetPackets
+from flight_recorder import COMPRESSIONS, RECEIVED, SEGMENT_SIZE, SENT, FlightRecorder
+from input_shaping import STICK_AXES, AxisShaper, axis_byte, parse_offsets
+from input_sources import (
+    CIRCLE, CROSS, JOYSTICK_EVENTS, SQUARE, TRIANGLE, InputSource, PygameInput, TraceWriter,
+    parse_input_spec
+)
+from log_pipeline import LEVEL_NAMES, LogPipeline, get_logger
+from net_engine import (
+    DatagramFanOut, DatagramReceiver, FanOutReport, NetworkEngine, SocketPool, TimerHandle
+)
+from packets import (
+    AXIS_DEADBAND, FEATURE_PROTOCOL_V2, KEEPALIVE_INTERVAL, NEUTRAL_AXIS, PROTOCOL_V1, PROTOCOL_V2,
+    ControllerPacket, ControllerPacketV2, SendPolicy, controller_values
+)
+from state_store import CopyOnWriteDict
+
 # Constants from minibot.h
 DISCOVERY_PORT = 12345
 COMMAND_PORT_BASE = 12346
 WIFI_BROADCAST = "255.255.255.255"
 
+# Robots not heard from within this many seconds are removed
+ROBOT_TIMEOUT = 10
+
+# Upper bound on datagrams handled per socket wakeup so timers are not starved
+MAX_DATAGRAMS_PER_WAKEUP = 256
+
+log = get_logger()
+
+# Debug logging of received datagrams is capped at this many records a
+# second, and only one in REDISCOVERY_LOG_SAMPLE repeat DISCOVERs is logged
+DATAGRAM_LOG_RATE = 20
+REDISCOVERY_LOG_SAMPLE = 10
+# Repeating send errors are logged at most this many times a second
+ERROR_LOG_RATE = 1
+
+# Discovery packets are parsed once per sender and payload, then cached
+DISCOVER_PREFIX = b"DISCOVER:"
+DISCOVERY_CACHE_SIZE = 1024
+
+GAME_STATUSES = ("standby", "teleop", "autonomous")
+
+# Local control socket for headless operation
+CONTROL_PORT = 12340
+
 # Display settings
 SCREEN_WIDTH = 1200
 SCREEN_HEIGHT = 700
 FPS = 60
+# Frame rate while nothing on screen changes; input events still wake the loop
+IDLE_FPS = 5
+# With the input thread, the idle loop checks for UI events this often
+# instead of blocking in pygame.event.wait, which would take joystick events
+IDLE_POLL_MS = 10
+TEXT_CACHE_SIZE = 512
+
+# Screen regions redrawn independently (dirty rectangles)
+HEADER_RECT = pygame.Rect(0, 0, SCREEN_WIDTH, 148)
+ROBOTS_PANEL_RECT = pygame.Rect(0, 148, SCREEN_WIDTH // 2, 432)
+CONTROLLERS_PANEL_RECT = pygame.Rect(SCREEN_WIDTH // 2, 148, SCREEN_WIDTH // 2, 432)
+FOOTER_RECT = pygame.Rect(0, 580, SCREEN_WIDTH, SCREEN_HEIGHT - 580)
+PAIR_BUTTON_RECT = pygame.Rect(500, 500, 200, 50)
+
+# Robot and controller lists: one compact line per entry, scrolled with the
+# mouse wheel. Rows and the scroll hint end above the pair button.
+LIST_TOP = 150
+ROW_HEIGHT = 24
+ROW_PITCH = ROW_HEIGHT + 2
+SCROLL_HINT_HEIGHT = 24
+VISIBLE_ROWS = (PAIR_BUTTON_RECT.top - SCROLL_HINT_HEIGHT - LIST_TOP) // ROW_PITCH
+# Details of the selected robot, left of the pair button
+ROBOT_DETAIL_POS = (60, PAIR_BUTTON_RECT.top + 15)
+# Controller slots shown even when no pad is plugged in
+MIN_CONTROLLER_SLOTS = 2
+# Cell size of the click hit-test grid
+HIT_GRID_CELL = 50
+
+# Controller transmit rate (independent of FPS)
+TRANSMIT_RATE_HZ = 100
 
 # Colors
 BLACK = (0, 0, 0)
@@ -34,14 +112,26 @@ BLUE = (50, 150, 220)
 YELLOW = (220, 220, 50)
 ORANGE = (255, 165, 0)
 
-@dataclass
 class RobotInfo:
     """Information about a discovered robot"""
-    robot_id: str
-    ip: str
-    port: int
-    last_seen: float
-    connected: bool = False
+
+    __slots__ = ("robot_id", "ip", "port", "last_seen", "connected", "features", "slot", "protocol")
+
+    def __init__(self, robot_id: str, ip: str, port: int, last_seen: float, connected: bool = False,
+                 features: FrozenSet[str] = frozenset(), slot: int = 0, protocol: int = PROTOCOL_V1):
+        self.robot_id = robot_id
+        self.ip = ip
+        self.port = port
+        self.last_seen = last_seen  # time.monotonic()
+        self.connected = connected
+        self.features = features  # optional protocol features from DISCOVER
+        self.slot = slot  # compact id used by protocol v2 instead of the name
+        self.protocol = protocol  # controller packet protocol negotiated at discovery
+
+    def __repr__(self):
+        return (f"RobotInfo(robot_id={self.robot_id!r}, ip={self.ip!r}, port={self.port}, "
+                f"last_seen={self.last_seen:.3f}, connected={self.connected}, "
+                f"features={sorted(self.features)}, slot={self.slot}, protocol={self.protocol})")
 
 @dataclass
 class ControllerState:
@@ -53,423 +143,1389 @@ class ControllerState:
     left_y: int = 127
     right_x: int = 127
     right_y: int = 127
+    # L2/R2 (axes 4 and 5); neutral until a joystick reports them
+    left_trigger: int = 127
+    right_trigger: int = 127
     cross: bool = False
     circle: bool = False
     square: bool = False
     triangle: bool = False
     connected: bool = False
+    # Where readings come from; None for controllers set through
+    # set_virtual_controller
+    source: Optional[InputSource] = None
+
+    def snapshot(self) -> "ControllerSnapshot":
+        """Return an immutable copy of the current stick and button values"""
+        return ControllerSnapshot(
+            index=self.index,
+            left_x=self.left_x,
+            left_y=self.left_y,
+            right_x=self.right_x,
+            right_y=self.right_y,
+            left_trigger=self.left_trigger,
+            right_trigger=self.right_trigger,
+            cross=self.cross,
+            circle=self.circle,
+            square=self.square,
+            triangle=self.triangle
+        )
+
+@dataclass(frozen=True)
+class ControllerSnapshot:
+    """Read-only controller values handed to the transmit thread"""
+    index: int
+    left_x: int = 127
+    left_y: int = 127
+    right_x: int = 127
+    right_y: int = 127
+    left_trigger: int = 127
+    right_trigger: int = 127
+    cross: bool = False
+    circle: bool = False
+    square: bool = False
+    triangle: bool = False
+
+class PortAllocator:
+    """Hands out command ports from COMMAND_PORT_BASE, reusing released ones
+
+    Released ports go on a min-heap so the lowest free port is reused first
+    and a port is never held by two robots at once.
+    """
+
+    def __init__(self, base: int = COMMAND_PORT_BASE):
+        self.base = base
+        self._next = base
+        self._free = []
+        self._in_use = set()
+
+    def allocate(self) -> int:
+        if self._free:
+            port = heapq.heappop(self._free)
+        else:
+            port = self._next
+            self._next += 1
+        self._in_use.add(port)
+        return port
+
+    def release(self, port: int):
+        if port in self._in_use:
+            self._in_use.remove(port)
+            heapq.heappush(self._free, port)
+
+    def reset(self):
+        self._next = self.base
+        self._free.clear()
+        self._in_use.clear()
+
+class _RegistryView(NamedTuple):
+    """One published, never-mutated version of the registry's maps"""
+    robots: Dict[str, RobotInfo]
+    by_ip: Dict[str, Tuple[RobotInfo, ...]]
+    by_port: Dict[int, RobotInfo]
+
+class RobotRegistry:
+    """Discovered robots, indexed by id, IP and command port
+
+    Readers on any thread use the current view without locking. Writers
+    hold a lock, build new maps, and publish them with a single reference
+    swap, so a reader never sees an index half-updated or a dict resized
+    under its iterator. Per-robot fields (last_seen, connected) are
+    updated in place on the shared record.
+
+    Expiry deadlines sit on a min-heap keyed on last_seen + timeout.
+    Touching a robot only updates its record; a popped deadline that
+    turns out to be stale is pushed back at the robot's current deadline.
+    Entries carry the record they were pushed for, so those left behind by
+    a removed robot are dropped when popped rather than pushed again for
+    its next incarnation. Each live robot therefore has one entry, and
+    expiry costs O(log n). version changes on every add, remove or
+    connection change, so the UI can skip work while it is unchanged.
+    """
+
+    def __init__(self, timeout: float = ROBOT_TIMEOUT, port_base: int = COMMAND_PORT_BASE):
+        self.timeout = timeout
+        self.ports = PortAllocator(port_base)
+        self.version = 0
+        self._view = _RegistryView({}, {}, {})
+        self._lock = threading.Lock()
+        self._deadlines: list = []  # (deadline, seq, robot_id, robot_info)
+        self._seq = 0
+
+    def snapshot(self) -> Dict[str, RobotInfo]:
+        """The current robot_id -> RobotInfo map; treat as read-only"""
+        return self._view.robots
+
+    def __len__(self) -> int:
+        return len(self._view.robots)
+
+    def __contains__(self, robot_id) -> bool:
+        return robot_id in self._view.robots
+
+    def __iter__(self):
+        return iter(self._view.robots)
+
+    def __getitem__(self, robot_id: str) -> RobotInfo:
+        return self._view.robots[robot_id]
+
+    def get(self, robot_id: str) -> Optional[RobotInfo]:
+        return self._view.robots.get(robot_id)
+
+    def items(self):
+        return self._view.robots.items()
+
+    def values(self):
+        return self._view.robots.values()
+
+    def by_ip(self, ip: str) -> Tuple[RobotInfo, ...]:
+        return self._view.by_ip.get(ip, ())
+
+    def by_port(self, port: int) -> Optional[RobotInfo]:
+        return self._view.by_port.get(port)
+
+    def add(self, robot_id: str, ip: str, now: float, features: FrozenSet[str] = frozenset(),
+            protocol: int = PROTOCOL_V1) -> RobotInfo:
+        """Register a new robot and assign it a command port
+
+        The slot id follows the port, so it is unique among live robots
+        and reused along with the port.
+        """
+        with self._lock:
+            existing = self._view.robots.get(robot_id)
+            if existing is not None:
+                return existing
+            port = self.ports.allocate()
+            robot_info = RobotInfo(robot_id=robot_id, ip=ip, port=port, last_seen=now,
+                                   features=features, slot=port - self.ports.base, protocol=protocol)
+            view = self._view
+            robots = dict(view.robots)
+            robots[robot_id] = robot_info
+            by_ip = dict(view.by_ip)
+            by_ip[ip] = by_ip.get(ip, ()) + (robot_info,)
+            by_port = dict(view.by_port)
+            by_port[robot_info.port] = robot_info
+            self._publish(_RegistryView(robots, by_ip, by_port))
+            self._push_deadline(robot_info, now + self.timeout)
+            return robot_info
+
+    def touch(self, robot_id: str, now: float):
+        """Record that robot_id was just heard from"""
+        robot_info = self._view.robots.get(robot_id)
+        if robot_info is not None:
+            robot_info.last_seen = now
+
+    def set_connected(self, robot_id: str, connected: bool = True) -> bool:
+        """Update the connected flag; True if it changed"""
+        robot_info = self._view.robots.get(robot_id)
+        if robot_info is None or robot_info.connected == connected:
+            return False
+        robot_info.connected = connected
+        self.version += 1
+        return True
+
+    def remove(self, robot_id: str) -> Optional[RobotInfo]:
+        """Forget a robot and free its port; its heap entry is skipped when popped"""
+        with self._lock:
+            return self._remove_locked(robot_id)
+
+    def _remove_locked(self, robot_id: str) -> Optional[RobotInfo]:
+        view = self._view
+        robot_info = view.robots.get(robot_id)
+        if robot_info is None:
+            return None
+        robots = dict(view.robots)
+        del robots[robot_id]
+        by_ip = dict(view.by_ip)
+        same_ip = tuple(other for other in by_ip.get(robot_info.ip, ()) if other is not robot_info)
+        if same_ip:
+            by_ip[robot_info.ip] = same_ip
+        else:
+            by_ip.pop(robot_info.ip, None)
+        by_port = dict(view.by_port)
+        by_port.pop(robot_info.port, None)
+        self._publish(_RegistryView(robots, by_ip, by_port))
+        self.ports.release(robot_info.port)
+        return robot_info
+
+    def clear(self):
+        with self._lock:
+            self._publish(_RegistryView({}, {}, {}))
+            self._deadlines.clear()
+            self.ports.reset()
+
+    def next_deadline(self) -> Optional[float]:
+        """Earliest time a robot could expire, or None if there are none"""
+        deadlines = self._deadlines
+        return deadlines[0][0] if deadlines else None
+
+    def expire(self, now: float) -> list:
+        """Remove and return every robot not heard from within timeout"""
+        expired = []
+        with self._lock:
+            deadlines = self._deadlines
+            while deadlines and deadlines[0][0] <= now:
+                _, _, robot_id, robot_info = heapq.heappop(deadlines)
+                if self._view.robots.get(robot_id) is not robot_info:
+                    continue  # removed since, perhaps rediscovered as a new record
+                deadline = robot_info.last_seen + self.timeout
+                if deadline <= now:
+                    self._remove_locked(robot_id)
+                    expired.append(robot_info)
+                else:
+                    self._push_deadline(robot_info, deadline)
+        return expired
+
+    def _publish(self, view: _RegistryView):
+        self._view = view
+        self.version += 1
+
+    def _push_deadline(self, robot_info: RobotInfo, deadline: float):
+        self._seq += 1
+        heapq.heappush(self._deadlines, (deadline, self._seq, robot_info.robot_id, robot_info))
+
+class HitGrid:
+    """Uniform-grid spatial index mapping click positions to UI regions
+
+    Each region is filed under every grid cell it overlaps, so a lookup only
+    tests the handful of regions in the clicked cell. Handlers return True
+    when they consumed the click; otherwise later regions are tried, in the
+    order they were added.
+    """
+
+    def __init__(self, cell_size: int = HIT_GRID_CELL):
+        self.cell_size = cell_size
+        self._cells: Dict[Tuple[int, int], list] = {}
+
+    def add(self, rect: pygame.Rect, handler):
+        size = self.cell_size
+        for cell_x in range(rect.left // size, (rect.right - 1) // size + 1):
+            for cell_y in range(rect.top // size, (rect.bottom - 1) // size + 1):
+                self._cells.setdefault((cell_x, cell_y), []).append((rect, handler))
+
+    def hit(self, pos) -> bool:
+        """Dispatch pos to the first region that handles it"""
+        cell = (pos[0] // self.cell_size, pos[1] // self.cell_size)
+        for rect, handler in self._cells.get(cell, ()):
+            if rect.collidepoint(pos) and handler(pos):
+                return True
+        return False
+
+class TextCache:
+    """LRU cache of rendered text surfaces keyed on (font, text, color)"""
+
+    def __init__(self, max_entries: int = TEXT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._surfaces: "OrderedDict[tuple, pygame.Surface]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font: pygame.font.Font, text: str, color) -> pygame.Surface:
+        key = (font, text, color)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self._surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = font.render(text, True, color)
+        self._surfaces[key] = surface
+        if len(self._surfaces) > self.max_entries:
+            self._surfaces.popitem(last=False)
+        return surface
+
+    def __len__(self):
+        return len(self._surfaces)
+
+class TransmitScheduler:
+    """Calls a send function at a fixed rate on its own thread.
+
+    Deadlines are computed from the start time rather than by sleeping a
+    fixed period after each send, so send cost does not accumulate as drift.
+    If a tick overruns by more than a full period the schedule is re-anchored
+    instead of bursting to catch up.
+    """
+
+    def __init__(self, rate_hz: float, send_fn, name: str = "Transmit"):
+        if rate_hz <= 0:
+            raise ValueError(f"{name} rate must be positive, got {rate_hz}")
+        self.name = name
+        self.rate_hz = rate_hz
+        self.period = 1.0 / rate_hz
+        self.send_fn = send_fn
+        self.ticks = 0
+        self.missed_ticks = 0
+        self.max_lateness = 0.0
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start the transmit thread"""
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the transmit thread and wait for the current tick to finish"""
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def _run(self):
+        next_deadline = time.perf_counter()
+        while self._running:
+            lateness = time.perf_counter() - next_deadline
+            if lateness > self.max_lateness:
+                self.max_lateness = lateness
+
+            try:
+                self.send_fn()
+            except Exception as e:
+                log.warning("%s error: %s", self.name, e, extra={"rate_limit": ERROR_LOG_RATE})
+            self.ticks += 1
+
+            next_deadline += self.period
+            delay = next_deadline - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif -delay > self.period:
+                # Fell more than a whole period behind; skip the lost slots
+                skipped = int(-delay / self.period)
+                self.missed_ticks += skipped
+                next_deadline += skipped * self.period
 
 class DriverStation:
     """Main driver station application"""
     
-    def __init__(self):
-        pygame.init()
-        pygame.joystick.init()
-        
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-        pygame.display.set_caption("Minibot Driver Station")
+    def __init__(self, transmit_rate: float = TRANSMIT_RATE_HZ,
+                 keepalive_interval: float = KEEPALIVE_INTERVAL,
+                 deadband: int = AXIS_DEADBAND,
+                 robot_timeout: float = ROBOT_TIMEOUT,
+                 command_port_base: int = COMMAND_PORT_BASE,
+                 headless: bool = False,
+                 discovery_port: int = DISCOVERY_PORT,
+                 fleet_encoder: bool = False,
+                 connected_sockets: bool = False,
+                 estop_bursts: int = ESTOP_BURSTS,
+                 estop_broadcast: Optional[str] = None,
+                 protocol: int = PROTOCOL_V2,
+                 log_level: str = "INFO",
+                 record_dir: Optional[str] = None,
+                 record_segment_size: int = SEGMENT_SIZE,
+                 record_compression: Optional[str] = None,
+                 inputs: Optional[Sequence[InputSource]] = None,
+                 input_trace: Optional[str] = None,
+                 input_rate: float = FPS,
+                 input_thread: bool = False,
+                 stick_deadband: float = 0.0,
+                 expo: float = 0.0,
+                 axis_offsets: Tuple[float, ...] = (0.0,) * STICK_AXES):
+        self.headless = headless
+        # Logging goes through a queue drained by its own thread; started
+        # first so everything below can log
+        self.logs = LogPipeline(log_level)
+        self.logs.start()
+        if headless:
+            # Joystick events still need SDL's event queue, but no window,
+            # fonts or audio; the dummy video driver provides the queue
+            os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+            pygame.display.init()
+            pygame.joystick.init()
+            self.screen = None
+            self.font = None
+            self.title_font = None
+        else:
+            pygame.init()
+            pygame.joystick.init()
+            
+            self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+            pygame.display.set_caption("Minibot Driver Station")
+            self.font = pygame.font.Font(None, 24)
+            self.title_font = pygame.font.Font(None, 36)
+            self._prerender_chrome()
+        self.text_cache = TextCache()
+        self._panel_states: Dict[str, tuple] = {}
+        self._ui_full_redraw = True
+        # Bumped on every change the UI shows; the render loop watches it
+        self.state_version = 0
+        self._rendered_version = -1
+        self._pending_events = []
+        self._wake_event_type = pygame.event.custom_type()
+        # Events that end an idle wait while the input thread owns joystick events
+        self._ui_event_types = (pygame.QUIT, pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN, pygame.MOUSEWHEEL,
+                                pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, self._wake_event_type)
+        self.busy_fps = self._display_refresh_rate()
         self.clock = pygame.time.Clock()
-        self.font = pygame.font.Font(None, 24)
-        self.title_font = pygame.font.Font(None, 36)
         
         # Network setup
         self.udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.udp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
         self.udp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.udp_socket.bind(('', DISCOVERY_PORT))
-        self.udp_socket.settimeout(0.1)
+        self.udp_socket.bind(('', discovery_port))
+        self.udp_socket.setblocking(False)
         
         # State
-        self.robots: Dict[str, RobotInfo] = {}
-        self.controllers: Dict[int, ControllerState] = {}
-        self.robot_controller_pairs: Dict[str, int] = {}  # robot_id -> controller_index
+        self.robots = RobotRegistry(robot_timeout, command_port_base)
+        # Written by the CLI and control socket as well as the main loop
+        self.controllers: CopyOnWriteDict[int, ControllerState] = CopyOnWriteDict()
+        # Replaced wholesale each frame; the transmit thread only reads it
+        self.controller_snapshots: Dict[int, ControllerSnapshot] = {}
+        # Per-robot packet templates; the send policy skips redundant packets
+        self.controller_packets: CopyOnWriteDict[str, ControllerPacket] = CopyOnWriteDict()
+        # With NumPy, templates are rows of one array updated in a single step
+        self.fleet_packets: Optional[FleetPackets] = None
+        if fleet_encoder:
+            if HAVE_NUMPY:
+                self.fleet_packets = FleetPackets()
+            else:
+                log.warning("NumPy not installed; using per-robot packet encoding")
+        self.send_policy = SendPolicy(deadband, keepalive_interval)
+        # Highest controller protocol offered to robots that support it
+        if protocol not in (PROTOCOL_V1, PROTOCOL_V2):
+            raise ValueError(f"Unknown protocol version: {protocol}")
+        self.protocol = protocol
+        # Optional per-robot sockets connect()ed to the robot, opened on pairing
+        self.socket_pool: Optional[SocketPool] = SocketPool() if connected_sockets else None
+        # Stick calibration, deadband and expo applied as axes are read
+        self.axis_shaper = AxisShaper(stick_deadband, expo, axis_offsets)
+        # Optional callback(robot_id, packet) after each controller packet
+        # leaves; used by benchmarks to timestamp packets on the wire
+        self.send_observer = None
+        # Clock for send decisions and robot sightings; replay substitutes a
+        # virtual clock so sessions reproduce regardless of replay speed
+        self.monotonic = time.monotonic
+        # Optional on-disk log of every datagram sent and received
+        self.recorder: Optional[FlightRecorder] = None
+        if record_dir is not None:
+            self.recorder = FlightRecorder(record_dir, record_segment_size,
+                                           compression=record_compression)
+            log.info("Recording datagrams to %s", record_dir)
+        # robot_id -> controller_index; read by the transmit thread every tick
+        self.robot_controller_pairs: CopyOnWriteDict[str, int] = CopyOnWriteDict()
         self.game_status = "standby"  # standby, teleop, autonomous
         self.emergency_stop = False
         self.running = True
         
         # Start network thread
+        self.network = NetworkEngine()
+        self.receiver = DatagramReceiver(self.udp_socket)
+        # E-stop and game status go to every robot in one batched send
+        self.fanout = DatagramFanOut(self.udp_socket)
+        # E-stop changes are resent until every robot that can ack has
+        self.estop = ReliableEstop(self._send_batch, self.network.call_later,
+                                   legacy_sends=estop_bursts, on_change=self._bump_state)
+        self.estop_broadcast = estop_broadcast
+        self.last_fanout: Optional[FanOutReport] = None
+        # sender -> (its last DISCOVER payload, parsed)
+        self._discovery_cache: Dict[Tuple[str, int], Tuple[bytes, Tuple[str, str, int, FrozenSet[str]]]] = {}
+        # One engine timer, armed at the registry's earliest deadline
+        self._expiry_timer: Optional[TimerHandle] = None
+        self._expiry_deadline: Optional[float] = None
         self.network_thread = threading.Thread(target=self._network_loop, daemon=True)
         self.network_thread.start()
+
+        # Controller transmit runs at its own rate, decoupled from rendering
+        self.transmit_scheduler = TransmitScheduler(transmit_rate, self._transmit_controller_data)
         
-        # Discover controllers
+        # Controllers come from input sources; joysticks unless told otherwise
+        self.input_sources: List[InputSource] = list(inputs) if inputs is not None else [PygameInput()]
+        self._input_slots: List[Tuple[InputSource, List[int]]] = []
+        # Optional trace of every reading, for playback with TraceInput
+        self.input_trace: Optional[TraceWriter] = TraceWriter(input_trace) if input_trace else None
+        if input_rate <= 0:
+            raise ValueError(f"Input rate must be positive, got {input_rate}")
+        # Headless polls the input sources this often; the UI polls once a
+        # frame, and at least this often while non-joystick sources are in use
+        self.input_rate = input_rate
+        # Optionally poll on a thread of its own at input_rate, so readings
+        # reach the transmit thread without waiting for the next frame
+        self.input_scheduler: Optional[TransmitScheduler] = None
+        if input_thread:
+            self.input_scheduler = TransmitScheduler(input_rate, self._input_tick, name="Input")
         self._discover_controllers()
         
         # UI State
         self.selected_robot = None
         self.selected_controller = None
+        self.robot_scroll = 0
+        self.controller_scroll = 0
+        # Row order as last drawn, so clicks map to rows without sorting
+        self._robot_rows = []
+        self._robot_rows_version = -1
+        self._controller_rows = []
+        self.hit_grid = self._build_hit_grid()
     
     def _discover_controllers(self):
-        """Discover connected PS5 controllers"""
-        pygame.joystick.quit()
-        pygame.joystick.init()
-        
-        num_joysticks = pygame.joystick.get_count()
-        for i in range(num_joysticks):
-            joystick = pygame.joystick.Joystick(i)
-            joystick.init()
-            self.controllers[i] = ControllerState(
-                index=i,
-                name=joystick.get_name(),
-                joystick=joystick,
-                connected=True
-            )
-            print(f"Controller {i} connected: {joystick.get_name()}")
+        """Open every input source and give each of its controllers an index"""
+        self._input_slots = []
+        for source in self.input_sources:
+            indices = []
+            for i, name in enumerate(source.open()):
+                index = max(self.controllers, default=-1) + 1
+                joystick = source.joysticks[i] if isinstance(source, PygameInput) else None
+                self.controllers[index] = ControllerState(
+                    index=index,
+                    name=name,
+                    joystick=joystick,
+                    connected=True,
+                    source=source
+                )
+                indices.append(index)
+                log.info("Controller %d connected: %s", index, name)
+            self._input_slots.append((source, indices))
     
     def _network_loop(self):
-        """Background thread for handling network communications"""
-        while self.running:
+        """Background thread running the event-driven network engine"""
+        self.network.add_reader(self.udp_socket, self._on_discovery_readable)
+        self.network.run()
+
+    def _on_discovery_readable(self, sock: socket.socket):
+        """Drain every pending datagram from the discovery socket"""
+        self.receiver.drain(self._handle_datagram, MAX_DATAGRAMS_PER_WAKEUP)
+
+    def _sent_by(self, robot_id: str, addr: Tuple[str, int]) -> bool:
+        """Whether a datagram from addr came from robot_id
+
+        Robots acknowledge from their command port or their discovery
+        socket, so the command port identifies the sender directly and the
+        IP is the fallback; an ack naming a different robot is ignored.
+        """
+        robot_info = self.robots.by_port(addr[1])
+        if robot_info is not None and robot_info.ip == addr[0]:
+            return robot_info.robot_id == robot_id
+        return any(other.robot_id == robot_id for other in self.robots.by_ip(addr[0]))
+
+    def _parse_discovery(self, data: memoryview,
+                         addr: Tuple[str, int]) -> Optional[Tuple[str, str, int, FrozenSet[str]]]:
+        """Parse "DISCOVER:<robotId>:<IP>[:<port>[:<features>]]"
+
+        Returns (robot_id, ip, port, features); features is a comma-separated
+        list of optional protocol features the robot supports.
+
+        Robots rebroadcast identical payloads from the same address, so each
+        sender's last payload is kept with its parsed result; a repeat is
+        recognised by comparing against the received memoryview, without
+        copying or decoding it.
+        """
+        if data[:len(DISCOVER_PREFIX)] != DISCOVER_PREFIX:
+            return None
+        cached = self._discovery_cache.get(addr)
+        if cached is not None and data == cached[0]:
+            return cached[1]
+        parts = str(data[len(DISCOVER_PREFIX):], 'utf-8', errors='ignore').split(":")
+        if len(parts) < 2:
+            return None
+        # Check if discovery includes a port (for demo mode)
+        try:
+            discovery_port = int(parts[2]) if len(parts) >= 3 else DISCOVERY_PORT
+        except ValueError:
+            return None
+        features = frozenset(filter(None, parts[3].split(","))) if len(parts) >= 4 else frozenset()
+        parsed = (parts[0], parts[1], discovery_port, features)
+        if len(self._discovery_cache) >= DISCOVERY_CACHE_SIZE:
+            self._discovery_cache.clear()
+        self._discovery_cache[addr] = (data.tobytes(), parsed)
+        return parsed
+
+    def _handle_datagram(self, data: memoryview, addr: Tuple[str, int]):
+        """Process one datagram received on the discovery socket"""
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.record(RECEIVED, data, addr)
+
+        # Decoding the payload is only worth it when someone will read it
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Received packet", extra={
+                "fields": {"from": f"{addr[0]}:{addr[1]}",
+                           "payload": bytes(data[:50]).decode('utf-8', errors='ignore')},
+                "rate_limit": DATAGRAM_LOG_RATE,
+            })
+
+        if data[:len(ESTOP_ACK_PREFIX)] == ESTOP_ACK_PREFIX:
+            ack = parse_estop_ack(data)
+            if ack is not None and self._sent_by(ack[0], addr):
+                self.estop.acknowledge(*ack)
+            return
+
+        discovery = self._parse_discovery(data, addr)
+        if discovery is None:
+            return
+        robot_id, robot_ip, discovery_port, features = discovery
+
+        protocol = PROTOCOL_V1
+        if self.protocol >= PROTOCOL_V2 and FEATURE_PROTOCOL_V2 in features:
+            protocol = PROTOCOL_V2
+
+        now = self.monotonic()
+        robot_info = self.robots.get(robot_id)
+        if robot_info is None:
+            # Assign a port for this robot
+            robot_info = self.robots.add(robot_id, robot_ip, now, features, protocol)
+            self._schedule_robot_expiry()
+            log.info("Discovered robot: %s at %s:%d (protocol v%d)", robot_id, robot_ip, discovery_port, protocol)
+            self._bump_state()
+        else:
+            self.robots.touch(robot_id, now)
+            log.debug("Rediscovered robot: %s", robot_id, extra={"sample": REDISCOVERY_LOG_SAMPLE})
+            # Reflashed firmware may rediscover with different features
+            robot_info.features = features
+            if robot_info.protocol != protocol:
+                robot_info.protocol = protocol
+                self._drop_controller_packet(robot_id)
+                self._bump_state()
+
+        # Publish the connection before replying, so anything that reacts
+        # to the PORT reply already sees the robot as connected
+        if self.robots.set_connected(robot_id):
+            self._bump_state()
+
+        # Send port assignment to the discovery port; v2 robots also get their slot
+        response = f"PORT:{robot_id}:{robot_info.port}"
+        if protocol == PROTOCOL_V2:
+            response += f":v2:{robot_info.slot}"
+        response = response.encode()
+        self.udp_socket.sendto(response, (robot_ip, discovery_port))
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.record(SENT, response, (robot_ip, discovery_port))
+
+        # A robot only rebroadcasts DISCOVER after dropping its connection
+        packet = self.controller_packets.get(robot_id)
+        if packet is not None:
+            packet.invalidate()
+
+    def _schedule_robot_expiry(self):
+        """Arm the expiry timer at the registry's earliest deadline"""
+        deadline = self.robots.next_deadline()
+        if deadline is None or deadline == self._expiry_deadline:
+            return
+        if self._expiry_timer is not None:
+            self._expiry_timer.cancel()
+        self._expiry_deadline = deadline
+        # Deadlines are on the station clock, which replay swaps for a
+        # virtual one; the engine's timers run on real time
+        self._expiry_timer = self.network.call_later(max(0.0, deadline - self.monotonic()),
+                                                     self._expire_robots)
+
+    def _expire_robots(self):
+        """Remove robots not seen within the robot timeout"""
+        if self._expiry_timer is not None:
+            self._expiry_timer.cancel()
+        self._expiry_timer = None
+        self._expiry_deadline = None
+        for robot_info in self.robots.expire(self.monotonic()):
+            robot_id = robot_info.robot_id
+            log.info("Robot %s timed out", robot_id)
+            self._bump_state()
+            self._drop_controller_packet(robot_id)
+            self.robot_controller_pairs.pop(robot_id, None)
+            self.estop.forget(robot_id)
+            if self.socket_pool is not None:
+                self.socket_pool.close(robot_id)
+        self._schedule_robot_expiry()
+    
+    def _publish_controller_snapshots(self):
+        """Publish a fresh snapshot of every controller for the transmit thread"""
+        snapshots = {
+            index: controller.snapshot()
+            for index, controller in self.controllers.snapshot().items()
+        }
+        if snapshots != self.controller_snapshots:
+            self.controller_snapshots = snapshots
+            self.state_version += 1
+
+    def _bump_state(self):
+        """Record a UI-visible change and wake the render loop if it is idle"""
+        self.state_version += 1
+        if not self.headless and threading.current_thread() is not threading.main_thread():
             try:
-                # Listen for discovery packets
-                data, addr = self.udp_socket.recvfrom(1024)
-                message = data.decode('utf-8', errors='ignore')
-
-                # Debug: Print ALL received packets
-                print(f"[DEBUG] Received packet from {addr}: {message[:50]}")
-
-                # Parse discovery message: "DISCOVER:<robotId>:<IP>" or "DISCOVER:<robotId>:<IP>:<port>"
-                if message.startswith("DISCOVER:"):
-                    parts = message.split(":")
-                    if len(parts) >= 3:
-                        robot_id = parts[1]
-                        robot_ip = parts[2]
-                        # Check if discovery includes a port (for demo mode)
-                        discovery_port = int(parts[3]) if len(parts) >= 4 else DISCOVERY_PORT
-
-                        if robot_id not in self.robots:
-                            # Assign a port for this robot
-                            port = COMMAND_PORT_BASE + len(self.robots)
-                            self.robots[robot_id] = RobotInfo(
-                                robot_id=robot_id,
-                                ip=robot_ip,
-                                port=port,
-                                last_seen=time.time(),
-                                connected=False
-                            )
-                            print(f"Discovered robot: {robot_id} at {robot_ip}:{discovery_port}")
-                        else:
-                            # Update last seen time
-                            self.robots[robot_id].last_seen = time.time()
-
-                        # Send port assignment to the discovery port
-                        robot_info = self.robots[robot_id]
-                        response = f"PORT:{robot_id}:{robot_info.port}"
-                        self.udp_socket.sendto(response.encode(), (robot_ip, discovery_port))
-                        robot_info.connected = True
-                        
-            except socket.timeout:
+                pygame.event.post(pygame.event.Event(self._wake_event_type))
+            except pygame.error:
                 pass
-            except Exception as e:
-                print(f"Network error: {e}")
-            
-            # Clean up stale robots (not seen in 10 seconds)
-            current_time = time.time()
-            stale_robots = [
-                robot_id for robot_id, info in self.robots.items()
-                if current_time - info.last_seen > 10
-            ]
-            for robot_id in stale_robots:
-                print(f"Robot {robot_id} timed out")
-                del self.robots[robot_id]
-                if robot_id in self.robot_controller_pairs:
-                    del self.robot_controller_pairs[robot_id]
-            
-            time.sleep(0.05)
-    
-    def _send_controller_data(self, robot_id: str, controller: ControllerState):
-        """Send controller data to robot in binary format"""
-        if robot_id not in self.robots:
+
+    def _display_refresh_rate(self) -> int:
+        """Refresh rate of the primary display, or FPS where pygame cannot tell"""
+        get_rates = getattr(pygame.display, "get_desktop_refresh_rates", None)
+        if not self.headless and get_rates is not None:
+            try:
+                rates = [rate for rate in get_rates() if rate > 0]
+                if rates:
+                    return rates[0]
+            except pygame.error:
+                pass
+        return FPS
+
+    def _transmit_controller_data(self):
+        """Send the latest controller snapshot to every paired robot"""
+        if self.fleet_packets is not None:
+            self._transmit_fleet()
             return
-        
-        robot_info = self.robots[robot_id]
-        if not robot_info.connected:
+        snapshots = self.controller_snapshots
+        for robot_id, controller_index in self.robot_controller_pairs.items():
+            snapshot = snapshots.get(controller_index)
+            if snapshot is not None:
+                self._send_controller_data(robot_id, snapshot)
+
+    def _transmit_fleet(self):
+        """Encode every paired robot's packet in one step, then send the due ones"""
+        if self.game_status != "teleop" or self.emergency_stop:
+            return
+        snapshots = self.controller_snapshots
+        robot_ids = []
+        packets = []
+        fleet_values = []
+        for robot_id, controller_index in self.robot_controller_pairs.items():
+            snapshot = snapshots.get(controller_index)
+            robot_info = self.robots.get(robot_id)
+            if snapshot is None or robot_info is None or not robot_info.connected:
+                continue
+            robot_ids.append(robot_id)
+            packets.append(self._controller_packet(robot_id))
+            fleet_values.append(controller_values(snapshot))
+        if not robot_ids:
+            return
+
+        # v2 robots have no fleet row, so update() skips them
+        self.fleet_packets.update(robot_ids, fleet_values)
+        now = self.monotonic()
+        for robot_id, packet, values in zip(robot_ids, packets, fleet_values):
+            if self.send_policy.should_send(packet, values, now):
+                if packet.protocol == PROTOCOL_V2:
+                    packet.update(values)
+                self._transmit_packet(robot_id, packet, values, now)
+
+    def _controller_packet(self, robot_id: str) -> ControllerPacket:
+        """The packet template for robot_id, created on first use"""
+        packet = self.controller_packets.get(robot_id)
+        if packet is None:
+            robot_info = self.robots.get(robot_id)
+            if robot_info is not None and robot_info.protocol == PROTOCOL_V2:
+                packet = ControllerPacketV2(robot_id, robot_info.slot)
+            elif self.fleet_packets is not None:
+                packet = self.fleet_packets.packet(robot_id)
+            else:
+                packet = ControllerPacket(robot_id)
+            packet = self.controller_packets.setdefault(robot_id, packet)
+        return packet
+
+    def _drop_controller_packet(self, robot_id: str):
+        self.controller_packets.pop(robot_id, None)
+        if self.fleet_packets is not None:
+            self.fleet_packets.release(robot_id)
+
+    def _send_controller_data(self, robot_id: str, controller: ControllerSnapshot):
+        """Send controller data to robot in binary format"""
+        robot_info = self.robots.get(robot_id)
+        if robot_info is None or not robot_info.connected:
             return
         
         # Only send controller data in teleop mode
         if self.game_status == "teleop" and not self.emergency_stop:
-            # Create binary packet (24 bytes)
-            # Bytes 0-15: Robot name (16 bytes, null-terminated)
-            robot_name_bytes = robot_id.encode('utf-8')[:15].ljust(16, b'\x00')
-            
-            # Bytes 16-21: Axes data (6 bytes)
-            axes = struct.pack('BBBBBB',
-                controller.left_x,
-                controller.left_y,
-                controller.right_x,
-                controller.right_y,
-                127,  # Extra axis (unused)
-                127   # Extra axis (unused)
-            )
-            
-            # Bytes 22-23: Button data (2 bytes)
-            button_byte_0 = (
-                (1 if controller.cross else 0) |
-                ((1 if controller.circle else 0) << 1) |
-                ((1 if controller.square else 0) << 2) |
-                ((1 if controller.triangle else 0) << 3)
-            )
-            buttons = struct.pack('BB', button_byte_0, 0)
-            
-            packet = robot_name_bytes + axes + buttons
-            
-            try:
-                self.udp_socket.sendto(packet, (robot_info.ip, robot_info.port))
-            except Exception as e:
-                print(f"Error sending controller data: {e}")
-    
-    def _send_game_status(self, robot_id: str):
-        """Send game status to robot"""
-        if robot_id not in self.robots:
+            packet = self._controller_packet(robot_id)
+            values = controller_values(controller)
+            now = self.monotonic()
+            if not self.send_policy.should_send(packet, values, now):
+                return
+            packet.update(values)
+            self._transmit_packet(robot_id, packet, values, now)
+
+    def _transmit_packet(self, robot_id: str, packet: ControllerPacket,
+                         values: Tuple[int, ...], now: float):
+        """Put an encoded controller packet on the wire"""
+        robot_info = self.robots.get(robot_id)
+        if robot_info is None:
             return
-        
-        robot_info = self.robots[robot_id]
-        message = f"{robot_id}:{self.game_status}"
-        
+        pool = self.socket_pool
+        address = (robot_info.ip, robot_info.port)
+        packet.stamp(now)
         try:
-            self.udp_socket.sendto(message.encode(), (robot_info.ip, robot_info.port))
+            if pool is not None and robot_id in pool:
+                if not pool.send(robot_id, packet.buffer):
+                    if pool.unreachable.get(robot_id) == 1:
+                        log.warning("Robot %s unreachable at %s:%d", robot_id, robot_info.ip, robot_info.port)
+                    return
+            else:
+                self.udp_socket.sendto(packet.buffer, address)
+            packet.mark_sent(values, now)
         except Exception as e:
-            print(f"Error sending game status: {e}")
+            log.warning("Error sending controller data: %s", e, extra={"rate_limit": ERROR_LOG_RATE})
+            return
+
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.record(SENT, packet.buffer, address, now)
+
+        observer = self.send_observer
+        if observer is not None:
+            observer(robot_id, packet.buffer)
+
+    def _invalidate_controller_packets(self):
+        """Make the next transmit tick send a full packet to every robot"""
+        for packet in self.controller_packets.values():
+            packet.invalidate()
     
-    def _send_emergency_stop(self, enable: bool):
-        """Send emergency stop to all robots"""
-        message = "ESTOP" if enable else "ESTOP_OFF"
-        
-        for robot_info in self.robots.values():
+    def _send_batch(self, messages) -> int:
+        """Send (payload, address) pairs in one batch, recording them if enabled"""
+        recorder = self.recorder
+        if recorder is not None:
+            for payload, address in messages:
+                recorder.record(SENT, payload, address)
+        return self.fanout.send(messages)
+
+    def _send_game_status(self, started: float) -> FanOutReport:
+        """Send the game status to every robot in one batch"""
+        status = self.game_status
+        messages = [(f"{robot_id}:{status}".encode(), (robot_info.ip, robot_info.port))
+                    for robot_id, robot_info in self.robots.items()]
+        sent = self._send_batch(messages)
+        elapsed = time.perf_counter() - started
+        report = FanOutReport("status", sent, 1, elapsed, elapsed)
+        self.last_fanout = report
+        return report
+
+    def _send_emergency_stop(self, enable: bool, started: Optional[float] = None) -> FanOutReport:
+        """Send emergency stop to all robots, resending until acknowledged"""
+        targets = [
+            # Send to both discovery and command ports
+            EstopTarget(robot_info.robot_id,
+                        ((robot_info.ip, DISCOVERY_PORT), (robot_info.ip, robot_info.port)),
+                        FEATURE_ESTOP_ACK in robot_info.features)
+            for robot_info in self.robots.values()
+        ]
+        # Also reaches robots that were never discovered or have dropped out
+        broadcast = ((self.estop_broadcast, DISCOVERY_PORT),) if self.estop_broadcast else ()
+        report = self.estop.engage(enable, targets, broadcast, started)
+        self.last_fanout = report
+        return report
+
+    def set_game_status(self, status: str, started: Optional[float] = None):
+        """Change the game status and send it to every robot
+
+        started is the perf_counter() time of the triggering keypress.
+        """
+        if started is None:
+            started = time.perf_counter()
+        if status not in GAME_STATUSES:
+            raise ValueError(f"Unknown game status: {status}")
+        self.game_status = status
+        report = self._send_game_status(started)
+        self._invalidate_controller_packets()
+        self._bump_state()
+        log.info("Game status: %s (%d robots in %.2f ms)", status, report.datagrams,
+                 report.first_burst_s * 1000)
+
+    def set_emergency_stop(self, enable: bool, started: Optional[float] = None):
+        """Engage or release the emergency stop on every robot
+
+        started is the perf_counter() time of the triggering keypress.
+        """
+        self.emergency_stop = enable
+        report = self._send_emergency_stop(enable, started)
+        self._invalidate_controller_packets()
+        self._bump_state()
+        log.info("Emergency stop: %s (%d datagrams in %.2f ms, %d robots to acknowledge)",
+                 enable, report.datagrams, report.first_burst_s * 1000, self.estop.pending)
+
+    def set_log_level(self, level: Optional[str]) -> str:
+        """Change the log level at runtime, or step to the next one if level is None"""
+        name = self.logs.cycle_level() if level is None else self.logs.set_level(level)
+        # Logged at WARNING so the change shows at every level but ERROR
+        log.warning("Log level: %s", name)
+        self._bump_state()
+        return name
+
+    def pair(self, robot_id: str, controller_index: int):
+        """Drive robot_id from the given controller"""
+        if robot_id not in self.robots:
+            raise KeyError(f"Unknown robot: {robot_id}")
+        if controller_index not in self.controllers:
+            raise KeyError(f"Unknown controller: {controller_index}")
+        self.robot_controller_pairs[robot_id] = controller_index
+        if self.socket_pool is not None:
+            robot_info = self.robots[robot_id]
             try:
-                # Send to both discovery and command ports
-                self.udp_socket.sendto(message.encode(), (robot_info.ip, DISCOVERY_PORT))
-                self.udp_socket.sendto(message.encode(), (robot_info.ip, robot_info.port))
-            except Exception as e:
-                print(f"Error sending emergency stop: {e}")
-    
+                self.socket_pool.open(robot_id, (robot_info.ip, robot_info.port))
+            except OSError as e:
+                log.warning("Cannot open a connected socket for %s, using the shared one: %s", robot_id, e)
+        packet = self.controller_packets.get(robot_id)
+        if packet is not None:
+            packet.invalidate()
+        self._bump_state()
+        log.info("Paired %s with controller %d", robot_id, controller_index)
+
+    def unpair(self, robot_id: str):
+        """Stop driving robot_id from any controller"""
+        self.robot_controller_pairs.pop(robot_id, None)
+        if self.socket_pool is not None:
+            self.socket_pool.close(robot_id)
+        self._bump_state()
+
+    def set_virtual_controller(self, index: int, left_x: int, left_y: int,
+                               right_x: int, right_y: int, buttons: int = 0,
+                               left_trigger: int = NEUTRAL_AXIS, right_trigger: int = NEUTRAL_AXIS):
+        """Create or update a controller driven by software instead of a joystick"""
+        controller = self.controllers.get(index)
+        if controller is None:
+            controller = self.controllers.setdefault(
+                index, ControllerState(index=index, name=f"Virtual {index}", joystick=None, connected=True))
+        if controller.source is not None:
+            raise ValueError(f"Controller {index} is driven by an input source")
+        controller.left_x = max(0, min(255, left_x))
+        controller.left_y = max(0, min(255, left_y))
+        controller.right_x = max(0, min(255, right_x))
+        controller.right_y = max(0, min(255, right_y))
+        controller.left_trigger = max(0, min(255, left_trigger))
+        controller.right_trigger = max(0, min(255, right_trigger))
+        controller.cross = bool(buttons & 0x01)
+        controller.circle = bool(buttons & 0x02)
+        controller.square = bool(buttons & 0x04)
+        controller.triangle = bool(buttons & 0x08)
+
     def _update_controllers(self):
         """Update controller states from pygame events"""
-        for event in pygame.event.get():
+        if self.input_scheduler is not None:
+            # Joystick events belong to the input thread
+            events = pygame.event.get(exclude=JOYSTICK_EVENTS)
+        else:
+            events = pygame.event.get()
+        # Closest we get to the keypress time; fan-out timings start here
+        pressed = time.perf_counter()
+        if self._pending_events:
+            events = self._pending_events + events
+            self._pending_events = []
+        for event in events:
             if event.type == pygame.QUIT:
                 self.running = False
             
-            elif event.type == pygame.JOYBUTTONDOWN or event.type == pygame.JOYBUTTONUP:
-                controller_index = event.joy
-                if controller_index in self.controllers:
-                    controller = self.controllers[controller_index]
-                    pressed = (event.type == pygame.JOYBUTTONDOWN)
-                    
-                    # PS5 controller button mappings
-                    if event.button == 0:  # Cross
-                        controller.cross = pressed
-                    elif event.button == 1:  # Circle
-                        controller.circle = pressed
-                    elif event.button == 2:  # Square
-                        controller.square = pressed
-                    elif event.button == 3:  # Triangle
-                        controller.triangle = pressed
-            
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE:
                     self.running = False
                 elif event.key == pygame.K_SPACE:
                     # Toggle emergency stop
-                    self.emergency_stop = not self.emergency_stop
-                    self._send_emergency_stop(self.emergency_stop)
-                    print(f"Emergency stop: {self.emergency_stop}")
+                    self.set_emergency_stop(not self.emergency_stop, started=pressed)
                 elif event.key == pygame.K_1:
-                    self.game_status = "standby"
-                    for robot_id in self.robots:
-                        self._send_game_status(robot_id)
-                    print("Game status: standby")
+                    self.set_game_status("standby", started=pressed)
                 elif event.key == pygame.K_2:
-                    self.game_status = "teleop"
-                    for robot_id in self.robots:
-                        self._send_game_status(robot_id)
-                    print("Game status: teleop")
+                    self.set_game_status("teleop", started=pressed)
                 elif event.key == pygame.K_3:
-                    self.game_status = "autonomous"
-                    for robot_id in self.robots:
-                        self._send_game_status(robot_id)
-                    print("Game status: autonomous")
+                    self.set_game_status("autonomous", started=pressed)
+                elif event.key == pygame.K_l:
+                    self.set_log_level(None)
             
-            elif event.type == pygame.MOUSEBUTTONDOWN:
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
                 self._handle_mouse_click(event.pos)
+            
+            elif event.type == pygame.MOUSEWHEEL:
+                self._handle_mouse_wheel(event.y)
+            
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                # Window contents were lost; repaint everything
+                self._ui_full_redraw = True
+                self.state_version += 1
+
+            elif event.type in JOYSTICK_EVENTS:
+                self._dispatch_joystick_event(event)
         
-        # Update joystick axes
-        for controller in self.controllers.values():
-            if controller.joystick and controller.connected:
-                # Map joystick axes from -1..1 to 0..255
-                left_x = int((controller.joystick.get_axis(0) + 1.0) * 127.5)
-                left_y = int((controller.joystick.get_axis(1) + 1.0) * 127.5)
-                right_x = int((controller.joystick.get_axis(2) + 1.0) * 127.5)
-                right_y = int((controller.joystick.get_axis(3) + 1.0) * 127.5)
-                
-                controller.left_x = max(0, min(255, left_x))
-                controller.left_y = max(0, min(255, left_y))
-                controller.right_x = max(0, min(255, right_x))
-                controller.right_y = max(0, min(255, right_y))
+        if self.input_scheduler is None:
+            self._poll_inputs(time.monotonic())
+
+    def _dispatch_joystick_event(self, event: pygame.event.Event):
+        """Hand a joystick event to the input source that owns the joystick"""
+        for source in self.input_sources:
+            if source.handle_event(event):
+                return
+
+    def _input_tick(self):
+        """Input thread: pump joystick events, poll the sources and publish"""
+        # Pumps SDL's queue and takes only joystick events, leaving the rest
+        # for the UI loop
+        for event in pygame.event.get(eventtype=JOYSTICK_EVENTS):
+            self._dispatch_joystick_event(event)
+        version = self.state_version
+        self._poll_inputs(time.monotonic())
+        self._publish_controller_snapshots()
+        if self.state_version != version:
+            self._bump_state()
+
+    def _poll_inputs(self, now: float):
+        """Read every input source, then map and shape all sticks in one step"""
+        readings = []
+        for source, indices in self._input_slots:
+            for index, sample in zip(indices, source.poll(now)):
+                if sample is not None:
+                    readings.append((self.controllers[index], sample))
+        if not readings:
+            return
+        trace = self.input_trace
+        shaped = self.axis_shaper.shape_many([sample.axes for _, sample in readings])
+        for (controller, sample), axes in zip(readings, shaped):
+            controller.left_x, controller.left_y, controller.right_x, controller.right_y = axes
+            # Triggers are not sticks, so they skip shaping
+            if sample.triggers is not None:
+                controller.left_trigger = axis_byte(sample.triggers[0])
+                controller.right_trigger = axis_byte(sample.triggers[1])
+            buttons = sample.buttons
+            controller.cross = bool(buttons & CROSS)
+            controller.circle = bool(buttons & CIRCLE)
+            controller.square = bool(buttons & SQUARE)
+            controller.triangle = bool(buttons & TRIANGLE)
+            if trace is not None:
+                trace.write(now, controller.index, sample)
     
     def _refresh_robots(self):
         """Clear robot list and force rediscovery"""
-        print("Refreshing robot list...")
+        log.info("Refreshing robot list...")
+        if self._expiry_timer is not None:
+            self._expiry_timer.cancel()
+        self._expiry_timer = None
+        self._expiry_deadline = None
         self.robots.clear()
+        self._bump_state()
+        self.controller_packets.clear()
+        if self.fleet_packets is not None:
+            self.fleet_packets.clear()
         self.robot_controller_pairs.clear()
+        if self.socket_pool is not None:
+            self.socket_pool.close_all()
         self.selected_robot = None
-        print("Robot list cleared - waiting for discovery...")
+        log.info("Robot list cleared - waiting for discovery...")
+
+    def _build_hit_grid(self) -> HitGrid:
+        """Register clickable regions; earlier regions win where they overlap"""
+        grid = HitGrid()
+        grid.add(pygame.Rect(450, 120, 101, 26), self._click_refresh)
+        grid.add(pygame.Rect(50, LIST_TOP, 501, VISIBLE_ROWS * ROW_PITCH), self._click_robot_row)
+        grid.add(pygame.Rect(650, LIST_TOP, 501, VISIBLE_ROWS * ROW_PITCH), self._click_controller_row)
+        grid.add(pygame.Rect(500, 500, 201, 51), self._click_pair)
+        return grid
+
+    def _row_at(self, y: int, scroll: int) -> Optional[int]:
+        """List row under y, or None when y falls in the gap between rows"""
+        offset = y - LIST_TOP
+        if offset % ROW_PITCH > ROW_HEIGHT:
+            return None
+        return scroll + offset // ROW_PITCH
 
     def _handle_mouse_click(self, pos):
         """Handle mouse clicks for UI interactions"""
-        x, y = pos
+        # Selection highlights change on almost every click
+        self._bump_state()
+        self.hit_grid.hit(pos)
 
-        # Check if clicking refresh button
-        if 450 <= x <= 550 and 120 <= y <= 145:
-            self._refresh_robots()
-            return
+    def _handle_mouse_wheel(self, dy: int):
+        """Scroll whichever list is under the mouse pointer"""
+        x, _ = pygame.mouse.get_pos()
+        if x < ROBOTS_PANEL_RECT.right:
+            max_scroll = max(0, len(self.robots) - VISIBLE_ROWS)
+            self.robot_scroll = max(0, min(max_scroll, self.robot_scroll - dy))
+        else:
+            max_scroll = max(0, len(self._controller_slots()) - VISIBLE_ROWS)
+            self.controller_scroll = max(0, min(max_scroll, self.controller_scroll - dy))
+        self._bump_state()
 
-        # Check if clicking on robot boxes (left side)
-        robot_y_start = 150
-        robot_height = 120
-        for i, robot_id in enumerate(sorted(self.robots.keys())):
-            robot_y = robot_y_start + i * (robot_height + 10)
-            if 50 <= x <= 550 and robot_y <= y <= robot_y + robot_height:
-                self.selected_robot = robot_id
-                print(f"Selected robot: {robot_id}")
-                return
+    def _click_refresh(self, pos) -> bool:
+        self._refresh_robots()
+        return True
 
-        # Check if clicking on controller boxes (right side)
-        controller_y_start = 150
-        controller_height = 120
-        for i in range(2):
-            controller_y = controller_y_start + i * (controller_height + 10)
-            if 650 <= x <= 1150 and controller_y <= y <= controller_y + controller_height:
-                self.selected_controller = i if i in self.controllers else None
-                print(f"Selected controller: {i}")
-                return
+    def _click_robot_row(self, pos) -> bool:
+        row = self._row_at(pos[1], self.robot_scroll)
+        if row is None or row >= len(self._robot_rows):
+            return False
+        robot_id = self._robot_rows[row]
+        self.selected_robot = robot_id
+        log.info("Selected robot: %s", robot_id)
+        return True
+
+    def _click_controller_row(self, pos) -> bool:
+        row = self._row_at(pos[1], self.controller_scroll)
+        if row is None or row >= len(self._controller_rows):
+            return False
+        i = self._controller_rows[row]
+        self.selected_controller = i if i in self.controllers else None
+        log.info("Selected controller: %d", i)
+        return True
 
-        # Check if clicking pair button
-        if 500 <= x <= 700 and 500 <= y <= 550:
-            if self.selected_robot and self.selected_controller is not None:
-                self.robot_controller_pairs[self.selected_robot] = self.selected_controller
-                print(f"Paired {self.selected_robot} with controller {self.selected_controller}")
-                self.selected_robot = None
-                self.selected_controller = None
+    def _click_pair(self, pos) -> bool:
+        if self.selected_robot and self.selected_controller is not None:
+            try:
+                self.pair(self.selected_robot, self.selected_controller)
+            except KeyError as e:
+                log.warning("Cannot pair: %s", e)
+            self.selected_robot = None
+            self.selected_controller = None
+        return True
     
-    def _draw_ui(self):
-        """Draw the user interface"""
-        self.screen.fill(BLACK)
-        
-        # Title
+    def _prerender_chrome(self):
+        """Render text and buttons that never change once, up front"""
         title = self.title_font.render("Minibot Driver Station", True, WHITE)
+        estop_text = self.title_font.render("EMERGENCY STOP", True, RED)
+
+        refresh_button = pygame.Surface((100, 25))
+        refresh_button.fill(ORANGE)
+        refresh_button.blit(self.font.render("Refresh", True, BLACK), (15, 2))
+
+        instructions = [
+            "Controls:",
+            "1: Standby | 2: Teleop | 3: Autonomous",
+            "SPACE: Emergency Stop | L: Log level",
+            "Click robot and controller, then PAIR button",
+            "ESC: Quit"
+        ]
+
+        self.chrome = {
+            "title": title,
+            "estop": estop_text,
+            "robots_label": self.font.render("Robots:", True, WHITE),
+            "controllers_label": self.font.render("Controllers:", True, WHITE),
+            "refresh_button": refresh_button,
+            "pair_text": self.font.render("PAIR", True, WHITE),
+            "instructions": [self.font.render(line, True, GRAY) for line in instructions],
+        }
+
+    def _text(self, text: str, color, font=None) -> pygame.Surface:
+        """Render text through the LRU surface cache"""
+        return self.text_cache.render(font or self.font, text, color)
+
+    def _header_state(self):
+        return (self.game_status, self.emergency_stop)
+
+    def _draw_header(self):
+        title = self.chrome["title"]
         self.screen.blit(title, (SCREEN_WIDTH // 2 - title.get_width() // 2, 20))
         
         # Game status indicator
         status_color = GREEN if self.game_status == "teleop" else YELLOW if self.game_status == "autonomous" else GRAY
-        status_text = self.font.render(f"Status: {self.game_status.upper()}", True, status_color)
+        status_text = self._text(f"Status: {self.game_status.upper()}", status_color)
         self.screen.blit(status_text, (SCREEN_WIDTH // 2 - status_text.get_width() // 2, 60))
         
         # Emergency stop indicator
         if self.emergency_stop:
-            estop_text = self.title_font.render("EMERGENCY STOP", True, RED)
+            estop_text = self.chrome["estop"]
             pygame.draw.rect(self.screen, RED, (SCREEN_WIDTH // 2 - 150, 90, 300, 40), 3)
             self.screen.blit(estop_text, (SCREEN_WIDTH // 2 - estop_text.get_width() // 2, 95))
-        
-        # Draw robots (left side)
-        robot_label = self.font.render("Robots:", True, WHITE)
-        self.screen.blit(robot_label, (50, 120))
-
-        # Draw refresh button
-        refresh_color = ORANGE
-        pygame.draw.rect(self.screen, refresh_color, (450, 120, 100, 25))
-        refresh_text = self.font.render("Refresh", True, BLACK)
-        self.screen.blit(refresh_text, (465, 122))
-        
-        robot_y = 150
-        for robot_id in sorted(self.robots.keys()):
-            robot_info = self.robots[robot_id]
+
+        # Panel labels sit above the lists and overlap the e-stop box
+        self.screen.blit(self.chrome["robots_label"], (50, 120))
+        self.screen.blit(self.chrome["refresh_button"], (450, 120))
+        self.screen.blit(self.chrome["controllers_label"], (650, 120))
+
+    def _robots_state(self):
+        robots = self.robots
+        # Rows only need re-sorting when robots come or go
+        if self._robot_rows_version != robots.version:
+            self._robot_rows_version = robots.version
+            self._robot_rows = sorted(robots)
+        max_scroll = max(0, len(self._robot_rows) - VISIBLE_ROWS)
+        self.robot_scroll = min(self.robot_scroll, max_scroll)
+
+        # Only rows on screen take part, so off-screen churn costs no redraw
+        state = [self.selected_robot, self.robot_scroll, len(self._robot_rows)]
+        for robot_id in self._robot_rows[self.robot_scroll:self.robot_scroll + VISIBLE_ROWS]:
+            robot_info = robots.get(robot_id)
+            if robot_info is None:
+                continue
+            packet = self.controller_packets.get(robot_id)
+            state.append((
+                robot_id, robot_info.ip, robot_info.port, robot_info.connected, robot_info.protocol,
+                self.robot_controller_pairs.get(robot_id),
+                (packet.sent_count, packet.saved_count) if packet is not None else None,
+                self._unreachable_count(robot_id),
+                self.estop.acks.get(robot_id)
+            ))
+        state.append(self._robot_detail(self.selected_robot))
+        return tuple(state)
+
+    def _robot_detail(self, robot_id: Optional[str]) -> Optional[str]:
+        """One line of address and traffic for the selected robot"""
+        robot_info = self.robots.get(robot_id) if robot_id is not None else None
+        if robot_info is None:
+            return None
+        detail = f"{robot_id}: {robot_info.ip}:{robot_info.port}"
+        if robot_info.protocol == PROTOCOL_V2:
+            detail += f" v2 slot {robot_info.slot}"
+        packet = self.controller_packets.get(robot_id)
+        if packet is not None:
+            detail += f"  Sent: {packet.sent_count}  Saved: {packet.saved_count}"
+        return detail
+
+    def _draw_robots(self):
+        robot_y = LIST_TOP
+        visible = self._robot_rows[self.robot_scroll:self.robot_scroll + VISIBLE_ROWS]
+        for robot_id in visible:
+            robot_info = self.robots.get(robot_id)
+            if robot_info is None:
+                continue
             
-            # Draw robot box
+            # Draw robot row
             color = BLUE if self.selected_robot == robot_id else DARK_GRAY
-            pygame.draw.rect(self.screen, color, (50, robot_y, 500, 120), 2)
+            pygame.draw.rect(self.screen, color, (50, robot_y, 500, ROW_HEIGHT), 1)
+            text_y = robot_y + 4
             
-            # Robot info
-            name_text = self.font.render(f"Robot: {robot_id}", True, WHITE)
-            ip_text = self.font.render(f"IP: {robot_info.ip}", True, GRAY)
-            port_text = self.font.render(f"Port: {robot_info.port}", True, GRAY)
-            status_text = self.font.render(
-                f"Status: {'Connected' if robot_info.connected else 'Disconnected'}",
-                True, GREEN if robot_info.connected else RED
+            self.screen.blit(self._text(robot_id[:16], WHITE), (60, text_y))
+            status_text = self._text(
+                "Connected" if robot_info.connected else "Disconnected",
+                GREEN if robot_info.connected else RED
             )
+            self.screen.blit(status_text, (200, text_y))
             
             # Check if paired with controller
             paired_controller = self.robot_controller_pairs.get(robot_id)
-            if paired_controller is not None:
-                pair_text = self.font.render(f"Paired with Controller {paired_controller}", True, YELLOW)
-                self.screen.blit(pair_text, (60, robot_y + 90))
-            
-            self.screen.blit(name_text, (60, robot_y + 10))
-            self.screen.blit(ip_text, (60, robot_y + 35))
-            self.screen.blit(port_text, (60, robot_y + 55))
-            self.screen.blit(status_text, (300, robot_y + 10))
+            pair_text = self._text(f"Ctrl {paired_controller}", YELLOW) if paired_controller is not None \
+                else self._text("Ctrl -", GRAY)
+            self.screen.blit(pair_text, (320, text_y))
+
+            # Last column: e-stop acks, then socket errors, then the port
+            ack = self.estop.acks.get(robot_id)
+            unreachable = self._unreachable_count(robot_id)
+            if ack is not None:
+                if ack.latency_s is not None:
+                    extra_text = self._text(f"Ack {ack.latency_s * 1000:.1f} ms", GREEN)
+                elif ack.gave_up:
+                    extra_text = self._text("Ack: none", RED)
+                else:
+                    extra_text = self._text("Ack: waiting", YELLOW)
+            elif unreachable:
+                extra_text = self._text(f"Unreachable: {unreachable}", RED)
+            else:
+                extra_text = self._text(
+                    f"Port {robot_info.port}" + (" v2" if robot_info.protocol == PROTOCOL_V2 else ""), GRAY
+                )
+            self.screen.blit(extra_text, (400, text_y))
             
-            robot_y += 130
-        
-        # Draw controllers (right side)
-        controller_label = self.font.render("Controllers:", True, WHITE)
-        self.screen.blit(controller_label, (650, 120))
-        
-        controller_y = 150
-        for i in range(2):
-            # Draw controller box
+            robot_y += ROW_PITCH
+
+        self._draw_scroll_hint(60, self.robot_scroll, len(self._robot_rows))
+
+        detail = self._robot_detail(self.selected_robot)
+        if detail is not None:
+            # Counters change constantly, so keep them out of the cache
+            self.screen.blit(self.font.render(detail, True, GRAY), ROBOT_DETAIL_POS)
+
+    def _unreachable_count(self, robot_id: str) -> int:
+        """ICMP port-unreachable errors seen on robot_id's connected socket"""
+        if self.socket_pool is None:
+            return 0
+        return self.socket_pool.unreachable.get(robot_id, 0)
+
+    def _controller_slots(self):
+        """Controller indices listed in the UI, including empty low slots"""
+        slots = max(MIN_CONTROLLER_SLOTS, max(self.controllers, default=-1) + 1)
+        return list(range(slots))
+
+    def _controllers_state(self):
+        self._controller_rows = self._controller_slots()
+        max_scroll = max(0, len(self._controller_rows) - VISIBLE_ROWS)
+        self.controller_scroll = min(self.controller_scroll, max_scroll)
+
+        state = [self.selected_controller, self.controller_scroll, len(self._controller_rows)]
+        for i in self._controller_rows[self.controller_scroll:self.controller_scroll + VISIBLE_ROWS]:
+            controller = self.controllers.get(i)
+            if controller is not None:
+                state.append((
+                    i, controller.name, controller.left_x, controller.left_y,
+                    controller.right_x, controller.right_y,
+                    controller.cross, controller.circle, controller.square, controller.triangle
+                ))
+        return tuple(state)
+
+    def _draw_controllers(self):
+        controller_y = LIST_TOP
+        visible = self._controller_rows[self.controller_scroll:self.controller_scroll + VISIBLE_ROWS]
+        for i in visible:
+            # Draw controller row
             color = BLUE if self.selected_controller == i else DARK_GRAY
-            pygame.draw.rect(self.screen, color, (650, controller_y, 500, 120), 2)
+            pygame.draw.rect(self.screen, color, (650, controller_y, 500, ROW_HEIGHT), 1)
+            text_y = controller_y + 4
             
-            if i in self.controllers:
-                controller = self.controllers[i]
-                name_text = self.font.render(f"Controller {i}: {controller.name[:30]}", True, WHITE)
+            controller = self.controllers.get(i)
+            if controller is not None:
+                name_text = self._text(f"{i}: {controller.name[:18]}", WHITE)
                 
                 # Joystick values
-                left_text = self.font.render(
-                    f"Left: ({controller.left_x}, {controller.left_y})",
-                    True, GRAY
-                )
-                right_text = self.font.render(
-                    f"Right: ({controller.right_x}, {controller.right_y})",
-                    True, GRAY
+                axes_text = self._text(
+                    f"L {controller.left_x},{controller.left_y}  R {controller.right_x},{controller.right_y}",
+                    GRAY
                 )
                 
-                # Button states
-                buttons_text = self.font.render(
-                    f"X:{controller.cross} O:{controller.circle} □:{controller.square} △:{controller.triangle}",
-                    True, GRAY
-                )
+                # Pressed buttons
+                pressed = [symbol for symbol, down in (("X", controller.cross), ("O", controller.circle),
+                                                       ("Sq", controller.square), ("Tri", controller.triangle))
+                           if down]
+                buttons_text = self._text(" ".join(pressed) or "-", GRAY)
                 
-                self.screen.blit(name_text, (660, controller_y + 10))
-                self.screen.blit(left_text, (660, controller_y + 40))
-                self.screen.blit(right_text, (660, controller_y + 65))
-                self.screen.blit(buttons_text, (660, controller_y + 90))
+                self.screen.blit(name_text, (660, text_y))
+                self.screen.blit(axes_text, (840, text_y))
+                self.screen.blit(buttons_text, (1040, text_y))
             else:
-                no_controller = self.font.render(f"Controller {i}: Not Connected", True, GRAY)
-                self.screen.blit(no_controller, (660, controller_y + 50))
+                no_controller = self._text(f"{i}: Not Connected", GRAY)
+                self.screen.blit(no_controller, (660, text_y))
             
-            controller_y += 130
-        
-        # Draw pairing button
+            controller_y += ROW_PITCH
+
+        self._draw_scroll_hint(660, self.controller_scroll, len(self._controller_rows))
+
+    def _draw_scroll_hint(self, x: int, scroll: int, total: int):
+        """Show which rows of a scrolled list are visible"""
+        if total <= VISIBLE_ROWS:
+            return
+        last = min(total, scroll + VISIBLE_ROWS)
+        hint = self._text(f"Showing {scroll + 1}-{last} of {total} (scroll for more)", GRAY)
+        self.screen.blit(hint, (x, LIST_TOP + VISIBLE_ROWS * ROW_PITCH + 4))
+
+    def _draw_pair_button(self):
         pair_button_color = GREEN if self.selected_robot and self.selected_controller is not None else DARK_GRAY
-        pygame.draw.rect(self.screen, pair_button_color, (500, 500, 200, 50))
-        pair_text = self.font.render("PAIR", True, WHITE)
-        self.screen.blit(pair_text, (580, 512))
-        
-        # Draw instructions
-        instructions = [
-            "Controls:",
-            "1: Standby | 2: Teleop | 3: Autonomous",
-            "SPACE: Emergency Stop",
-            "Click robot and controller, then PAIR button",
-            "ESC: Quit"
-        ]
-        
+        pygame.draw.rect(self.screen, pair_button_color, PAIR_BUTTON_RECT)
+        self.screen.blit(self.chrome["pair_text"], (580, 512))
+
+    def _footer_state(self):
+        return (self.logs.level_name, self.logs.dropped)
+
+    def _draw_footer(self):
         y_offset = 580
-        for instruction in instructions:
-            text = self.font.render(instruction, True, GRAY)
+        for text in self.chrome["instructions"]:
             self.screen.blit(text, (50, y_offset))
             y_offset += 25
-        
-        pygame.display.flip()
+
+        dropped = self.logs.dropped
+        log_text = self._text(f"Log: {self.logs.level_name}" + (f" ({dropped} dropped)" if dropped else ""),
+                              YELLOW if self.logs.level_name == "DEBUG" else GRAY)
+        self.screen.blit(log_text, (SCREEN_WIDTH - 50 - log_text.get_width(), 580))
+
+    def _draw_ui(self):
+        """Redraw the panels whose state changed and push only those rects"""
+        panels = (
+            ("header", HEADER_RECT, self._header_state, self._draw_header),
+            ("robots", ROBOTS_PANEL_RECT, self._robots_state, self._draw_robots),
+            ("controllers", CONTROLLERS_PANEL_RECT, self._controllers_state, self._draw_controllers),
+            ("footer", FOOTER_RECT, self._footer_state, self._draw_footer),
+        )
+
+        full_redraw = self._ui_full_redraw
+        dirty = []
+        for name, rect, get_state, draw in panels:
+            state = get_state()
+            if full_redraw or self._panel_states.get(name) != state:
+                self._panel_states[name] = state
+                self.screen.set_clip(rect)
+                self.screen.fill(BLACK, rect)
+                draw()
+                dirty.append(rect)
+        self.screen.set_clip(None)
+
+        # The pair button straddles both list panels, so repaint it on top
+        # whenever either of them was cleared
+        pair_state = bool(self.selected_robot and self.selected_controller is not None)
+        if dirty or self._panel_states.get("pair") != pair_state:
+            self._panel_states["pair"] = pair_state
+            self._draw_pair_button()
+            dirty.append(PAIR_BUTTON_RECT)
+
+        if full_redraw:
+            self._ui_full_redraw = False
+            pygame.display.flip()
+        elif dirty:
+            pygame.display.update(dirty)
     
     def run(self):
         """Main application loop"""
@@ -479,32 +1535,176 @@ class DriverStation:
         print("  2 - Set to Teleop mode")
         print("  3 - Set to Autonomous mode")
         print("  SPACE - Toggle Emergency Stop")
+        print("  L - Cycle log level")
         print("  ESC - Quit")
+        print(f"Transmitting controller data at {self.transmit_scheduler.rate_hz:g} Hz")
+        
+        self._publish_controller_snapshots()
+        self.transmit_scheduler.start()
+        if self.input_scheduler is not None:
+            self.input_scheduler.start()
         
         while self.running:
             self._update_controllers()
+            self._publish_controller_snapshots()
             
-            # Send controller data to paired robots
-            for robot_id, controller_index in self.robot_controller_pairs.items():
-                if controller_index in self.controllers and robot_id in self.robots:
-                    controller = self.controllers[controller_index]
-                    self._send_controller_data(robot_id, controller)
-            
-            self._draw_ui()
-            self.clock.tick(FPS)
+            if self.state_version != self._rendered_version:
+                # Busy: render every change, capped at the display refresh rate
+                self._rendered_version = self.state_version
+                self._draw_ui()
+                self.clock.tick(self.busy_fps)
+            else:
+                # Idle: sleep until an input or wake event, or the idle tick.
+                # The idle redraw picks up transmit counters, which do not
+                # bump the version.
+                self._wait_for_activity(self._idle_timeout_ms())
+                self._draw_ui()
         
-        # Cleanup
-        print("Shutting down driver station...")
+        self.shutdown()
+
+    def _idle_timeout_ms(self) -> int:
+        """How long the idle UI loop may sleep before the next input poll
+
+        Joysticks wake the loop with their events, but other sources only
+        produce data when polled, so while any are in use the loop wakes
+        at the input rate (unless the input thread polls them instead).
+        """
+        timeout_ms = 1000 // IDLE_FPS
+        if self.input_scheduler is None and any(not isinstance(source, PygameInput)
+                                                for source in self.input_sources):
+            timeout_ms = min(timeout_ms, max(1, int(1000 / self.input_rate)))
+        return timeout_ms
+
+    def _wait_for_activity(self, timeout_ms: int):
+        """Block until a pygame event arrives or timeout_ms passes
+
+        With the input thread, joystick events are left in the queue for it:
+        the loop only peeks for UI events, waking when the thread posts its
+        wake event after a reading changes.
+        """
+        if self.input_scheduler is not None:
+            deadline = time.monotonic() + timeout_ms / 1000
+            while not pygame.event.peek(self._ui_event_types):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                time.sleep(min(remaining, IDLE_POLL_MS / 1000))
+            return
+        event = pygame.event.wait(timeout_ms)
+        if event.type != pygame.NOEVENT:
+            # Handled first on the next _update_controllers pass
+            self._pending_events.append(event)
+
+    def shutdown(self):
+        """Stop robots and release sockets and pygame"""
+        log.info("Shutting down driver station...")
+        if self.input_scheduler is not None:
+            self.input_scheduler.stop()
+        self.transmit_scheduler.stop()
         self.emergency_stop = True
         self._send_emergency_stop(True)
         time.sleep(0.5)
+        self.network.stop()
+        self.network_thread.join(timeout=1.0)
+        self.network.close()
+        if self.recorder is not None:
+            self.recorder.close()
+        for source in self.input_sources:
+            source.close()
+        if self.input_trace is not None:
+            self.input_trace.close()
+        if self.socket_pool is not None:
+            self.socket_pool.close_all()
         self.udp_socket.close()
         pygame.quit()
+        self.logs.stop()
 
 def main():
+    parser = argparse.ArgumentParser(description="Minibot Driver Station")
+    parser.add_argument("--rate", type=float, default=TRANSMIT_RATE_HZ,
+                        help=f"Controller transmit rate in Hz (default: {TRANSMIT_RATE_HZ})")
+    parser.add_argument("--keepalive", type=float, default=KEEPALIVE_INTERVAL,
+                        help=f"Seconds between resends of unchanged controller data (default: {KEEPALIVE_INTERVAL})")
+    parser.add_argument("--deadband", type=int, default=AXIS_DEADBAND,
+                        help=f"Axis change (0-255 counts) that triggers an immediate send (default: {AXIS_DEADBAND})")
+    parser.add_argument("--robot-timeout", type=float, default=ROBOT_TIMEOUT,
+                        help=f"Seconds without a DISCOVER before a robot is dropped (default: {ROBOT_TIMEOUT})")
+    parser.add_argument("--stick-deadband", type=float, default=0.0,
+                        help="Fraction of stick travel around center that reads as neutral (default: 0)")
+    parser.add_argument("--expo", type=float, default=0.0,
+                        help="Stick expo, 0 = linear to 1 = cubic (default: 0)")
+    parser.add_argument("--calibration", type=parse_offsets, default=(0.0,) * STICK_AXES,
+                        help="Per-axis stick offsets added before shaping: lx,ly,rx,ry")
+    parser.add_argument("--estop-bursts", type=int, default=ESTOP_BURSTS,
+                        help=f"Send each e-stop this many times to robots that cannot acknowledge it "
+                             f"(default: {ESTOP_BURSTS})")
+    parser.add_argument("--estop-broadcast", nargs="?", const=WIFI_BROADCAST, default=None,
+                        metavar="ADDRESS",
+                        help=f"Also broadcast e-stop to ADDRESS (default {WIFI_BROADCAST}, "
+                             f"or a subnet broadcast like 192.168.4.255)")
+    parser.add_argument("--protocol", type=int, choices=(PROTOCOL_V1, PROTOCOL_V2), default=PROTOCOL_V2,
+                        help="Highest controller protocol offered to robots that support it "
+                             f"(default: {PROTOCOL_V2})")
+    parser.add_argument("--connected-sockets", action="store_true",
+                        help="Send to each paired robot on its own connect()ed UDP socket")
+    parser.add_argument("--fleet-encoder", action="store_true",
+                        help="Encode all robots' packets in one NumPy array (needs numpy)")
+    parser.add_argument("--log-level", type=str.upper, choices=LEVEL_NAMES, default="INFO",
+                        help="Initial log level; press L (or 'log <level>' headless) to change it")
+    parser.add_argument("--record", default=None, metavar="DIR",
+                        help="Record every datagram sent and received to log segments in DIR")
+    parser.add_argument("--record-segment-mb", type=int, default=SEGMENT_SIZE // (1024 * 1024),
+                        help=f"Recording segment size in MiB (default: {SEGMENT_SIZE // (1024 * 1024)})")
+    parser.add_argument("--record-compress", choices=COMPRESSIONS, default=None,
+                        help="Compress finished recording segments (needs zstandard or lz4)")
+    parser.add_argument("--input", action="append", default=None, metavar="SOURCE",
+                        help="Controller input source, repeatable: pygame (default), trace:FILE[:SPEED], "
+                             "sine|step|random:N[:PERIOD] for N scripted controllers, "
+                             "udp:N[:PORT] or stdin:N for lines of '<controller> <lx> <ly> <rx> <ry> [buttons]'")
+    parser.add_argument("--record-input", default=None, metavar="FILE",
+                        help="Write every controller reading to a trace file (play back with --input trace:FILE)")
+    parser.add_argument("--input-rate", type=float, default=FPS,
+                        help=f"Input polls per second headless, with --input-thread, or for non-joystick "
+                             f"sources while the UI is idle (default: {FPS})")
+    parser.add_argument("--input-thread", action="store_true",
+                        help="Poll inputs and pump joystick events on their own thread at --input-rate, "
+                             "independent of the frame rate")
+    parser.add_argument("--headless", action="store_true",
+                        help="Run without a window; control through the CLI or control socket")
+    parser.add_argument("--control-port", type=int, default=None,
+                        help=f"Headless: accept commands on 127.0.0.1:<port> (e.g. {CONTROL_PORT})")
+    parser.add_argument("--script", default=None,
+                        help="Headless: run control commands from this file before the CLI")
+    parser.add_argument("--no-cli", action="store_true",
+                        help="Headless: do not read control commands from stdin")
+    args = parser.parse_args()
+    if args.headless and not args.no_cli and any(spec.startswith("stdin") for spec in args.input or ()):
+        parser.error("--input stdin:N needs --no-cli in headless mode")
+
     try:
-        station = DriverStation()
-        station.run()
+        inputs = [parse_input_spec(spec) for spec in args.input] if args.input else None
+        station = DriverStation(transmit_rate=args.rate, keepalive_interval=args.keepalive,
+                                deadband=args.deadband, robot_timeout=args.robot_timeout,
+                                headless=args.headless,
+                                fleet_encoder=args.fleet_encoder,
+                                connected_sockets=args.connected_sockets,
+                                estop_bursts=args.estop_bursts,
+                                protocol=args.protocol,
+                                log_level=args.log_level,
+                                record_dir=args.record,
+                                record_segment_size=args.record_segment_mb * 1024 * 1024,
+                                record_compression=args.record_compress,
+                                inputs=inputs, input_trace=args.record_input,
+                                input_rate=args.input_rate, input_thread=args.input_thread,
+                                estop_broadcast=args.estop_broadcast,
+                                stick_deadband=args.stick_deadband, expo=args.expo,
+                                axis_offsets=args.calibration)
+        if args.headless:
+            from headless import run_headless
+            run_headless(station, control_port=args.control_port, script=args.script,
+                         cli=not args.no_cli)
+        else:
+            station.run()
     except Exception as e:
         print(f"Error: {e}")
         import traceback
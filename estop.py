@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Reliable emergency stop for the driver station
+Sequenced e-stop datagrams are resent on an exponential schedule until
+every robot that supports acknowledgements has confirmed them
+"""
+
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from log_pipeline import get_logger
+from net_engine import FanOutReport, TimerHandle
+from state_store import CopyOnWriteDict
+
+# Robots listing this DISCOVER feature answer sequenced e-stops with an ack
+FEATURE_ESTOP_ACK = "estop-ack"
+
+ESTOP_ACK_PREFIX = b"ESTOP_ACK:"
+
+# Robots without acks get each e-stop change this many times, in case one
+# is lost on a busy network
+ESTOP_BURSTS = 3
+
+# First resend after ESTOP_RETRY_INTERVAL, doubling up to ESTOP_MAX_INTERVAL.
+# ESTOP_MAX_ATTEMPTS sends span about 4 s before a robot is reported as
+# not acknowledging.
+ESTOP_RETRY_INTERVAL = 0.02
+ESTOP_MAX_INTERVAL = 1.0
+ESTOP_MAX_ATTEMPTS = 10
+
+Address = Tuple[str, int]
+
+log = get_logger("estop")
+
+class EstopTarget(NamedTuple):
+    """A robot to deliver an e-stop change to"""
+    robot_id: str
+    addresses: Tuple[Address, ...]
+    acks: bool
+
+class EstopAck(NamedTuple):
+    """Delivery state of the latest e-stop change for one robot"""
+    sequence: int
+    latency_s: Optional[float]  # None until acknowledged
+    gave_up: bool = False
+
+class _Pending:
+    __slots__ = ("messages", "acks", "attempts")
+
+    def __init__(self, messages: List[Tuple[bytes, Address]], acks: bool):
+        self.messages = messages
+        self.acks = acks
+        self.attempts = 0
+
+def estop_message(enable: bool, sequence: Optional[int] = None) -> bytes:
+    """ESTOP / ESTOP_OFF, with ":<seq>" appended for robots that ack"""
+    message = "ESTOP" if enable else "ESTOP_OFF"
+    return message.encode() if sequence is None else f"{message}:{sequence}".encode()
+
+def parse_estop_ack(data) -> Optional[Tuple[str, int]]:
+    """Parse "ESTOP_ACK:<robotId>:<seq>" into (robot_id, seq)"""
+    parts = bytes(data).decode('utf-8', errors='ignore').split(":")
+    if len(parts) != 3 or parts[0] != "ESTOP_ACK":
+        return None
+    try:
+        return parts[1], int(parts[2])
+    except ValueError:
+        return None
+
+class ReliableEstop:
+    """Delivers each e-stop change to every robot until it is acknowledged
+
+    Every engage() takes a new sequence number. Robots advertising
+    FEATURE_ESTOP_ACK get "ESTOP:<seq>" or "ESTOP_OFF:<seq>", answer with
+    "ESTOP_ACK:<robotId>:<seq>", and are resent the message on an
+    exponential schedule until the ack arrives or max_attempts run out.
+    Older robots only understand the bare message and never answer, so
+    they get it legacy_sends times on the same schedule. A newer engage()
+    supersedes everything still pending for the previous one.
+
+    Sequence numbers start from the wall clock in milliseconds, so a
+    restarted station does not reuse numbers a robot has already seen.
+    """
+
+    def __init__(self, send: Callable[[list], int],
+                 call_later: Callable[[float, Callable[[], None]], TimerHandle],
+                 legacy_sends: int = ESTOP_BURSTS,
+                 max_attempts: int = ESTOP_MAX_ATTEMPTS,
+                 interval: float = ESTOP_RETRY_INTERVAL,
+                 max_interval: float = ESTOP_MAX_INTERVAL,
+                 on_change: Optional[Callable[[], None]] = None):
+        self.send = send
+        self.call_later = call_later
+        self.legacy_sends = max(1, legacy_sends)
+        self.max_attempts = max(1, max_attempts)
+        self.interval = interval
+        self.max_interval = max_interval
+        self.on_change = on_change
+        self.sequence = time.time_ns() // 1_000_000
+        self.report: Optional[FanOutReport] = None
+        # robot_id -> EstopAck for the latest change; read by the UI thread
+        self.acks: CopyOnWriteDict[str, EstopAck] = CopyOnWriteDict()
+        # robot_id (None for broadcast addresses) -> messages still being resent
+        self._pending: Dict[Optional[str], _Pending] = {}
+        self._started = 0.0
+        self._first_sent = 0.0
+        self._delay = interval
+        self._timer: Optional[TimerHandle] = None
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        """Robots still waiting for an ack on the latest change"""
+        return sum(1 for pending in self._pending.values() if pending.acks)
+
+    def engage(self, enable: bool, targets: Sequence[EstopTarget],
+               broadcast: Sequence[Address] = (), started: Optional[float] = None) -> FanOutReport:
+        """Send an e-stop change to targets and keep resending until acknowledged
+
+        started is the perf_counter() time of the triggering keypress.
+        """
+        if started is None:
+            started = time.perf_counter()
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self.sequence += 1
+            sequence = self.sequence
+            pending: Dict[Optional[str], _Pending] = {}
+            acks = {}
+            for target in targets:
+                message = estop_message(enable, sequence if target.acks else None)
+                pending[target.robot_id] = _Pending(
+                    [(message, address) for address in target.addresses], target.acks
+                )
+                if target.acks:
+                    acks[target.robot_id] = EstopAck(sequence, None)
+            if broadcast:
+                message = estop_message(enable)
+                pending[None] = _Pending([(message, address) for address in broadcast], False)
+            self._pending = pending
+            self.acks = CopyOnWriteDict(acks)
+            self._started = started
+            self._first_sent = time.perf_counter()
+            self._delay = self.interval
+            report = FanOutReport("estop" if enable else "estop_off", 0, 0, 0.0, 0.0)
+            self.report = report
+            self._send_round(report)
+            report.first_burst_s = report.last_datagram_s
+            self._schedule(sequence)
+        return report
+
+    def acknowledge(self, robot_id: str, sequence: int) -> Optional[float]:
+        """Record an ack; returns seconds since the first send, or None if stale"""
+        with self._lock:
+            pending = self._pending.get(robot_id)
+            if sequence != self.sequence or pending is None or not pending.acks:
+                return None
+            latency = time.perf_counter() - self._first_sent
+            del self._pending[robot_id]
+            self.acks[robot_id] = EstopAck(sequence, latency)
+            done = not self._pending
+            if done and self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if done:
+            self._finish(self.report)
+        if self.on_change is not None:
+            self.on_change()
+        return latency
+
+    def forget(self, robot_id: str):
+        """Stop resending to a robot that has gone away"""
+        with self._lock:
+            self._pending.pop(robot_id, None)
+            self.acks.pop(robot_id, None)
+
+    def cancel(self):
+        """Stop all resends"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._pending = {}
+
+    def _finish(self, report: FanOutReport):
+        """Log when the last datagram of a change went out, counted from the keypress"""
+        report.done = True
+        log.info("E-stop %s delivered: last of %d datagrams in %d bursts %.2f ms after the keypress",
+                 "on" if report.kind == "estop" else "off", report.datagrams, report.bursts,
+                 report.last_datagram_s * 1000)
+
+    def _send_round(self, report: FanOutReport):
+        messages = []
+        for pending in self._pending.values():
+            messages.extend(pending.messages)
+            pending.attempts += 1
+        report.datagrams += self.send(messages)
+        report.bursts += 1
+        report.last_datagram_s = time.perf_counter() - self._started
+
+    def _schedule(self, sequence: int):
+        if self._pending:
+            self._timer = self.call_later(self._delay, lambda: self._resend(sequence))
+
+    def _resend(self, sequence: int):
+        gave_up = []
+        with self._lock:
+            if sequence != self.sequence:
+                return  # superseded while this timer was firing
+            self._timer = None
+            # Drop robots that have had their last send before this round
+            for robot_id, pending in list(self._pending.items()):
+                limit = self.max_attempts if pending.acks else self.legacy_sends
+                if pending.attempts >= limit:
+                    del self._pending[robot_id]
+                    if pending.acks:
+                        self.acks[robot_id] = EstopAck(sequence, None, gave_up=True)
+                        gave_up.append(robot_id)
+            done = not self._pending
+            if not done:
+                self._send_round(self.report)
+                self._delay = min(self._delay * 2, self.max_interval)
+                self._schedule(sequence)
+        if done:
+            self._finish(self.report)
+        for robot_id in gave_up:
+            log.warning("No e-stop acknowledgement from %s after %d attempts", robot_id, self.max_attempts)
+        if gave_up and self.on_change is not None:
+            self.on_change()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Fleet packet encoder: every robot's controller packet in one NumPy array
+Optional; the driver station falls back to per-robot templates without NumPy
+"""
+
+import threading
+from typing import Dict, List, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+from packets import (CONTROLLER_PACKET_SIZE, NEUTRAL_AXIS, ROBOT_NAME_SIZE, ControllerPacket,
+                     encode_robot_name)
+
+HAVE_NUMPY = np is not None
+
+# Same 24 bytes as the packet parsed by minibot.cpp
+PACKET_DTYPE = np.dtype([
+    ("name", "S16"),
+    ("axes", "u1", (6,)),
+    ("buttons", "u1", (2,)),
+]) if HAVE_NUMPY else None
+
+class FleetPackets:
+    """Controller packets for many robots backed by one structured array
+
+    Each robot keeps a stable row. Its ControllerPacket's buffer is a
+    zero-copy memoryview of that row, so the per-robot send path and the
+    vectorized update write the same bytes. Rows are reused after
+    release, and the array doubles when full. A lock serializes the
+    transmit thread's updates with row changes from the network thread.
+    """
+
+    def __init__(self, capacity: int = 16):
+        if not HAVE_NUMPY:
+            raise RuntimeError("The fleet encoder needs NumPy (pip install numpy)")
+        self.records = np.zeros(max(1, capacity), dtype=PACKET_DTYPE)
+        self._data = self._data_view()
+        self.rows: Dict[str, int] = {}
+        self.packets: Dict[str, ControllerPacket] = {}
+        self._free: List[int] = list(range(len(self.records) - 1, -1, -1))
+        # Row index array for the last robot order passed to update()
+        self._order: tuple = ()
+        self._order_rows = None
+        self._order_complete = True
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _data_view(self) -> "np.ndarray":
+        """(rows, 8) uint8 view of the axes and button bytes"""
+        raw = self.records.view(np.uint8).reshape(len(self.records), CONTROLLER_PACKET_SIZE)
+        return raw[:, ROBOT_NAME_SIZE:]
+
+    def _row_view(self, row: int) -> memoryview:
+        start = row * CONTROLLER_PACKET_SIZE
+        return memoryview(self.records).cast('B')[start:start + CONTROLLER_PACKET_SIZE]
+
+    def _grow(self):
+        old = self.records
+        self.records = np.zeros(len(old) * 2, dtype=PACKET_DTYPE)
+        self.records[:len(old)] = old
+        self._data = self._data_view()
+        self._free.extend(range(len(self.records) - 1, len(old) - 1, -1))
+        # Old views point into the old array; rebind every packet
+        for robot_id, packet in self.packets.items():
+            packet.buffer = self._row_view(self.rows[robot_id])
+
+    def packet(self, robot_id: str) -> ControllerPacket:
+        """The packet template for robot_id, allocating a row on first use"""
+        with self._lock:
+            packet = self.packets.get(robot_id)
+            if packet is not None:
+                return packet
+            if not self._free:
+                self._grow()
+            row = self._free.pop()
+            record = self.records[row]
+            record["name"] = encode_robot_name(robot_id)
+            record["axes"] = NEUTRAL_AXIS
+            record["buttons"] = 0
+            self.rows[robot_id] = row
+            packet = ControllerPacket(robot_id, self._row_view(row))
+            self.packets[robot_id] = packet
+            self._order = ()
+            return packet
+
+    def release(self, robot_id: str):
+        """Give robot_id's row back for reuse"""
+        with self._lock:
+            row = self.rows.pop(robot_id, None)
+            if row is not None:
+                self.packets.pop(robot_id, None)
+                self._free.append(row)
+                self._order = ()
+
+    def clear(self):
+        with self._lock:
+            self._order = ()
+            self.rows.clear()
+            self.packets.clear()
+            self._free = list(range(len(self.records) - 1, -1, -1))
+
+    def update(self, robot_ids: Sequence[str], values) -> "np.ndarray":
+        """Write controller values for robot_ids in one vectorized step
+
+        values is an (n, 8) array or sequence of CONTROLLER_DATA tuples, in
+        the same order as robot_ids. Robots released meanwhile are skipped.
+        Returns the uint8 array of values.
+        """
+        order = tuple(robot_ids)
+        values = np.asarray(values, dtype=np.uint8).reshape(len(order), 8)
+        with self._lock:
+            if order != self._order:
+                self._order = order
+                self._order_rows = np.fromiter((self.rows.get(robot_id, -1) for robot_id in order),
+                                               dtype=np.intp, count=len(order))
+                self._order_complete = bool((self._order_rows >= 0).all())
+            rows = self._order_rows
+            # axes and buttons are contiguous, so one fancy-indexed store covers both
+            if self._order_complete:
+                self._data[rows] = values
+            else:
+                present = rows >= 0
+                self._data[rows[present]] = values[present]
+        return values
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Flight recorder: every datagram the driver station sends or receives,
+appended to memory-mapped, preallocated log segments
+Compression of finished segments is optional (zstandard or lz4)
+"""
+
+import mmap
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+from typing import BinaryIO, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from log_pipeline import get_logger
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # lz4 is optional
+    lz4_frame = None
+
+log = get_logger("recorder")
+
+HAVE_ZSTD = zstandard is not None
+HAVE_LZ4 = lz4_frame is not None
+
+# Segment layout (little-endian):
+# Header: magic, format version, header size, wall clock and monotonic
+# clock in ns when the segment was opened
+# Records: monotonic ns, direction, IPv4 address, port, payload length,
+# then the payload. A zero timestamp marks the unused, preallocated tail.
+SEGMENT_MAGIC = b"MBFR"
+SEGMENT_VERSION = 1
+SEGMENT_HEADER = struct.Struct('<4sHHQQ')
+RECORD_HEADER = struct.Struct('<QB4sHH')
+SEGMENT_SUFFIX = ".mbfr"
+
+RECEIVED = 0
+SENT = 1
+
+SEGMENT_SIZE = 16 * 1024 * 1024
+MAX_SEGMENTS = 16
+
+COMPRESSIONS = ("zstd", "lz4")
+_COMPRESSED_SUFFIX = {"zstd": ".zst", "lz4": ".lz4"}
+
+_NO_ADDRESS = bytes(4)
+
+class Record(NamedTuple):
+    """One recorded datagram"""
+    timestamp: float  # time.monotonic() of the station when recorded
+    wall_time: float  # the same moment as time.time()
+    direction: int    # RECEIVED or SENT
+    address: Tuple[str, int]
+    data: bytes
+
+def _compress(path: str, compression: str) -> str:
+    with open(path, "rb") as f:
+        data = f.read()
+    if compression == "zstd":
+        data = zstandard.ZstdCompressor().compress(data)
+    else:
+        data = lz4_frame.compress(data)
+    compressed = path + _COMPRESSED_SUFFIX[compression]
+    with open(compressed + ".tmp", "wb") as f:
+        f.write(data)
+    os.replace(compressed + ".tmp", compressed)
+    os.remove(path)
+    return compressed
+
+def _decompress(path: str) -> bytes:
+    with open(path, "rb") as f:
+        data = f.read()
+    if path.endswith(_COMPRESSED_SUFFIX["zstd"]):
+        if not HAVE_ZSTD:
+            raise RuntimeError(f"{path} needs zstandard to read (pip install zstandard)")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if path.endswith(_COMPRESSED_SUFFIX["lz4"]):
+        if not HAVE_LZ4:
+            raise RuntimeError(f"{path} needs lz4 to read (pip install lz4)")
+        return lz4_frame.decompress(data)
+    return data
+
+class _Segment(NamedTuple):
+    """An open, mapped segment file"""
+    path: str
+    file: BinaryIO
+    map: mmap.mmap
+
+class FlightRecorder:
+    """Appends datagrams to a directory of rotating log segments
+
+    Each segment is a preallocated file mapped into memory, so recording
+    is a pack_into and a slice copy under a lock; nothing is written or
+    flushed from the caller's thread, and the kernel persists the pages
+    even if the station crashes. A background thread keeps the next
+    segment open and mapped, so a full segment is swapped for it without
+    touching the filesystem; the same thread trims, closes, compresses
+    and prunes finished segments. If the spare is not ready yet, the
+    datagram is counted in dropped rather than making the caller wait.
+    """
+
+    def __init__(self, directory: str, segment_size: int = SEGMENT_SIZE,
+                 max_segments: Optional[int] = MAX_SEGMENTS, compression: Optional[str] = None):
+        if compression is not None:
+            if compression not in COMPRESSIONS:
+                raise ValueError(f"Unknown compression: {compression}")
+            if compression == "zstd" and not HAVE_ZSTD:
+                raise RuntimeError("zstd compression needs zstandard (pip install zstandard)")
+            if compression == "lz4" and not HAVE_LZ4:
+                raise RuntimeError("lz4 compression needs lz4 (pip install lz4)")
+        if segment_size < SEGMENT_HEADER.size + RECORD_HEADER.size:
+            raise ValueError(f"Segment size too small: {segment_size}")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_size = segment_size
+        self.max_segments = max_segments
+        self.compression = compression
+        self.records = 0
+        self.dropped = 0  # datagrams too large for a segment, or that found no spare ready
+        self.segments: List[str] = []  # closed segments, oldest first
+        self.path: Optional[str] = None
+        self._index = 0
+        self._file = None
+        self._map: Optional[mmap.mmap] = None
+        self._offset = 0
+        self._spare: Optional[_Segment] = None
+        self._addresses: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        self._tasks: queue.Queue = queue.Queue()
+        self._use(self._open_segment())
+        self._worker = threading.Thread(target=self._work, daemon=True)
+        self._worker.start()
+        self._tasks.put((self._prepare, ()))
+
+    def record(self, direction: int, data, address: Tuple[str, int],
+               timestamp: Optional[float] = None):
+        """Append one datagram; safe to call from any thread
+
+        timestamp is a time.monotonic() value, defaulting to now; the
+        station passes the time its send decision was made, so replay can
+        reproduce that decision exactly.
+        """
+        size = len(data)
+        needed = RECORD_HEADER.size + size
+        packed = self._addresses.get(address[0])
+        if packed is None:
+            packed = self._pack_address(address[0])
+        with self._lock:
+            if self._map is None:
+                return
+            offset = self._offset
+            if offset + needed > self.segment_size:
+                if (SEGMENT_HEADER.size + needed > self.segment_size or size > 0xFFFF
+                        or self._spare is None):
+                    self.dropped += 1
+                    return
+                self._swap_locked()
+                offset = self._offset
+            start = offset + RECORD_HEADER.size
+            self._map[start:start + size] = data
+            # Header last, so a reader never sees a length without its payload
+            RECORD_HEADER.pack_into(self._map, offset,
+                                    time.monotonic_ns() if timestamp is None else int(timestamp * 1e9),
+                                    direction, packed, address[1], size)
+            self._offset = start + size
+            self.records += 1
+
+    def rotate(self):
+        """Close the current segment now and start a new one"""
+        self.sync()
+        with self._lock:
+            if self._map is not None and self._spare is not None:
+                self._swap_locked()
+
+    def sync(self):
+        """Wait until the background thread has finished its queued work"""
+        self._tasks.join()
+
+    def close(self):
+        """Trim and close the current segment, then finish compressing"""
+        with self._lock:
+            if self._map is None:
+                return
+            current = _Segment(self.path, self._file, self._map)
+            offset = self._offset
+            spare, self._spare = self._spare, None
+            self._map = None
+            self._file = None
+        self._tasks.put((self._finish, (current, offset)))
+        if spare is not None:
+            self._tasks.put((self._discard, (spare,)))
+        self._tasks.put(None)
+        self._worker.join()
+
+    def _pack_address(self, ip: str) -> bytes:
+        try:
+            packed = socket.inet_aton(ip)
+        except OSError:
+            packed = _NO_ADDRESS
+        if len(self._addresses) < 1024:
+            self._addresses[ip] = packed
+        return packed
+
+    def _use(self, segment: _Segment):
+        self.path, self._file, self._map = segment
+        self._offset = SEGMENT_HEADER.size
+
+    def _swap_locked(self):
+        """Switch to the spare; the background thread closes the old segment"""
+        finished = _Segment(self.path, self._file, self._map)
+        offset = self._offset
+        self._use(self._spare)
+        self._spare = None
+        self._tasks.put((self._prepare, ()))
+        self._tasks.put((self._finish, (finished, offset)))
+
+    def _open_segment(self) -> _Segment:
+        # The pid keeps recorders sharing a directory, or restarted within
+        # the second, apart; "x" refuses to truncate a segment regardless
+        while True:
+            self._index += 1
+            name = time.strftime("flight-%Y%m%d-%H%M%S") + f"-{os.getpid()}-{self._index:04d}{SEGMENT_SUFFIX}"
+            path = os.path.join(self.directory, name)
+            try:
+                f = open(path, "x+b")
+                break
+            except FileExistsError:
+                continue
+        # Sparse on most filesystems; pages are only backed once written
+        f.truncate(self.segment_size)
+        segment_map = mmap.mmap(f.fileno(), self.segment_size)
+        SEGMENT_HEADER.pack_into(segment_map, 0, SEGMENT_MAGIC, SEGMENT_VERSION, SEGMENT_HEADER.size,
+                                 time.time_ns(), time.monotonic_ns())
+        return _Segment(path, f, segment_map)
+
+    def _work(self):
+        while True:
+            task = self._tasks.get()
+            try:
+                if task is None:
+                    return
+                function, args = task
+                function(*args)
+            except OSError as e:
+                log.warning("Flight recorder error: %s", e)
+            finally:
+                self._tasks.task_done()
+
+    def _prepare(self):
+        segment = self._open_segment()
+        with self._lock:
+            if self._map is not None:
+                self._spare = segment
+                return
+        self._discard(segment)  # closed while this was being prepared
+
+    def _discard(self, segment: _Segment):
+        segment.map.close()
+        segment.file.close()
+        os.remove(segment.path)
+
+    def _finish(self, segment: _Segment, offset: int):
+        segment.map.close()
+        # Drop the unused preallocated tail
+        segment.file.truncate(offset)
+        segment.file.close()
+        self.segments.append(segment.path)
+        self._prune()
+        if self.compression is not None and segment.path in self.segments:
+            compressed = _compress(segment.path, self.compression)
+            self.segments[self.segments.index(segment.path)] = compressed
+
+    def _prune(self):
+        if self.max_segments is None:
+            return
+        # The open segment counts towards the limit; the empty spare does not
+        while len(self.segments) >= self.max_segments and self.segments:
+            oldest = self.segments.pop(0)
+            try:
+                os.remove(oldest)
+            except OSError:
+                pass
+
+def read_segment(path: str) -> Iterator[Record]:
+    """Records in one segment file, compressed or not, oldest first"""
+    if path.endswith(SEGMENT_SUFFIX):
+        with open(path, "rb") as f:
+            data = f.read()
+    else:
+        data = _decompress(path)
+    if len(data) < SEGMENT_HEADER.size:
+        return
+    magic, version, header_size, wall_ns, mono_ns = SEGMENT_HEADER.unpack_from(data, 0)
+    if magic != SEGMENT_MAGIC or version != SEGMENT_VERSION:
+        raise ValueError(f"Not a flight recorder segment: {path}")
+    offset = header_size
+    while offset + RECORD_HEADER.size <= len(data):
+        timestamp, direction, packed, port, size = RECORD_HEADER.unpack_from(data, offset)
+        if timestamp == 0:
+            break  # unused tail of a segment that was not closed cleanly
+        start = offset + RECORD_HEADER.size
+        if start + size > len(data):
+            break
+        yield Record(timestamp / 1e9, (wall_ns + timestamp - mono_ns) / 1e9, direction,
+                     (socket.inet_ntoa(packed), port), data[start:start + size])
+        offset = start + size
+
+def segment_paths(directory: str) -> List[str]:
+    """Segment files in a recording directory, oldest first"""
+    suffixes = (SEGMENT_SUFFIX,) + tuple(SEGMENT_SUFFIX + s for s in _COMPRESSED_SUFFIX.values())
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.endswith(suffixes))
+
+def read_records(path: str) -> Iterator[Record]:
+    """Records from a segment file, or from every segment in a directory"""
+    paths = segment_paths(path) if os.path.isdir(path) else [path]
+    for segment in paths:
+        yield from read_segment(segment)
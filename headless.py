@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Headless operation for the driver station
+Text commands from stdin, a script file, or a local UDP control socket
+"""
+
+import shlex
+import socket
+import sys
+import threading
+import time
+from typing import Optional
+
+from driver_station import GAME_STATUSES, DriverStation
+from log_pipeline import LEVEL_NAMES, get_logger
+
+log = get_logger("headless")
+
+HELP_TEXT = """Commands:
+  status <standby|teleop|autonomous>   Set game status
+  estop <on|off>                       Engage or release emergency stop
+  pair <robot_id> <controller>         Pair a robot with a controller
+  unpair <robot_id>                    Remove a pairing
+  axes <controller> <lx> <ly> <rx> <ry> [buttons]
+                                       Drive a virtual controller (0-255, button bitfield)
+  robots                               List discovered robots
+  controllers                          List controllers
+  refresh                              Clear robots and rediscover
+  log <debug|info|warning|error>       Change the log level
+  sleep <seconds>                      Pause (scripts only)
+  quit                                 Shut down the driver station"""
+
+def _estop_ack_field(station: DriverStation, robot_id: str) -> str:
+    """The estop_ack=<ms|waiting|none> listing field, for robots that acknowledge e-stops"""
+    ack = station.estop.acks.get(robot_id)
+    if ack is None:
+        return ""
+    if ack.latency_s is not None:
+        return f" estop_ack={ack.latency_s * 1000:.1f}ms"
+    return " estop_ack=none" if ack.gave_up else " estop_ack=waiting"
+
+def execute_command(station: DriverStation, line: str) -> str:
+    """Run one control command and return a one-line (or listing) reply"""
+    try:
+        args = shlex.split(line)
+    except ValueError as e:
+        return f"ERR {e}"
+    if not args:
+        return ""
+    command, args = args[0].lower(), args[1:]
+
+    try:
+        if command == "status" and len(args) == 1 and args[0] in GAME_STATUSES:
+            station.set_game_status(args[0])
+            return f"OK status {args[0]}"
+
+        if command == "estop" and len(args) == 1 and args[0] in ("on", "off"):
+            station.set_emergency_stop(args[0] == "on")
+            return f"OK estop {args[0]}"
+
+        if command == "pair" and len(args) == 2:
+            station.pair(args[0], int(args[1]))
+            return f"OK paired {args[0]} {args[1]}"
+
+        if command == "unpair" and len(args) == 1:
+            station.unpair(args[0])
+            return f"OK unpaired {args[0]}"
+
+        if command == "axes" and len(args) in (5, 6):
+            values = [int(arg, 0) for arg in args]
+            station.set_virtual_controller(*values)
+            return f"OK axes {args[0]}"
+
+        if command == "robots" and not args:
+            lines = [
+                f"{robot_id} {info.ip}:{info.port} "
+                f"{'connected' if info.connected else 'disconnected'} "
+                f"controller={station.robot_controller_pairs.get(robot_id, '-')} "
+                f"protocol=v{info.protocol}{_estop_ack_field(station, robot_id)}"
+                for robot_id, info in sorted(tuple(station.robots.items()))
+            ]
+            return "\n".join(["OK robots"] + lines)
+
+        if command == "controllers" and not args:
+            lines = [
+                f"{index} {controller.name} "
+                f"({controller.left_x}, {controller.left_y}, {controller.right_x}, {controller.right_y})"
+                for index, controller in sorted(station.controllers.snapshot().items())
+            ]
+            return "\n".join(["OK controllers"] + lines)
+
+        if command == "log" and len(args) == 1 and args[0].upper() in LEVEL_NAMES:
+            return f"OK log {station.set_log_level(args[0]).lower()}"
+
+        if command == "refresh" and not args:
+            station._refresh_robots()
+            return "OK refresh"
+
+        if command == "quit" and not args:
+            station.running = False
+            return "OK quit"
+
+        if command == "help":
+            return HELP_TEXT
+
+    except (KeyError, ValueError) as e:
+        return f"ERR {e}"
+
+    return f"ERR unknown command: {line.strip()} (try 'help')"
+
+class ControlSocket:
+    """UDP request/reply control endpoint served by the network engine"""
+
+    def __init__(self, station: DriverStation, port: int, host: str = "127.0.0.1"):
+        self.station = station
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        station.network.add_reader(self.sock, self._on_readable)
+
+    @property
+    def address(self):
+        return self.sock.getsockname()
+
+    def _on_readable(self, sock: socket.socket):
+        while True:
+            try:
+                data, addr = sock.recvfrom(1024)
+            except (BlockingIOError, InterruptedError):
+                return
+            reply = execute_command(self.station, data.decode('utf-8', errors='ignore'))
+            try:
+                sock.sendto(reply.encode(), addr)
+            except OSError as e:
+                log.warning("Control reply error: %s", e)
+
+    def close(self):
+        self.station.network.remove_reader(self.sock)
+        self.sock.close()
+
+def run_script(station: DriverStation, path: str):
+    """Run control commands from a file, one per line; '#' starts a comment"""
+    with open(path) as script:
+        for line in script:
+            line = line.split("#", 1)[0].strip()
+            if not line or not station.running:
+                continue
+            parts = line.split()
+            if parts[0] == "sleep" and len(parts) == 2:
+                time.sleep(float(parts[1]))
+                continue
+            print(f"> {line}")
+            print(execute_command(station, line))
+
+def _cli_loop(station: DriverStation):
+    print("Type 'help' for commands")
+    for line in sys.stdin:
+        reply = execute_command(station, line)
+        if reply:
+            print(reply)
+        if not station.running:
+            return
+    # stdin closed; keep running under the control socket or until killed
+
+def run_headless(station: DriverStation, control_port: Optional[int] = None,
+                 script: Optional[str] = None, cli: bool = True):
+    """Main loop without a display: poll joysticks and feed the transmit thread"""
+    print("Driver Station started (headless)")
+    print(f"Transmitting controller data at {station.transmit_scheduler.rate_hz:g} Hz")
+
+    control = None
+    if control_port is not None:
+        control = ControlSocket(station, control_port)
+        print(f"Control socket listening on {control.address[0]}:{control.address[1]}")
+
+    def command_sources():
+        if script:
+            run_script(station, script)
+        if cli:
+            _cli_loop(station)
+
+    threading.Thread(target=command_sources, daemon=True).start()
+
+    station._publish_controller_snapshots()
+    station.transmit_scheduler.start()
+    if station.input_scheduler is not None:
+        station.input_scheduler.start()
+    try:
+        while station.running:
+            station._update_controllers()
+            station._publish_controller_snapshots()
+            station.clock.tick(station.input_rate)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if control is not None:
+            control.close()
+        station.shutdown()
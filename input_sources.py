@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""
+Controller input sources for the driver station
+Joysticks through pygame, recorded traces, scripted waveforms and a
+line-based feed over UDP or stdin all produce the same readings
+"""
+
+import math
+import random
+import socket
+import sys
+import threading
+from typing import Dict, List, NamedTuple, Optional, Sequence, TextIO, Tuple
+
+import pygame
+
+# Bitfield shared with the packet's button byte
+CROSS = 0x01
+CIRCLE = 0x02
+SQUARE = 0x04
+TRIANGLE = 0x08
+FACE_BUTTONS = 4
+
+# UDP feed default: 127.0.0.1 only, next to the control port
+INPUT_PORT = 12341
+
+WAVEFORMS = ("sine", "step", "random")
+
+# pygame events that carry joystick readings
+JOYSTICK_EVENTS = (pygame.JOYAXISMOTION, pygame.JOYBUTTONDOWN, pygame.JOYBUTTONUP)
+# leftX, leftY, rightX, rightY, L2, R2
+JOYSTICK_AXES = 6
+
+class InputSample(NamedTuple):
+    """One controller reading: raw -1..1 values, before stick shaping"""
+    axes: Tuple[float, float, float, float]  # leftX, leftY, rightX, rightY
+    triggers: Optional[Tuple[float, float]] = None  # L2, R2; None leaves them neutral
+    buttons: int = 0  # CROSS | CIRCLE | SQUARE | TRIANGLE
+
+class InputSource:
+    """Supplies readings for a fixed set of controllers
+
+    open() returns one name per controller and is called once. poll()
+    returns one InputSample per controller, or None where nothing new
+    arrived since the last poll. Both run on the thread that updates
+    controllers.
+    """
+
+    def open(self) -> List[str]:
+        raise NotImplementedError
+
+    def poll(self, now: float) -> Sequence[Optional[InputSample]]:
+        raise NotImplementedError
+
+    def handle_event(self, event: pygame.event.Event) -> bool:
+        """Take a pygame joystick event; True if it belonged to this source"""
+        return False
+
+    def close(self):
+        pass
+
+class PygameInput(InputSource):
+    """Joysticks (PS5 pads) through pygame, driven by their events
+
+    JOYAXISMOTION and button events update a cached reading per
+    joystick, so a burst of motion between two polls coalesces into the
+    latest value, and poll() only reports joysticks that changed. The
+    caller pumps the event queue and hands joystick events over, from
+    the UI loop or the input thread.
+    """
+
+    def __init__(self):
+        self.joysticks: List[pygame.joystick.Joystick] = []
+        self.events = 0  # joystick events taken
+        self._by_instance: Dict[int, int] = {}
+        self._axes: List[List[float]] = []
+        self._triggers: List[bool] = []
+        self._buttons: List[int] = []
+        self._changed: List[bool] = []
+        self._lock = threading.Lock()
+
+    def open(self) -> List[str]:
+        pygame.joystick.quit()
+        pygame.joystick.init()
+        self.joysticks = [pygame.joystick.Joystick(i) for i in range(pygame.joystick.get_count())]
+        for index, joystick in enumerate(self.joysticks):
+            joystick.init()
+            self._by_instance[joystick.get_instance_id()] = index
+            # Read once; events keep the cached values current from here on
+            count = min(JOYSTICK_AXES, joystick.get_numaxes())
+            axes = [joystick.get_axis(axis) for axis in range(count)]
+            self._axes.append(axes + [0.0] * (JOYSTICK_AXES - count))
+            self._triggers.append(count == JOYSTICK_AXES)
+            buttons = 0
+            # PS5 mapping: 0 Cross, 1 Circle, 2 Square, 3 Triangle
+            for button in range(min(FACE_BUTTONS, joystick.get_numbuttons())):
+                if joystick.get_button(button):
+                    buttons |= 1 << button
+            self._buttons.append(buttons)
+            self._changed.append(True)
+        return [joystick.get_name() for joystick in self.joysticks]
+
+    def handle_event(self, event: pygame.event.Event) -> bool:
+        index = self._by_instance.get(getattr(event, "instance_id", getattr(event, "joy", None)))
+        if index is None:
+            return False
+        with self._lock:
+            self.events += 1
+            if event.type == pygame.JOYAXISMOTION:
+                if event.axis >= JOYSTICK_AXES:
+                    return True
+                self._axes[index][event.axis] = event.value
+            elif event.button < FACE_BUTTONS:
+                if event.type == pygame.JOYBUTTONDOWN:
+                    self._buttons[index] |= 1 << event.button
+                else:
+                    self._buttons[index] &= ~(1 << event.button)
+            else:
+                return True
+            self._changed[index] = True
+        return True
+
+    def poll(self, now: float) -> List[Optional[InputSample]]:
+        samples: List[Optional[InputSample]] = []
+        with self._lock:
+            for index, axes in enumerate(self._axes):
+                if not self._changed[index]:
+                    samples.append(None)
+                    continue
+                self._changed[index] = False
+                triggers = (axes[4], axes[5]) if self._triggers[index] else None
+                samples.append(InputSample(tuple(axes[:4]), triggers, self._buttons[index]))
+        return samples
+
+def format_trace_line(elapsed: float, index: int, sample: InputSample) -> str:
+    """One trace line: seconds, controller, four axes, two triggers ("-" if none), buttons"""
+    # repr() round-trips floats exactly, so playback shapes to the same bytes
+    triggers = ("-", "-") if sample.triggers is None else tuple(repr(float(t)) for t in sample.triggers)
+    axes = " ".join(repr(float(axis)) for axis in sample.axes)
+    return f"{elapsed:.6f} {index} {axes} {triggers[0]} {triggers[1]} {sample.buttons}\n"
+
+def parse_trace_line(line: str) -> Tuple[float, int, InputSample]:
+    fields = line.split()
+    if len(fields) != 9:
+        raise ValueError(f"Expected 9 fields in trace line, got {len(fields)}: {line.strip()}")
+    triggers = None if fields[6] == "-" else (float(fields[6]), float(fields[7]))
+    return (float(fields[0]), int(fields[1]),
+            InputSample(tuple(float(value) for value in fields[2:6]), triggers, int(fields[8])))
+
+class TraceWriter:
+    """Records every reading polled from the input sources to a trace file"""
+
+    def __init__(self, path: str):
+        self.file = open(path, "w")
+        self.file.write("# seconds controller lx ly rx ry l2 r2 buttons\n")
+        self._start: Optional[float] = None
+
+    def write(self, now: float, index: int, sample: InputSample):
+        if self._start is None:
+            self._start = now
+        self.file.write(format_trace_line(now - self._start, index, sample))
+
+    def close(self):
+        self.file.close()
+
+class TraceInput(InputSource):
+    """Plays back a trace written by TraceWriter at its recorded pace
+
+    speed scales time (2.0 plays twice as fast); with loop the trace
+    starts over when it runs out, otherwise the last readings hold.
+    """
+
+    def __init__(self, path: str, speed: float = 1.0, loop: bool = False):
+        if speed <= 0:
+            raise ValueError(f"Speed must be positive, got {speed}")
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+        self.samples: List[Tuple[float, int, InputSample]] = []
+        self.controllers = 0
+        self._cursor = 0
+        self._start: Optional[float] = None
+
+    def open(self) -> List[str]:
+        with open(self.path) as f:
+            self.samples = [parse_trace_line(line) for line in f
+                            if line.strip() and not line.startswith("#")]
+        self.controllers = max((index for _, index, _ in self.samples), default=-1) + 1
+        return [f"Trace {index}" for index in range(self.controllers)]
+
+    def poll(self, now: float) -> List[Optional[InputSample]]:
+        latest: List[Optional[InputSample]] = [None] * self.controllers
+        if self._start is None:
+            self._start = now
+        elapsed = (now - self._start) * self.speed
+        while True:
+            while self._cursor < len(self.samples) and self.samples[self._cursor][0] <= elapsed:
+                _, index, sample = self.samples[self._cursor]
+                latest[index] = sample
+                self._cursor += 1
+            if self._cursor < len(self.samples) or not self.loop or not self.samples:
+                return latest
+            # Start over, skipping whole passes if polls were far apart
+            duration = max(self.samples[-1][0], 1e-3)
+            passes = max(1, int(elapsed // duration))
+            self._start += passes * duration / self.speed
+            elapsed -= passes * duration
+            self._cursor = 0
+
+class WaveformInput(InputSource):
+    """Scripted stick motion for any number of virtual controllers
+
+    "sine" and "step" sweep every axis through +/-amplitude once per
+    period, each axis and controller offset in phase so no two move in
+    lockstep; Cross is held for the first half of each period. "random"
+    is a seeded random walk that covers about the same range per period
+    and taps Cross about once a period.
+    """
+
+    def __init__(self, shape: str, controllers: int = 1, period: float = 2.0,
+                 amplitude: float = 1.0, seed: int = 1):
+        if shape not in WAVEFORMS:
+            raise ValueError(f"Unknown waveform: {shape}")
+        if controllers < 1 or period <= 0:
+            raise ValueError("Need at least one controller and a positive period")
+        self.shape = shape
+        self.controllers = controllers
+        self.period = period
+        self.amplitude = max(0.0, min(1.0, amplitude))
+        self.random = random.Random(seed)
+        self._walk = [[0.0] * 4 for _ in range(controllers)]
+        self._buttons = [0] * controllers
+        self._start: Optional[float] = None
+        self._last = 0.0
+
+    def open(self) -> List[str]:
+        return [f"{self.shape.capitalize()} {index}" for index in range(self.controllers)]
+
+    def poll(self, now: float) -> List[InputSample]:
+        if self._start is None:
+            self._start = self._last = now
+        cycles = (now - self._start) / self.period
+        dt = now - self._last
+        self._last = now
+        samples = []
+        for controller in range(self.controllers):
+            if self.shape == "random":
+                samples.append(self._walk_step(controller, dt))
+                continue
+            axes = []
+            for axis in range(4):
+                phase = (cycles + controller / self.controllers + axis / 4) % 1.0
+                if self.shape == "sine":
+                    axes.append(self.amplitude * math.sin(2 * math.pi * phase))
+                else:
+                    axes.append(self.amplitude if phase < 0.5 else -self.amplitude)
+            held = (cycles + controller / self.controllers) % 1.0 < 0.5
+            samples.append(InputSample(tuple(axes), None, CROSS if held else 0))
+        return samples
+
+    def _walk_step(self, controller: int, dt: float) -> InputSample:
+        axes = self._walk[controller]
+        sigma = self.amplitude * math.sqrt(max(dt, 0.0) / self.period)
+        for axis in range(4):
+            value = axes[axis] + self.random.gauss(0.0, sigma)
+            # Reflect off the ends rather than sticking at full scale
+            if value > self.amplitude:
+                value = 2 * self.amplitude - value
+            elif value < -self.amplitude:
+                value = -2 * self.amplitude - value
+            axes[axis] = max(-self.amplitude, min(self.amplitude, value))
+        if self.random.random() < dt / self.period:
+            self._buttons[controller] ^= CROSS
+        return InputSample(tuple(axes), None, self._buttons[controller])
+
+def parse_feed_line(line: str) -> Tuple[int, InputSample]:
+    """Parse "<controller> <lx> <ly> <rx> <ry> [<buttons> [<l2> <r2>]]" (axes -1..1)"""
+    fields = line.split()
+    if len(fields) not in (5, 6, 8):
+        raise ValueError(f"Expected controller, 4 axes, [buttons [l2 r2]]: {line.strip()}")
+    axes = tuple(_feed_value(value) for value in fields[1:5])
+    buttons = int(fields[5], 0) if len(fields) > 5 else 0
+    triggers = (_feed_value(fields[6]), _feed_value(fields[7])) if len(fields) == 8 else None
+    return int(fields[0]), InputSample(axes, triggers, buttons)
+
+def _feed_value(field: str) -> float:
+    """One axis or trigger value, clamped to -1..1; nan and inf are rejected"""
+    value = float(field)
+    if not math.isfinite(value):
+        raise ValueError(f"Not a finite value: {field}")
+    return max(-1.0, min(1.0, value))
+
+class _FeedInput(InputSource):
+    """Keeps the newest reading per controller until the next poll"""
+
+    label = "Feed"
+
+    def __init__(self, controllers: int):
+        if controllers < 1:
+            raise ValueError("Need at least one controller")
+        self.controllers = controllers
+        self.errors = 0
+        self._latest: List[Optional[InputSample]] = [None] * controllers
+        self._lock = threading.Lock()
+
+    def open(self) -> List[str]:
+        return [f"{self.label} {index}" for index in range(self.controllers)]
+
+    def feed(self, line: str):
+        """Apply one feed line; malformed lines are counted and ignored"""
+        try:
+            index, sample = parse_feed_line(line)
+            if not 0 <= index < self.controllers:
+                raise ValueError(f"No controller {index}")
+        except ValueError:
+            self.errors += 1
+            return
+        with self._lock:
+            self._latest[index] = sample
+
+    def poll(self, now: float) -> List[Optional[InputSample]]:
+        with self._lock:
+            latest, self._latest = self._latest, [None] * self.controllers
+        return latest
+
+class UdpInput(_FeedInput):
+    """Feed lines arriving as UDP datagrams, one or more lines per datagram"""
+
+    label = "UDP"
+
+    def __init__(self, controllers: int, port: int = INPUT_PORT, host: str = "127.0.0.1"):
+        super().__init__(controllers)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.sock.setblocking(False)
+        self.address = self.sock.getsockname()
+
+    def poll(self, now: float) -> List[Optional[InputSample]]:
+        while True:
+            try:
+                data = self.sock.recv(4096)
+            except (BlockingIOError, OSError):
+                break
+            for line in data.decode('utf-8', errors='ignore').splitlines():
+                self.feed(line)
+        return super().poll(now)
+
+    def close(self):
+        self.sock.close()
+
+class StdinInput(_FeedInput):
+    """Feed lines from a stream (stdin by default), read on a background thread"""
+
+    label = "Stdin"
+
+    def __init__(self, controllers: int, stream: Optional[TextIO] = None):
+        super().__init__(controllers)
+        self.stream = stream if stream is not None else sys.stdin
+        self._thread: Optional[threading.Thread] = None
+
+    def open(self) -> List[str]:
+        self._thread = threading.Thread(target=self._read, daemon=True)
+        self._thread.start()
+        return super().open()
+
+    def _read(self):
+        for line in self.stream:
+            self.feed(line)
+
+def parse_input_spec(spec: str) -> InputSource:
+    """Build a source from a command-line spec
+
+    pygame | trace:<file>[:<speed>] | sine|step|random:<controllers>[:<period>]
+    | udp:<controllers>[:<port>] | stdin:<controllers>
+    """
+    kind, *args = spec.split(":")
+    try:
+        if kind == "pygame" and not args:
+            return PygameInput()
+        if kind == "trace" and 1 <= len(args) <= 2:
+            return TraceInput(args[0], float(args[1]) if len(args) > 1 else 1.0, loop=True)
+        if kind in WAVEFORMS and 1 <= len(args) <= 2:
+            return WaveformInput(kind, int(args[0]), float(args[1]) if len(args) > 1 else 2.0)
+        if kind == "udp" and 1 <= len(args) <= 2:
+            return UdpInput(int(args[0]), int(args[1]) if len(args) > 1 else INPUT_PORT)
+        if kind == "stdin" and len(args) == 1:
+            return StdinInput(int(args[0]))
+    except ValueError as e:
+        raise ValueError(f"Bad input source '{spec}': {e}") from None
+    raise ValueError(f"Bad input source '{spec}' (try pygame, trace:FILE, sine:N, step:N, "
+                     f"random:N, udp:N or stdin:N)")
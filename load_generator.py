@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Load generator: hundreds of simulated robots in one asyncio event loop
+Measures DISCOVER -> PORT handshake latency and controller packet rate
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from typing import Dict, List, Optional
+
+from demo_mode import DISCOVERY_PORT, SIM_PORT_BASE, SimulatedRobot
+from packets import FIRMWARE_COMMAND_TIMEOUT
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of values (pct in 0-100), None if empty"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[rank]
+
+def summarize(values: List[float]) -> Dict[str, Optional[float]]:
+    """Count, mean and tail percentiles of a sample"""
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values) if values else None,
+        "p50": percentile(values, 50),
+        "p90": percentile(values, 90),
+        "p99": percentile(values, 99),
+        "p99.9": percentile(values, 99.9),
+        "max": max(values) if values else None,
+    }
+
+class _Endpoint(asyncio.DatagramProtocol):
+    def __init__(self, on_packet):
+        self.on_packet = on_packet
+
+    def datagram_received(self, data, addr):
+        self.on_packet(data)
+
+class LoadRobot:
+    """One SimulatedRobot driven by the shared event loop instead of threads"""
+
+    def __init__(self, generator: "LoadGenerator", index: int):
+        self.generator = generator
+        self.robot = SimulatedRobot(
+            f"{generator.prefix}{index:03d}",
+            ip=generator.robot_ip,
+            discovery_port=generator.port_base + index,
+            open_sockets=False,
+            verbose=False
+        )
+        self.discovery_transport = None
+        self.command_transport = None
+        self.first_discover_time: Optional[float] = None
+        self.last_discover_time: Optional[float] = None
+        self.next_discover_time = 0.0
+        self.last_command_time = 0.0
+        self.connected_time: Optional[float] = None
+        self.connected_seconds = 0.0
+        self.handshake_latencies: List[float] = []
+        self.connect_times: List[float] = []
+        self.reconnects = 0
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self.discovery_transport, _ = await loop.create_datagram_endpoint(
+            lambda: _Endpoint(self._on_packet),
+            local_addr=('0.0.0.0', self.robot.discovery_port)
+        )
+
+    def _on_packet(self, data: bytes):
+        if self.generator.drop():
+            return
+        kind = self.robot.handle_packet(data)
+        now = time.perf_counter()
+        if self.robot.pending_ack is not None:
+            # Acks go to the station's discovery port, like DISCOVER
+            if not self.generator.drop():
+                self.discovery_transport.sendto(self.robot.pending_ack, self.generator.target)
+                self.robot.acks_sent += 1
+            self.robot.pending_ack = None
+        if kind == "port":
+            if self.last_discover_time is not None:
+                self.handshake_latencies.append(now - self.last_discover_time)
+                self.connect_times.append(now - self.first_discover_time)
+            self.connected_time = now
+            self.last_command_time = now
+            asyncio.ensure_future(self._open_command_socket())
+        elif kind is not None:
+            self.last_command_time = now
+
+    async def _open_command_socket(self):
+        loop = asyncio.get_running_loop()
+        try:
+            self.command_transport, _ = await loop.create_datagram_endpoint(
+                lambda: _Endpoint(self._on_packet),
+                local_addr=('0.0.0.0', self.robot.assigned_port)
+            )
+        except OSError as e:
+            print(f"[{self.robot.robot_id}] Cannot bind command port {self.robot.assigned_port}: {e}")
+            self._disconnect()
+
+    def _disconnect(self):
+        if self.connected_time is not None:
+            self.connected_seconds += time.perf_counter() - self.connected_time
+        self.connected_time = None
+        self.robot.assigned_port = None
+        self.first_discover_time = None
+        self.last_discover_time = None
+        self.next_discover_time = 0.0
+        if self.command_transport is not None:
+            self.command_transport.close()
+            self.command_transport = None
+
+    def tick(self, now: float):
+        """Discovery and firmware-style command timeout, called periodically"""
+        if self.robot.assigned_port is not None:
+            if now - self.last_command_time > FIRMWARE_COMMAND_TIMEOUT:
+                self.reconnects += 1
+                self._disconnect()
+            return
+
+        if now >= self.next_discover_time:
+            if self.first_discover_time is None:
+                self.first_discover_time = now
+            self.last_discover_time = now
+            self.next_discover_time = now + self.generator.next_discovery_interval()
+            if not self.generator.drop():
+                self.discovery_transport.sendto(self.robot.discovery_message(), self.generator.target)
+
+    def close(self):
+        self._disconnect()
+        if self.discovery_transport is not None:
+            self.discovery_transport.close()
+
+    def report(self) -> dict:
+        connected = self.connected_seconds
+        if self.connected_time is not None:
+            connected += time.perf_counter() - self.connected_time
+        return {
+            "robot_id": self.robot.robot_id,
+            "handshakes": len(self.handshake_latencies),
+            "reconnects": self.reconnects,
+            "controller_packets": self.robot.controller_packets,
+            "controller_rate_hz": self.robot.controller_packets / connected if connected > 0 else 0.0,
+        }
+
+class LoadGenerator:
+    """Runs N LoadRobots against a driver station and collects statistics"""
+
+    def __init__(self, robots: int, target=("127.0.0.1", DISCOVERY_PORT),
+                 discovery_interval: float = 2.0, jitter: float = 0.1, loss: float = 0.0,
+                 port_base: int = SIM_PORT_BASE, robot_ip: str = "127.0.0.1",
+                 prefix: str = "Sim", seed: int = 1):
+        self.target = target
+        self.discovery_interval = discovery_interval
+        self.jitter = jitter
+        self.loss = loss
+        self.port_base = port_base
+        self.robot_ip = robot_ip
+        self.prefix = prefix
+        self.random = random.Random(seed)
+        self.robots = [LoadRobot(self, i) for i in range(robots)]
+
+    def next_discovery_interval(self) -> float:
+        """Discovery interval with +/- jitter applied"""
+        return self.discovery_interval * (1.0 + self.jitter * (self.random.random() * 2 - 1))
+
+    def drop(self) -> bool:
+        """Simulated packet loss, applied to each packet in each direction"""
+        return self.loss > 0 and self.random.random() < self.loss
+
+    async def run(self, duration: float, tick: float = 0.01) -> dict:
+        for robot in self.robots:
+            await robot.start()
+        # Spread first discoveries over one interval instead of a thundering herd
+        start = time.perf_counter()
+        for robot in self.robots:
+            robot.next_discover_time = start + self.random.random() * self.discovery_interval
+        try:
+            end = start + duration
+            while True:
+                now = time.perf_counter()
+                if now >= end:
+                    break
+                for robot in self.robots:
+                    robot.tick(now)
+                await asyncio.sleep(tick)
+            return self.report(duration)
+        finally:
+            for robot in self.robots:
+                robot.close()
+
+    def report(self, duration: float) -> dict:
+        per_robot = [robot.report() for robot in self.robots]
+        latencies = [lat for robot in self.robots for lat in robot.handshake_latencies]
+        connect_times = [t for robot in self.robots for t in robot.connect_times]
+        rates = [entry["controller_rate_hz"] for entry in per_robot]
+        return {
+            "robots": len(self.robots),
+            "duration_s": duration,
+            "loss": self.loss,
+            "discovery_interval_s": self.discovery_interval,
+            "connected_robots": sum(1 for robot in self.robots if robot.handshake_latencies),
+            "handshake_latency_s": summarize(latencies),
+            "time_to_connect_s": summarize(connect_times),
+            "controller_rate_hz": summarize(rates),
+            "per_robot": per_robot,
+        }
+
+def _format_ms(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value * 1000:.2f} ms"
+
+def print_report(report: dict, per_robot: bool = False):
+    print(f"Robots: {report['robots']}  connected: {report['connected_robots']}  "
+          f"duration: {report['duration_s']:g} s  loss: {report['loss']:.0%}")
+    for label, key in (("Handshake (DISCOVER->PORT)", "handshake_latency_s"),
+                       ("Time to connect (first DISCOVER)", "time_to_connect_s")):
+        stats = report[key]
+        print(f"{label}: n={stats['count']} p50={_format_ms(stats['p50'])} "
+              f"p99={_format_ms(stats['p99'])} max={_format_ms(stats['max'])}")
+    rates = report["controller_rate_hz"]
+    if rates["count"]:
+        print(f"Controller packets/s per robot: mean={rates['mean']:.1f} "
+              f"min={min(e['controller_rate_hz'] for e in report['per_robot']):.1f} "
+              f"max={rates['max']:.1f}")
+    if per_robot:
+        for entry in report["per_robot"]:
+            print(f"  {entry['robot_id']}: handshakes={entry['handshakes']} "
+                  f"reconnects={entry['reconnects']} packets={entry['controller_packets']} "
+                  f"rate={entry['controller_rate_hz']:.1f} Hz")
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate many robots against a driver station")
+    parser.add_argument("--robots", type=int, default=100, help="Number of simulated robots")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run")
+    parser.add_argument("--target", default=f"127.0.0.1:{DISCOVERY_PORT}",
+                        help="Driver station discovery address (host:port)")
+    parser.add_argument("--discovery-interval", type=float, default=2.0,
+                        help="Seconds between DISCOVER broadcasts while unconnected")
+    parser.add_argument("--jitter", type=float, default=0.1,
+                        help="Random +/- fraction applied to each discovery interval")
+    parser.add_argument("--loss", type=float, default=0.0,
+                        help="Probability of dropping each packet (0-1)")
+    parser.add_argument("--port-base", type=int, default=SIM_PORT_BASE,
+                        help="Robot i listens for PORT replies on port-base + i")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for loss and jitter")
+    parser.add_argument("--per-robot", action="store_true", help="Print a line per robot")
+    parser.add_argument("--json", default=None, help="Also write the report to this file")
+    args = parser.parse_args()
+
+    host, port = args.target.rsplit(":", 1)
+    generator = LoadGenerator(args.robots, target=(host, int(port)),
+                              discovery_interval=args.discovery_interval, jitter=args.jitter,
+                              loss=args.loss, port_base=args.port_base, seed=args.seed)
+    print(f"Simulating {args.robots} robots against {args.target} for {args.duration:g} s...")
+    report = asyncio.run(generator.run(args.duration))
+    print_report(report, per_robot=args.per_robot)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.json}")
+
+if __name__ == "__main__":
+    main()
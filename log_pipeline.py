@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Leveled logging for the driver station
+Records go into a bounded in-memory queue and a background thread writes
+them out, so the network and transmit threads never wait on a slow console
+"""
+
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+from typing import Dict, Optional, Tuple, Union
+
+LOGGER_NAME = "minibot"
+LOG_QUEUE_SIZE = 4096
+
+# Levels offered in the UI and the headless "log" command, in cycle order
+LEVEL_NAMES = ("INFO", "DEBUG", "WARNING", "ERROR")
+
+log = logging.getLogger(LOGGER_NAME)
+
+def level_number(level: Union[int, str]) -> int:
+    """logging level for a name like "debug", or a number"""
+    if isinstance(level, int):
+        return level
+    number = logging.getLevelName(level.upper())
+    if not isinstance(number, int):
+        raise ValueError(f"Unknown log level: {level}")
+    return number
+
+class _Throttle(logging.Filter):
+    """Rate limiting and sampling for records that ask for it
+
+    log.debug(..., extra={"rate_limit": 5}) lets at most about 5 records
+    a second through from that call site; extra={"sample": 100} lets one
+    in 100 through. The next record let through from a call site says
+    how many were suppressed since the last one.
+    """
+
+    def __init__(self):
+        super().__init__()
+        # call site -> [tokens, last refill, suppressed, seen]
+        self._sites: Dict[Tuple[str, int], list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = getattr(record, "rate_limit", None)
+        sample = getattr(record, "sample", None)
+        if rate is None and sample is None:
+            return True
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None:
+                site = self._sites[key] = [max(1.0, rate or 0), time.monotonic(), 0, 0]
+            allowed = True
+            if sample is not None:
+                allowed = site[3] % sample == 0
+                site[3] += 1
+            if allowed and rate is not None:
+                now = time.monotonic()
+                site[0] = min(max(1.0, rate), site[0] + (now - site[1]) * rate)
+                site[1] = now
+                allowed = site[0] >= 1.0
+                if allowed:
+                    site[0] -= 1.0
+            if not allowed:
+                site[2] += 1
+                return False
+            suppressed, site[2] = site[2], 0
+        if suppressed:
+            record.msg = f"{record.getMessage()} ({suppressed} similar suppressed)"
+            record.args = None
+        return True
+
+class _Formatter(logging.Formatter):
+    """Time, level and message, then any extra={"fields": {...}} as key=value"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s.%(msecs)03d %(levelname)-7s %(message)s", "%H:%M:%S")
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            text += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return text
+
+class _BoundedQueueHandler(logging.handlers.QueueHandler):
+    """Drops records instead of blocking when the writer falls behind"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class _Writer(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # Wait for room rather than losing the stop signal on a full queue
+        self.queue.put(self._sentinel)
+
+class LogPipeline:
+    """Owns the queue, the writer thread and the runtime log level
+
+    start() attaches to the "minibot" logger; every module logs through
+    that logger or a child of it. set_level() takes effect immediately
+    on all threads.
+    """
+
+    def __init__(self, level: Union[int, str] = logging.INFO, queue_size: int = LOG_QUEUE_SIZE,
+                 stream=None):
+        self.queue: queue.Queue = queue.Queue(max(1, queue_size))
+        self.handler = _BoundedQueueHandler(self.queue)
+        writer = logging.StreamHandler(stream if stream is not None else sys.stdout)
+        writer.setFormatter(_Formatter())
+        self.writer = _Writer(self.queue, writer)
+        # On the handler, so it also sees records from child loggers
+        self.throttle = _Throttle()
+        self.handler.addFilter(self.throttle)
+        self._level = level_number(level)
+        self.started = False
+
+    @property
+    def dropped(self) -> int:
+        """Records lost because the queue was full"""
+        return self.handler.dropped
+
+    @property
+    def level_name(self) -> str:
+        return logging.getLevelName(self._level)
+
+    def start(self):
+        log.setLevel(self._level)
+        log.propagate = False
+        log.addHandler(self.handler)
+        self.writer.start()
+        self.started = True
+
+    def stop(self):
+        """Flush everything queued so far and detach"""
+        if not self.started:
+            return
+        self.started = False
+        log.removeHandler(self.handler)
+        self.writer.stop()
+        if self.handler.dropped:
+            print(f"{self.handler.dropped} log records dropped (queue full)")
+
+    def set_level(self, level: Union[int, str]) -> str:
+        """Change the level on every thread at once; returns its name"""
+        self._level = level_number(level)
+        log.setLevel(self._level)
+        return self.level_name
+
+    def cycle_level(self) -> str:
+        """Step to the next of LEVEL_NAMES; used by the UI"""
+        name = self.level_name
+        index = LEVEL_NAMES.index(name) if name in LEVEL_NAMES else -1
+        return self.set_level(LEVEL_NAMES[(index + 1) % len(LEVEL_NAMES)])
+
+def get_logger(name: Optional[str] = None) -> logging.Logger:
+    """The pipeline's logger, or a named child of it (e.g. "net")"""
+    return log if name is None else log.getChild(name)
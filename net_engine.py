@@ -0,0 +1,480 @@
+#!/usr/bin/env python3
+"""
+Event-driven network engine for the driver station
+Wakes only on socket readiness or timer deadlines instead of sleep-polling
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import heapq
+import itertools
+import selectors
+import socket
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from log_pipeline import get_logger
+from state_store import CopyOnWriteDict
+
+log = get_logger("net")
+
+# Network errors tend to repeat per datagram; log at most this many a second
+ERROR_LOG_RATE = 1
+
+# Datagram handler: (payload view, (ip, port)). The view is only valid
+# until the handler returns; the slot is reused by the next receive.
+DatagramHandler = Callable[[memoryview, Tuple[str, int]], None]
+
+class TimerHandle:
+    """Handle for a scheduled callback, returned by NetworkEngine.call_at"""
+
+    __slots__ = ("deadline", "callback", "cancelled")
+
+    def __init__(self, deadline: float, callback: Callable[[], None]):
+        self.deadline = deadline
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        """Prevent the callback from running (safe from any thread)"""
+        self.cancelled = True
+
+class NetworkEngine:
+    """Selector loop with a timer heap
+
+    Reader callbacks are invoked with the ready socket and are expected to
+    drain it. Timers are kept in a min-heap keyed on deadline, so the loop
+    sleeps exactly until the next socket event or the earliest timer.
+    """
+
+    def __init__(self):
+        self.selector = selectors.DefaultSelector()
+        self.running = False
+        self._thread: Optional[threading.Thread] = None
+        self._timers: List[Tuple[float, int, TimerHandle]] = []
+        self._timer_seq = itertools.count()
+        self._timer_lock = threading.Lock()
+
+        # Self-pipe so other threads can interrupt select()
+        self._wake_recv, self._wake_send = socket.socketpair()
+        self._wake_recv.setblocking(False)
+        self._wake_send.setblocking(False)
+        self.selector.register(self._wake_recv, selectors.EVENT_READ, self._drain_wakeup)
+
+    def add_reader(self, sock: socket.socket, callback: Callable[[socket.socket], None]):
+        """Call callback(sock) whenever sock becomes readable"""
+        sock.setblocking(False)
+        self.selector.register(sock, selectors.EVENT_READ, callback)
+
+    def remove_reader(self, sock: socket.socket):
+        """Stop watching sock"""
+        try:
+            self.selector.unregister(sock)
+        except (KeyError, ValueError):
+            pass
+
+    def call_at(self, deadline: float, callback: Callable[[], None]) -> TimerHandle:
+        """Run callback once time.monotonic() reaches deadline"""
+        handle = TimerHandle(deadline, callback)
+        with self._timer_lock:
+            heapq.heappush(self._timers, (deadline, next(self._timer_seq), handle))
+            is_earliest = self._timers[0][2] is handle
+        if is_earliest and threading.current_thread() is not self._thread:
+            self.wakeup()
+        return handle
+
+    def call_later(self, delay: float, callback: Callable[[], None]) -> TimerHandle:
+        """Run callback after delay seconds"""
+        return self.call_at(time.monotonic() + delay, callback)
+
+    def wakeup(self):
+        """Interrupt a blocking select() from another thread"""
+        try:
+            self._wake_send.send(b"\x00")
+        except (BlockingIOError, OSError):
+            pass
+
+    def _drain_wakeup(self, sock: socket.socket):
+        try:
+            while sock.recv(512):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+
+    def _next_timeout(self) -> Optional[float]:
+        with self._timer_lock:
+            while self._timers and self._timers[0][2].cancelled:
+                heapq.heappop(self._timers)
+            if not self._timers:
+                return None
+            return max(0.0, self._timers[0][0] - time.monotonic())
+
+    def _run_due_timers(self):
+        now = time.monotonic()
+        while True:
+            with self._timer_lock:
+                if not self._timers or self._timers[0][0] > now:
+                    return
+                _, _, handle = heapq.heappop(self._timers)
+            if handle.cancelled:
+                continue
+            try:
+                handle.callback()
+            except Exception as e:
+                log.exception("Timer callback error: %s", e)
+
+    def run(self):
+        """Run the event loop until stop() is called"""
+        self.running = True
+        self._thread = threading.current_thread()
+        while self.running:
+            events = self.selector.select(self._next_timeout())
+            for key, _ in events:
+                try:
+                    key.data(key.fileobj)
+                except Exception as e:
+                    log.warning("Network error: %s", e, extra={"rate_limit": ERROR_LOG_RATE})
+            self._run_due_timers()
+
+    def stop(self):
+        """Ask the event loop to exit"""
+        self.running = False
+        self.wakeup()
+
+    def close(self):
+        """Release the selector and wakeup sockets"""
+        self.selector.close()
+        self._wake_recv.close()
+        self._wake_send.close()
+
+class _IoVec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_name", ctypes.c_void_p),
+        ("msg_namelen", ctypes.c_uint32),
+        ("msg_iov", ctypes.POINTER(_IoVec)),
+        ("msg_iovlen", ctypes.c_size_t),
+        ("msg_control", ctypes.c_void_p),
+        ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags", ctypes.c_int),
+    ]
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _MsgHdr), ("msg_len", ctypes.c_uint)]
+
+class _SockAddrIn(ctypes.Structure):
+    _fields_ = [
+        ("sin_family", ctypes.c_ushort),
+        ("sin_port", ctypes.c_uint16),
+        ("sin_addr", ctypes.c_uint8 * 4),
+        ("sin_zero", ctypes.c_uint8 * 8),
+    ]
+
+_MSG_DONTWAIT = 0x40
+
+def _load_recvmmsg():
+    """Return libc's recvmmsg, or None where it is not available"""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        recvmmsg = libc.recvmmsg
+    except (OSError, AttributeError):
+        return None
+    recvmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(_MMsgHdr), ctypes.c_uint,
+                         ctypes.c_int, ctypes.c_void_p]
+    recvmmsg.restype = ctypes.c_int
+    return recvmmsg
+
+def _load_sendmmsg():
+    """Return libc's sendmmsg, or None where it is not available"""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        sendmmsg = libc.sendmmsg
+    except (OSError, AttributeError):
+        return None
+    sendmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(_MMsgHdr), ctypes.c_uint, ctypes.c_int]
+    sendmmsg.restype = ctypes.c_int
+    return sendmmsg
+
+_recvmmsg = _load_recvmmsg()
+_sendmmsg = _load_sendmmsg()
+
+class DatagramReceiver:
+    """Drains a UDP socket into a preallocated ring of fixed-size slots
+
+    Payloads are handed to the handler as memoryview slices of one
+    bytearray, so a burst of datagrams does not allocate a bytes object
+    per packet. On Linux, recvmmsg() fills every slot in one system call;
+    elsewhere each slot is filled with recvfrom_into().
+    """
+
+    def __init__(self, sock: socket.socket, slots: int = 64, slot_size: int = 1024,
+                 use_recvmmsg: bool = True):
+        self.sock = sock
+        self.slots = slots
+        self.slot_size = slot_size
+        self.buffer = bytearray(slots * slot_size)
+        self._view = memoryview(self.buffer)
+        self._slot_views = [self._view[i * slot_size:(i + 1) * slot_size] for i in range(slots)]
+        self._addr_cache: Dict[Tuple[int, int], Tuple[str, int]] = {}
+
+        self._batch = None
+        if use_recvmmsg and _recvmmsg is not None and sock.family == socket.AF_INET:
+            self._setup_recvmmsg()
+
+    @property
+    def uses_recvmmsg(self) -> bool:
+        """True when bursts are read with a single recvmmsg() call"""
+        return self._batch is not None
+
+    def _setup_recvmmsg(self):
+        backing = (ctypes.c_char * len(self.buffer)).from_buffer(self.buffer)
+        base = ctypes.addressof(backing)
+        iovecs = (_IoVec * self.slots)()
+        names = (_SockAddrIn * self.slots)()
+        msgs = (_MMsgHdr * self.slots)()
+        for i in range(self.slots):
+            iovecs[i].iov_base = base + i * self.slot_size
+            iovecs[i].iov_len = self.slot_size
+            msgs[i].msg_hdr.msg_name = ctypes.addressof(names[i])
+            msgs[i].msg_hdr.msg_iov = ctypes.pointer(iovecs[i])
+            msgs[i].msg_hdr.msg_iovlen = 1
+        self._batch = (backing, iovecs, names, msgs)
+
+    def _address(self, name: _SockAddrIn) -> Tuple[str, int]:
+        raw = name.sin_addr
+        key = ((raw[0] << 24) | (raw[1] << 16) | (raw[2] << 8) | raw[3], name.sin_port)
+        addr = self._addr_cache.get(key)
+        if addr is None:
+            if len(self._addr_cache) > 4096:
+                self._addr_cache.clear()
+            addr = (f"{raw[0]}.{raw[1]}.{raw[2]}.{raw[3]}", socket.ntohs(name.sin_port))
+            self._addr_cache[key] = addr
+        return addr
+
+    def drain(self, handler: DatagramHandler, max_datagrams: int) -> int:
+        """Deliver pending datagrams to handler until the socket is empty
+
+        Returns the number of datagrams handled, at most max_datagrams.
+        """
+        if self._batch is not None:
+            return self._drain_recvmmsg(handler, max_datagrams)
+        return self._drain_recv_into(handler, max_datagrams)
+
+    def _drain_recv_into(self, handler: DatagramHandler, max_datagrams: int) -> int:
+        handled = 0
+        slot = 0
+        while handled < max_datagrams:
+            view = self._slot_views[slot]
+            try:
+                nbytes, addr = self.sock.recvfrom_into(view)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError as e:
+                # Windows reports ICMP port unreachable as a recv error
+                log.warning("Network error: %s", e, extra={"rate_limit": ERROR_LOG_RATE})
+                continue
+            handler(view[:nbytes], addr)
+            handled += 1
+            slot = (slot + 1) % self.slots
+        return handled
+
+    def _drain_recvmmsg(self, handler: DatagramHandler, max_datagrams: int) -> int:
+        _, _, names, msgs = self._batch
+        fd = self.sock.fileno()
+        handled = 0
+        while handled < max_datagrams:
+            batch = min(self.slots, max_datagrams - handled)
+            for i in range(batch):
+                msgs[i].msg_hdr.msg_namelen = ctypes.sizeof(_SockAddrIn)
+            count = _recvmmsg(fd, msgs, batch, _MSG_DONTWAIT, None)
+            if count < 0:
+                err = ctypes.get_errno()
+                if err in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                    break
+                log.warning("Network error: %s", OSError(err, errno.errorcode.get(err, '')),
+                            extra={"rate_limit": ERROR_LOG_RATE})
+                break
+            for i in range(count):
+                handler(self._slot_views[i][:msgs[i].msg_len], self._address(names[i]))
+            handled += count
+            if count < batch:
+                break
+        return handled
+
+class SocketPool:
+    """Per-robot UDP sockets connect()ed to the robot's command address
+
+    A connected socket sends with send() instead of sendto(), lets the
+    kernel cache the route, and reports ICMP port-unreachable for that
+    robot alone, as ConnectionRefusedError on a later send.
+    """
+
+    def __init__(self):
+        self._sockets: CopyOnWriteDict[str, Tuple[Tuple[str, int], socket.socket]] = CopyOnWriteDict()
+        self.unreachable: CopyOnWriteDict[str, int] = CopyOnWriteDict()
+
+    def __len__(self) -> int:
+        return len(self._sockets)
+
+    def __contains__(self, robot_id) -> bool:
+        return robot_id in self._sockets
+
+    def open(self, robot_id: str, address: Tuple[str, int]) -> socket.socket:
+        """Socket connected to address, reusing the robot's current one if it matches"""
+        entry = self._sockets.get(robot_id)
+        if entry is not None:
+            if entry[0] == address:
+                return entry[1]
+            self.close(robot_id)
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setblocking(False)
+        try:
+            sock.connect(address)
+        except OSError:
+            sock.close()
+            raise
+        self._sockets[robot_id] = (address, sock)
+        self.unreachable.pop(robot_id, None)
+        return sock
+
+    def get(self, robot_id: str) -> Optional[socket.socket]:
+        entry = self._sockets.get(robot_id)
+        return entry[1] if entry is not None else None
+
+    def send(self, robot_id: str, data) -> bool:
+        """Send on robot_id's socket; False if it has none or the robot is unreachable"""
+        entry = self._sockets.get(robot_id)
+        if entry is None:
+            return False
+        try:
+            entry[1].send(data)
+            return True
+        except ConnectionRefusedError:
+            # ICMP port unreachable from an earlier datagram
+            self.unreachable[robot_id] = self.unreachable.get(robot_id, 0) + 1
+            return False
+
+    def close(self, robot_id: str):
+        entry = self._sockets.pop(robot_id, None)
+        self.unreachable.pop(robot_id, None)
+        if entry is not None:
+            entry[1].close()
+
+    def close_all(self):
+        for robot_id in list(self._sockets):
+            self.close(robot_id)
+
+@dataclass
+class FanOutReport:
+    """Timing of one e-stop or game-status fan-out, measured from the keypress"""
+    kind: str
+    datagrams: int
+    bursts: int
+    first_burst_s: float
+    last_datagram_s: float
+    done: bool = False  # no more repeats will go out
+
+class DatagramFanOut:
+    """Sends a batch of (payload, address) datagrams with as few syscalls as possible
+
+    On Linux one sendmmsg() call carries the whole batch. Elsewhere, or if
+    the batch is cut short, the rest goes out with sendto(). A destination
+    that fails (e.g. network unreachable) is skipped so one bad address
+    cannot hold back the others.
+    """
+
+    def __init__(self, sock: socket.socket, use_sendmmsg: bool = True):
+        self.sock = sock
+        self.use_sendmmsg = use_sendmmsg and _sendmmsg is not None and sock.family == socket.AF_INET
+        self._sockaddrs: Dict[Tuple[str, int], _SockAddrIn] = {}
+        self.errors = 0
+
+    @property
+    def uses_sendmmsg(self) -> bool:
+        return self.use_sendmmsg
+
+    def _sockaddr(self, address: Tuple[str, int]) -> _SockAddrIn:
+        name = self._sockaddrs.get(address)
+        if name is None:
+            if len(self._sockaddrs) > 4096:
+                self._sockaddrs.clear()
+            name = _SockAddrIn()
+            name.sin_family = socket.AF_INET
+            name.sin_port = socket.htons(address[1])
+            name.sin_addr[:] = socket.inet_aton(address[0])
+            self._sockaddrs[address] = name
+        return name
+
+    def send(self, messages) -> int:
+        """Send every (payload, (ip, port)) in messages; returns how many left"""
+        messages = list(messages)
+        if not messages:
+            return 0
+        start = sent = 0
+        if self.use_sendmmsg:
+            try:
+                start, sent = self._send_mmsg(messages)
+            except OSError:  # unparsable address; let sendto() report it
+                start = sent = 0
+        for payload, address in messages[start:]:
+            try:
+                self.sock.sendto(payload, address)
+                sent += 1
+            except OSError as e:
+                self.errors += 1
+                log.warning("Error sending to %s:%d: %s", address[0], address[1], e,
+                            extra={"rate_limit": ERROR_LOG_RATE})
+        return sent
+
+    def _send_mmsg(self, messages) -> Tuple[int, int]:
+        """Send as much of messages as sendmmsg() takes
+
+        Returns (messages processed, messages delivered to the kernel).
+        """
+        count = len(messages)
+        payloads = [bytes(payload) for payload, _ in messages]
+        buffers = [ctypes.create_string_buffer(payload, len(payload)) for payload in payloads]
+        iovecs = (_IoVec * count)()
+        msgs = (_MMsgHdr * count)()
+        # Held here too: another thread may evict them from the cache mid-send
+        names = [self._sockaddr(address) for _, address in messages]
+        for i, (payload, name) in enumerate(zip(payloads, names)):
+            iovecs[i].iov_base = ctypes.addressof(buffers[i])
+            iovecs[i].iov_len = len(payload)
+            msgs[i].msg_hdr.msg_name = ctypes.addressof(name)
+            msgs[i].msg_hdr.msg_namelen = ctypes.sizeof(_SockAddrIn)
+            msgs[i].msg_hdr.msg_iov = ctypes.pointer(iovecs[i])
+            msgs[i].msg_hdr.msg_iovlen = 1
+
+        fd = self.sock.fileno()
+        base = ctypes.addressof(msgs)
+        sent = delivered = 0
+        while sent < count:
+            remaining = ctypes.cast(base + sent * ctypes.sizeof(_MMsgHdr), ctypes.POINTER(_MMsgHdr))
+            result = _sendmmsg(fd, remaining, count - sent, _MSG_DONTWAIT)
+            if result > 0:
+                sent += result
+                delivered += result
+                continue
+            err = ctypes.get_errno()
+            if err == errno.EINTR:
+                continue
+            if err in (errno.EAGAIN, errno.EWOULDBLOCK):
+                break  # socket buffer full; sendto() will retry the rest
+            # The first remaining datagram failed on its own; skip it
+            self.errors += 1
+            address = messages[sent][1]
+            log.warning("Error sending to %s:%d: %s", address[0], address[1],
+                        OSError(err, errno.errorcode.get(err, '')), extra={"rate_limit": ERROR_LOG_RATE})
+            sent += 1
+        return sent, delivered
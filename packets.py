@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Controller packet encoding shared by the driver station and tools
+Protocol v1 matches the 24-byte layout parsed by minibot.cpp; v2 is
+negotiated per robot during discovery
+"""
+
+import struct
+from typing import Optional, Tuple
+
+# Bytes 0-15: Robot name (16 bytes, null-terminated)
+ROBOT_NAME_SIZE = 16
+# Bytes 16-21: Axes (leftX, leftY, rightX, rightY, L2, R2; minibot.cpp reads the first four)
+# Bytes 22-23: Buttons (bitfield, reserved)
+CONTROLLER_DATA = struct.Struct('BBBBBBBB')
+CONTROLLER_PACKET_SIZE = ROBOT_NAME_SIZE + CONTROLLER_DATA.size
+
+NEUTRAL_AXIS = 127
+
+# Protocol v2, for robots listing FEATURE_PROTOCOL_V2 in DISCOVER. The PORT
+# reply then carries ":v2:<slot>", and controller packets are 17 bytes:
+# Byte 0: Protocol version (2)
+# Bytes 1-2: Robot slot id (big-endian)
+# Bytes 3-4: Sequence number (big-endian, wraps at 65536)
+# Bytes 5-8: Station timestamp in milliseconds (big-endian, wraps)
+# Bytes 9-14: All six axes
+# Bytes 15-16: Buttons
+PROTOCOL_V1 = 1
+PROTOCOL_V2 = 2
+FEATURE_PROTOCOL_V2 = "v2"
+V2_HEADER = struct.Struct('!BHHI')
+V2_PACKET = struct.Struct('!BHHI8B')
+V2_PACKET_SIZE = V2_PACKET.size
+MAX_SLOT = 0xFFFF
+SEQUENCE_MODULO = 1 << 16
+
+# Axis moves within this many counts of the last sent value are not resent
+AXIS_DEADBAND = 2
+# Values always sent immediately, regardless of the deadband
+_PINNED_AXIS_VALUES = (0, NEUTRAL_AXIS, 255)
+
+# Minibot::updateController disconnects after this long without commands
+FIRMWARE_COMMAND_TIMEOUT = 5.0
+# Resend unchanged controller data this often when idle
+KEEPALIVE_INTERVAL = 1.0
+# Transmit ticks that repeat a change, so one lost packet is not left
+# uncorrected until the next keepalive
+CHANGE_REPEATS = 3
+
+def encode_robot_name(robot_id: str) -> bytes:
+    """Encode a robot name into the 16-byte null-padded packet prefix"""
+    return robot_id.encode('utf-8')[:ROBOT_NAME_SIZE - 1].ljust(ROBOT_NAME_SIZE, b'\x00')
+
+def sequence_newer(sequence: int, last: int) -> bool:
+    """True if 16-bit sequence comes after last, allowing for wraparound"""
+    return 0 < (sequence - last) % SEQUENCE_MODULO < SEQUENCE_MODULO // 2
+
+def decode_v2(data) -> Optional[Tuple[int, int, int, Tuple[int, ...]]]:
+    """Split a v2 controller packet into (slot, sequence, timestamp_ms, values)"""
+    if len(data) != V2_PACKET_SIZE or data[0] != PROTOCOL_V2:
+        return None
+    _, slot, sequence, timestamp, *values = V2_PACKET.unpack(data)
+    return slot, sequence, timestamp, tuple(values)
+
+def button_byte(cross: bool, circle: bool, square: bool, triangle: bool) -> int:
+    """Pack face buttons into the bitfield read by Minibot::getCross() etc."""
+    return (
+        (1 if cross else 0) |
+        ((1 if circle else 0) << 1) |
+        ((1 if square else 0) << 2) |
+        ((1 if triangle else 0) << 3)
+    )
+
+def controller_values(controller) -> Tuple[int, ...]:
+    """Values for CONTROLLER_DATA from anything with ControllerState fields"""
+    return (
+        controller.left_x,
+        controller.left_y,
+        controller.right_x,
+        controller.right_y,
+        controller.left_trigger,  # Not read by the v1 firmware
+        controller.right_trigger,
+        button_byte(controller.cross, controller.circle, controller.square, controller.triangle),
+        0
+    )
+
+class ControllerPacket:
+    """Preencoded controller packet for one robot
+
+    The name prefix is written once; each update patches the axes and
+    buttons in place with a single pack_into.
+    """
+
+    __slots__ = ("robot_id", "buffer", "sent_values", "last_sent", "sent_count", "saved_count",
+                 "repeats")
+
+    protocol = PROTOCOL_V1
+
+    def __init__(self, robot_id: str, buffer=None):
+        self.robot_id = robot_id
+        # A caller-owned buffer (e.g. a row of a fleet array) is written in place
+        self.buffer = bytearray(CONTROLLER_PACKET_SIZE) if buffer is None else buffer
+        self.buffer[:ROBOT_NAME_SIZE] = encode_robot_name(robot_id)
+        CONTROLLER_DATA.pack_into(self.buffer, ROBOT_NAME_SIZE, *(NEUTRAL_AXIS,) * 6, 0, 0)
+        self.sent_values: Optional[Tuple[int, ...]] = None
+        self.last_sent = 0.0
+        self.sent_count = 0
+        self.saved_count = 0
+        # Ticks left that resend the last change; set by SendPolicy
+        self.repeats = 0
+
+    def update(self, values: Tuple[int, ...]):
+        """Write axes and buttons into the packet"""
+        CONTROLLER_DATA.pack_into(self.buffer, ROBOT_NAME_SIZE, *values)
+
+    def stamp(self, now: float):
+        """Prepare the header for the next send; v1 packets have none"""
+
+    def mark_sent(self, values: Tuple[int, ...], now: float):
+        """Record that the packet carrying values went out at time now"""
+        self.sent_values = values
+        self.last_sent = now
+        self.sent_count += 1
+
+    def invalidate(self):
+        """Force the next policy check to send"""
+        self.sent_values = None
+
+class ControllerPacketV2(ControllerPacket):
+    """Preencoded protocol v2 packet for one robot
+
+    The 16-byte name is replaced by the robot's slot id, and every send
+    is stamped with the next sequence number and the station's clock, so
+    the robot can drop packets that arrive late or out of order.
+    """
+
+    __slots__ = ("slot", "sequence")
+
+    protocol = PROTOCOL_V2
+
+    def __init__(self, robot_id: str, slot: int):
+        if not 0 <= slot <= MAX_SLOT:
+            raise ValueError(f"Slot must be between 0 and {MAX_SLOT}, got {slot}")
+        self.robot_id = robot_id
+        self.slot = slot
+        self.sequence = 0
+        self.buffer = bytearray(V2_PACKET_SIZE)
+        V2_PACKET.pack_into(self.buffer, 0, PROTOCOL_V2, slot, 0, 0, *(NEUTRAL_AXIS,) * 6, 0, 0)
+        self.sent_values: Optional[Tuple[int, ...]] = None
+        self.last_sent = 0.0
+        self.sent_count = 0
+        self.saved_count = 0
+        self.repeats = 0
+
+    def update(self, values: Tuple[int, ...]):
+        """Write axes and buttons into the packet"""
+        CONTROLLER_DATA.pack_into(self.buffer, V2_HEADER.size, *values)
+
+    def stamp(self, now: float):
+        """Advance the sequence number and timestamp the packet with now"""
+        self.sequence = (self.sequence + 1) % SEQUENCE_MODULO
+        V2_HEADER.pack_into(self.buffer, 0, PROTOCOL_V2, self.slot, self.sequence,
+                            int(now * 1000) & 0xFFFFFFFF)
+
+class SendPolicy:
+    """Decides whether a controller packet is worth the airtime
+
+    A packet goes out when a button changes, when an axis moves more than
+    the deadband from the value the robot last received, or when an axis
+    reaches neutral or full scale (so releasing a stick is never held back).
+    Each change is then repeated on the next few ticks, since a lost
+    return-to-neutral would otherwise stand until the keepalive. Otherwise
+    it is only resent as a keepalive, which must stay under the firmware's
+    command timeout or the robot drops back to discovery.
+    """
+
+    def __init__(self, deadband: int = AXIS_DEADBAND, keepalive_interval: float = KEEPALIVE_INTERVAL,
+                 change_repeats: int = CHANGE_REPEATS):
+        if not 0 < keepalive_interval < FIRMWARE_COMMAND_TIMEOUT:
+            raise ValueError(
+                f"Keepalive interval must be between 0 and {FIRMWARE_COMMAND_TIMEOUT} s, "
+                f"got {keepalive_interval}"
+            )
+        if deadband < 0:
+            raise ValueError(f"Deadband must not be negative, got {deadband}")
+        if change_repeats < 0:
+            raise ValueError(f"Change repeats must not be negative, got {change_repeats}")
+        self.deadband = deadband
+        self.keepalive_interval = keepalive_interval
+        self.change_repeats = change_repeats
+
+    def should_send(self, packet: ControllerPacket, values: Tuple[int, ...], now: float) -> bool:
+        """True if values should be sent now; counts the packet as saved if not"""
+        sent = packet.sent_values
+        if sent is None or values[6:] != sent[6:]:
+            packet.repeats = self.change_repeats
+            return True
+        for axis in range(6):
+            value = values[axis]
+            if value == sent[axis]:
+                continue
+            if abs(value - sent[axis]) > self.deadband or value in _PINNED_AXIS_VALUES:
+                packet.repeats = self.change_repeats
+                return True
+        if packet.repeats:
+            packet.repeats -= 1
+            return True
+        if now - packet.last_sent >= self.keepalive_interval:
+            return True
+        packet.saved_count += 1
+        return False
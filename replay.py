@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Replay of flight recorder sessions
+Recorded discovery traffic and controller input are fed back into a
+headless DriverStation talking to demo_mode robots, and the packets it
+sends are compared byte for byte with the recording
+"""
+
+import argparse
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+from demo_mode import SIM_PORT_BASE, SimulatedRobot
+from driver_station import GAME_STATUSES, ROBOT_TIMEOUT, DriverStation
+from estop import FEATURE_ESTOP_ACK
+from flight_recorder import RECEIVED, Record, read_records
+from packets import (AXIS_DEADBAND, CONTROLLER_PACKET_SIZE, FEATURE_PROTOCOL_V2, KEEPALIVE_INTERVAL,
+                     PROTOCOL_V1, PROTOCOL_V2, ROBOT_NAME_SIZE, V2_HEADER, V2_PACKET_SIZE)
+
+# Bytes 5-8 of a v2 packet carry the station clock, which differs per run
+_V2_TIMESTAMP = slice(5, V2_HEADER.size)
+
+class ReplayEvent(NamedTuple):
+    """One station input recovered from a recording"""
+    timestamp: float
+    kind: str  # "discover", "controller", "status" or "estop"
+    robot_id: Optional[str]
+    # discover: features; controller: CONTROLLER_DATA values;
+    # status: the status; estop: (enable, sequence or None)
+    value: object
+
+class Emitted(NamedTuple):
+    """A sent datagram, keyed by robot rather than address"""
+    destination: str  # robot id, or "ip:port" for broadcasts
+    data: bytes
+
+def _estop_payload(text: str) -> Optional[Tuple[bool, Optional[int]]]:
+    command, _, sequence = text.partition(":")
+    if command not in ("ESTOP", "ESTOP_OFF"):
+        return None
+    try:
+        return command == "ESTOP", int(sequence) if sequence else None
+    except ValueError:
+        return None
+
+class Session:
+    """A recording split into station inputs and the datagrams it sent
+
+    Controller input is recovered from the controller packets themselves,
+    game status and e-stop changes from their fan-out batches, and robots
+    from their DISCOVER datagrams. In the sent stream, e-stop resends are
+    dropped (how many go out depends on ack timing) and v2 timestamps
+    are zeroed, so two runs of the same session compare equal.
+    """
+
+    def __init__(self, records: Iterable[Record]):
+        self.events: List[ReplayEvent] = []
+        self.emitted: List[Emitted] = []
+        # robot_id -> features from its latest DISCOVER, in discovery order
+        self.robots: Dict[str, FrozenSet[str]] = {}
+        self.first_estop_sequence: Optional[int] = None
+        self._addresses: Dict[Tuple[str, int], str] = {}
+        self._slots: Dict[int, str] = {}
+        self._status_batch: Tuple[Optional[str], set] = (None, set())
+        self._estop: Optional[Tuple[bool, Optional[int]]] = None
+        self._estop_sent: set = set()
+        for record in records:
+            if record.direction == RECEIVED:
+                self._received(record)
+            else:
+                self._sent(record)
+
+    def _received(self, record: Record):
+        parts = record.data.decode('utf-8', errors='ignore').split(":")
+        if parts[0] != "DISCOVER" or len(parts) < 3:
+            return  # e-stop acks come from the replay robots themselves
+        robot_id = parts[1]
+        features = frozenset(filter(None, parts[4].split(","))) if len(parts) >= 5 else frozenset()
+        self.robots[robot_id] = features
+        self._addresses[record.address] = robot_id
+        self.events.append(ReplayEvent(record.timestamp, "discover", robot_id, features))
+
+    def _sent(self, record: Record):
+        data = record.data
+        destination = self._addresses.get(record.address)
+        text = data.decode('utf-8', errors='ignore') if data[:1].isalpha() else ""
+
+        if text.startswith("PORT:"):
+            parts = text.split(":")
+            robot_id = parts[1]
+            self._addresses[(record.address[0], int(parts[2]))] = robot_id
+            if len(parts) >= 5 and parts[3] == FEATURE_PROTOCOL_V2:
+                self._slots[int(parts[4])] = robot_id
+            self.emitted.append(Emitted(robot_id, data))
+            return
+
+        estop = _estop_payload(text)
+        if estop is not None:
+            self._on_estop(record.timestamp, estop)
+            key = (destination or f"{record.address[0]}:{record.address[1]}", data)
+            if key not in self._estop_sent:
+                self._estop_sent.add(key)
+                self.emitted.append(Emitted(*key))
+            return
+
+        robot_id, _, status = text.partition(":")
+        if status in GAME_STATUSES:
+            batch_status, batch_robots = self._status_batch
+            if status != batch_status or robot_id in batch_robots:
+                self.events.append(ReplayEvent(record.timestamp, "status", None, status))
+                batch_robots = set()
+            batch_robots.add(robot_id)
+            self._status_batch = (status, batch_robots)
+            self.emitted.append(Emitted(robot_id, data))
+            return
+
+        robot_id, values = destination, None
+        if len(data) == V2_PACKET_SIZE and data[0] == PROTOCOL_V2:
+            robot_id = self._slots.get(int.from_bytes(data[1:3], "big"), destination)
+            values = tuple(data[V2_HEADER.size:])
+            data = data[:_V2_TIMESTAMP.start] + bytes(4) + data[_V2_TIMESTAMP.stop:]
+        elif len(data) == CONTROLLER_PACKET_SIZE:
+            robot_id = data[:ROBOT_NAME_SIZE].rstrip(b"\x00").decode('utf-8', errors='ignore')
+            values = tuple(data[ROBOT_NAME_SIZE:])
+        if values is not None and robot_id is not None:
+            self.events.append(ReplayEvent(record.timestamp, "controller", robot_id, values))
+        self.emitted.append(Emitted(robot_id or f"{record.address[0]}:{record.address[1]}", data))
+
+    def _on_estop(self, timestamp: float, estop: Tuple[bool, Optional[int]]):
+        enable, sequence = estop
+        last = self._estop
+        if sequence is not None:
+            if self.first_estop_sequence is None:
+                self.first_estop_sequence = sequence
+            if last is not None and last[1] == sequence:
+                return  # another robot's copy, or a resend
+            if last is not None and last == (enable, None) and self.events[-1].kind == "estop":
+                # Same change, already seen on a robot without acks
+                self.events[-1] = self.events[-1]._replace(value=estop)
+                self._estop = estop
+                return
+        elif last is not None and last[0] == enable:
+            return
+        self._estop = estop
+        self._estop_sent = set()
+        self.events.append(ReplayEvent(timestamp, "estop", None, estop))
+
+def by_destination(stream: List[Emitted]) -> Dict[str, List[bytes]]:
+    """Each destination's datagrams, in the order they were sent"""
+    streams: Dict[str, List[bytes]] = {}
+    for item in stream:
+        streams.setdefault(item.destination, []).append(item.data)
+    return streams
+
+def first_mismatch(expected: List[Emitted], actual: List[Emitted]) -> Optional[Tuple[str, int]]:
+    """(destination, index) of the first differing datagram, or None if the streams match
+
+    Streams are compared per destination: the network thread answers
+    DISCOVER while other threads send, so the interleaving across robots
+    is not reproducible, but each robot's own sequence is.
+    """
+    expected_streams, actual_streams = by_destination(expected), by_destination(actual)
+    for destination in sorted(expected_streams.keys() | actual_streams.keys()):
+        a, b = expected_streams.get(destination, []), actual_streams.get(destination, [])
+        for index, (x, y) in enumerate(zip(a, b)):
+            if x != y:
+                return destination, index
+        if len(a) != len(b):
+            return destination, min(len(a), len(b))
+    return None
+
+class ReplayResult(NamedTuple):
+    events: int
+    elapsed_s: float
+    expected: List[Emitted]
+    actual: List[Emitted]
+    mismatch: Optional[Tuple[str, int]]  # destination and index in its stream
+
+class Replayer:
+    """Feeds a recorded session into a headless station and demo_mode robots
+
+    speed is a multiple of real time (1.0 replays at the recorded pace);
+    None replays as fast as possible. The station reads a virtual clock
+    that follows the recording, so keepalives and deadband decisions come
+    out the same at any speed.
+    """
+
+    def __init__(self, records: Iterable[Record], speed: Optional[float] = 1.0,
+                 port_base: int = SIM_PORT_BASE, **station_options):
+        if speed is not None and speed <= 0:
+            raise ValueError(f"Speed must be positive, got {speed}")
+        self.session = Session(records)
+        self.speed = speed
+        self.port_base = port_base
+        self.station_options = station_options
+        self.robots: Dict[str, SimulatedRobot] = {}
+        self._controllers: Dict[str, int] = {}
+        self._now = 0.0
+
+    def _start_robots(self):
+        for index, (robot_id, features) in enumerate(self.session.robots.items()):
+            robot = SimulatedRobot(robot_id, discovery_port=self.port_base + index, verbose=False,
+                                   estop_acks=FEATURE_ESTOP_ACK in features,
+                                   protocol_v2=FEATURE_PROTOCOL_V2 in features)
+            threading.Thread(target=robot.listen_for_commands, daemon=True).start()
+            self.robots[robot_id] = robot
+
+    def _apply(self, station: DriverStation, event: ReplayEvent):
+        if event.kind == "discover":
+            robot = self.robots[event.robot_id]
+            message = f"DISCOVER:{event.robot_id}:{robot.ip}:{robot.discovery_port}"
+            if event.value:
+                message += ":" + ",".join(sorted(event.value))
+            station._handle_datagram(memoryview(message.encode()), (robot.ip, robot.discovery_port))
+        elif event.kind == "controller":
+            robot_id, values = event.robot_id, event.value
+            index = self._controllers.get(robot_id)
+            if index is None:
+                index = self._controllers[robot_id] = len(self._controllers)
+            station.set_virtual_controller(index, *values[:4], buttons=values[6],
+                                           left_trigger=values[4], right_trigger=values[5])
+            if station.robot_controller_pairs.get(robot_id) != index and robot_id in station.robots:
+                station.pair(robot_id, index)
+            station._send_controller_data(robot_id, station.controllers[index].snapshot())
+        elif event.kind == "status":
+            station.set_game_status(event.value)
+        elif event.kind == "estop":
+            station.set_emergency_stop(event.value[0])
+
+    def _expire_until(self, station: DriverStation, now: float):
+        """Time out robots whose deadline falls before the next event
+
+        The station's expiry timer runs on real time, which only matches
+        the virtual clock at 1x, so replay steps the clock to each
+        deadline and expires robots itself.
+        """
+        deadline = station._expiry_deadline
+        while deadline is not None and deadline <= now:
+            self._now = deadline
+            station._expire_robots()
+            deadline = station._expiry_deadline
+
+    def run(self) -> ReplayResult:
+        events = self.session.events
+        with tempfile.TemporaryDirectory() as directory:
+            station = DriverStation(headless=True, discovery_port=0, record_dir=directory,
+                                    **self.station_options)
+            self._start_robots()
+            try:
+                if self.session.first_estop_sequence is not None:
+                    station.estop.sequence = self.session.first_estop_sequence - 1
+                start = time.monotonic()
+                first = events[0].timestamp if events else 0.0
+                station.monotonic = lambda: self._now
+                for event in events:
+                    offset = event.timestamp - first
+                    if self.speed is not None:
+                        delay = start + offset / self.speed - time.monotonic()
+                        if delay > 0:
+                            time.sleep(delay)
+                    self._expire_until(station, start + offset)
+                    self._now = start + offset
+                    self._apply(station, event)
+                elapsed = time.monotonic() - start
+                # The recording already ends with the shutdown e-stop
+                station.recorder.close()
+                station.recorder = None
+            finally:
+                for robot in self.robots.values():
+                    robot.stop()
+                station.shutdown()
+            actual = Session(read_records(directory)).emitted
+        expected = self.session.emitted
+        return ReplayResult(len(events), elapsed, expected, actual, first_mismatch(expected, actual))
+
+def print_report(result: ReplayResult):
+    rate = result.events / result.elapsed_s if result.elapsed_s > 0 else float("inf")
+    print(f"Replayed {result.events} events in {result.elapsed_s:.3f} s ({rate:.0f} events/s)")
+    print(f"Recorded {len(result.expected)} datagrams, replay sent {len(result.actual)}")
+    if result.mismatch is None:
+        print("Packet streams match")
+        return
+    destination, index = result.mismatch
+    print(f"Packet streams differ at datagram {index} to {destination}:")
+    for label, stream in (("recorded", result.expected), ("replayed", result.actual)):
+        datagrams = by_destination(stream).get(destination, [])
+        print(f"  {label}: " + (datagrams[index].hex() if index < len(datagrams) else "(end of stream)"))
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a flight recorder session and compare packets")
+    parser.add_argument("recording", help="Recording directory or segment file")
+    speed = parser.add_mutually_exclusive_group()
+    speed.add_argument("--speed", type=float, default=1.0,
+                       help="Multiple of real time (default: 1.0)")
+    speed.add_argument("--max-speed", action="store_true", help="Replay as fast as possible")
+    parser.add_argument("--deadband", type=int, default=AXIS_DEADBAND,
+                        help=f"Station axis deadband used for the recording (default: {AXIS_DEADBAND})")
+    parser.add_argument("--keepalive", type=float, default=KEEPALIVE_INTERVAL,
+                        help=f"Station keepalive used for the recording (default: {KEEPALIVE_INTERVAL})")
+    parser.add_argument("--protocol", type=int, choices=(PROTOCOL_V1, PROTOCOL_V2), default=PROTOCOL_V2,
+                        help=f"Station protocol used for the recording (default: {PROTOCOL_V2})")
+    parser.add_argument("--robot-timeout", type=float, default=ROBOT_TIMEOUT,
+                        help=f"Station robot timeout used for the recording (default: {ROBOT_TIMEOUT})")
+    parser.add_argument("--port-base", type=int, default=SIM_PORT_BASE,
+                        help="Replay robot i listens for PORT replies on port-base + i")
+    args = parser.parse_args()
+
+    replayer = Replayer(read_records(args.recording), speed=None if args.max_speed else args.speed,
+                        port_base=args.port_base, deadband=args.deadband,
+                        keepalive_interval=args.keepalive, protocol=args.protocol,
+                        robot_timeout=args.robot_timeout)
+    result = replayer.run()
+    print_report(result)
+    sys.exit(0 if result.mismatch is None else 1)
+
+if __name__ == "__main__":
+    main()
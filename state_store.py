@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Lock-free-for-readers shared state for the network, input and UI threads
+Writers copy, modify and atomically publish; readers never lock
+"""
+
+import threading
+from typing import Dict, Generic, Iterator, Mapping, Optional, TypeVar
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+class CopyOnWriteDict(Generic[K, V]):
+    """Dict whose published contents are never mutated in place
+
+    Every write copies the current dict under a writer lock, applies the
+    change and swaps the reference in one assignment. A reader that takes
+    snapshot() (or iterates) sees one consistent version for as long as it
+    holds it, so iteration can never fail with "dictionary changed size
+    during iteration", and readers never wait on writers. Writes cost
+    O(n), which suits state that is read every tick but changes rarely.
+    """
+
+    __slots__ = ("_data", "_lock", "version")
+
+    def __init__(self, initial: Optional[Mapping[K, V]] = None):
+        self._data: Dict[K, V] = dict(initial or {})
+        self._lock = threading.Lock()
+        self.version = 0
+
+    def snapshot(self) -> Mapping[K, V]:
+        """The current contents; treat as read-only"""
+        return self._data
+
+    def _publish(self, data: Dict[K, V]):
+        self._data = data
+        self.version += 1
+
+    # Reads: one reference load, then work on that version
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key) -> bool:
+        return key in self._data
+
+    def __iter__(self) -> Iterator[K]:
+        return iter(self._data)
+
+    def __getitem__(self, key: K) -> V:
+        return self._data[key]
+
+    def get(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        return self._data.get(key, default)
+
+    def keys(self):
+        return self._data.keys()
+
+    def values(self):
+        return self._data.values()
+
+    def items(self):
+        return self._data.items()
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, CopyOnWriteDict):
+            other = other._data
+        return self._data == other
+
+    def __repr__(self):
+        return f"CopyOnWriteDict({self._data!r})"
+
+    # Writes: copy, modify, publish
+
+    def __setitem__(self, key: K, value: V):
+        with self._lock:
+            data = dict(self._data)
+            data[key] = value
+            self._publish(data)
+
+    def __delitem__(self, key: K):
+        with self._lock:
+            data = dict(self._data)
+            del data[key]
+            self._publish(data)
+
+    def pop(self, key: K, *default):
+        with self._lock:
+            if key not in self._data:
+                if default:
+                    return default[0]
+                raise KeyError(key)
+            data = dict(self._data)
+            value = data.pop(key)
+            self._publish(data)
+            return value
+
+    def setdefault(self, key: K, value: V) -> V:
+        with self._lock:
+            existing = self._data.get(key)
+            if existing is not None or key in self._data:
+                return existing
+            data = dict(self._data)
+            data[key] = value
+            self._publish(data)
+            return value
+
+    def update(self, other: Mapping[K, V]):
+        with self._lock:
+            data = dict(self._data)
+            data.update(other)
+            self._publish(data)
+
+    def clear(self):
+        with self._lock:
+            self._publish({})
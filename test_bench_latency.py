@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Tests for the end-to-end latency benchmark
+"""
+
+from bench_latency import LatencyBenchmark
+
+def test_latency_benchmark_short_run():
+    """Test a short benchmark run produces sane latency and rate figures"""
+    benchmark = LatencyBenchmark(4, transmit_rate=100.0, input_rate=400.0, port_base=21500)
+    result = benchmark.run(duration=0.5, warmup=0.2)
+
+    assert result["config"]["robots"] == 4, "Config should record the robot count"
+    assert result["discovery_handshake_s"]["count"] == 4, "Every robot should complete a handshake"
+    parse = result["sample_to_parse_s"]
+    wire = result["sample_to_wire_s"]
+    assert parse["count"] > 0 and wire["count"] > 0, "Packets should be measured on wire and at the robot"
+    assert 0 <= wire["p50"] <= parse["p50"], "A packet is parsed after it leaves the station"
+    assert parse["p99"] < 0.1, "Loopback latency should be well under 100 ms"
+    assert 50 < result["packets_per_robot_hz"] < 150, \
+        f"Robots should see roughly the transmit rate: {result['packets_per_robot_hz']:.1f} Hz"
+    assert result["cpu"]["per_robot_pct"] >= 0, "CPU per robot should not be negative"
+
+    print("[OK] Latency benchmark test passed!")
+
+if __name__ == "__main__":
+    print("Running latency benchmark tests...\n")
+
+    test_latency_benchmark_short_run()
+
+    print("\n[SUCCESS] All latency benchmark tests passed!")
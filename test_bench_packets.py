@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Tests for the packet encode/decode microbenchmarks
+"""
+
+from bench_packets import (FleetEncoder, StructEncoder, _Controller, legacy_encode,
+                           run, struct_decode)
+from packets import ControllerPacket, controller_values
+
+def test_encoders_agree():
+    """Test every benchmarked encoder produces the same bytes on the wire"""
+    robot_ids = ["robot0", "robot1", "a_very_long_robot_name"]
+    controllers = [_Controller(i) for i in range(len(robot_ids))]
+    fleet = FleetEncoder(robot_ids)
+    fleet.encode([controller_values(c) for c in controllers])
+
+    for i, (robot_id, controller) in enumerate(zip(robot_ids, controllers)):
+        values = controller_values(controller)
+        expected = legacy_encode(robot_id, controller)
+        template = ControllerPacket(robot_id)
+        template.update(values)
+        assert bytes(template.buffer) == expected, f"pack_into encoder differs for {robot_id}"
+        assert StructEncoder(robot_id).encode(values) == expected, f"Struct encoder differs for {robot_id}"
+        assert bytes(fleet.packets[i]) == expected, f"Fleet encoder differs for {robot_id}"
+        assert struct_decode(expected) == values, f"Decoder does not round-trip {robot_id}"
+
+    print("[OK] Encoder agreement test passed!")
+
+def test_benchmark_report():
+    """Test the benchmark reports timings and allocations for every case"""
+    results = run(robots=4, min_time=0.01)
+    assert "encode/legacy" in results and "encode/fleet x4" in results, "Missing benchmark cases"
+    for name, stats in results.items():
+        assert stats["ns_per_packet"] > 0, f"{name} should take measurable time"
+    assert results["encode/pack_into"]["allocations_per_packet"] < 0.5, \
+        "In-place encoding should not leave a new object per packet"
+    assert results["encode/legacy"]["allocations_per_packet"] >= 1, \
+        "Legacy encoding allocates a new packet every call"
+
+    print("[OK] Benchmark report test passed!")
+
+if __name__ == "__main__":
+    print("Running packet benchmark tests...\n")
+
+    test_encoders_agree()
+    test_benchmark_report()
+
+    print("\n[SUCCESS] All packet benchmark tests passed!")
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Tests for driver station internals that run without a display or robots
+"""
+
+import socket
+import time
+
+import pygame
+
+from driver_station import (
+    COMMAND_PORT_BASE, LIST_TOP, PAIR_BUTTON_RECT, ROW_HEIGHT, ROW_PITCH, VISIBLE_ROWS, ControllerState,
+    DriverStation, HitGrid, PortAllocator, RobotRegistry, TextCache, TransmitScheduler
+)
+from headless import execute_command
+
+def test_transmit_scheduler_rate():
+    """Test that the transmit scheduler holds its configured rate"""
+    ticks = []
+    scheduler = TransmitScheduler(200, lambda: ticks.append(time.perf_counter()))
+    scheduler.start()
+    time.sleep(0.5)
+    scheduler.stop()
+
+    # 200 Hz for 0.5 s is 100 ticks; allow slack for a loaded test machine
+    assert 80 <= len(ticks) <= 110, f"Expected ~100 ticks, got {len(ticks)}"
+
+    # Deadlines are absolute, so the average period must not drift
+    average_period = (ticks[-1] - ticks[0]) / (len(ticks) - 1)
+    assert abs(average_period - 0.005) < 0.001, f"Average period drifted: {average_period}"
+
+    print("[OK] Transmit scheduler rate test passed!")
+
+def test_controller_snapshot():
+    """Test that snapshots are detached from the live controller state"""
+    controller = ControllerState(index=0, name="Test", joystick=None, left_x=10, cross=True)
+    snapshot = controller.snapshot()
+    controller.left_x = 200
+
+    assert snapshot.left_x == 10, "Snapshot should not follow later changes"
+    assert snapshot.cross, "Snapshot should copy button state"
+    assert snapshot.index == 0, "Snapshot should keep the controller index"
+
+    print("[OK] Controller snapshot test passed!")
+
+def test_text_cache_lru():
+    """Test that the text cache reuses surfaces and evicts least recently used"""
+    pygame.font.init()
+    font = pygame.font.Font(None, 24)
+    cache = TextCache(max_entries=2)
+
+    first = cache.render(font, "Robot: A", (255, 255, 255))
+    assert cache.render(font, "Robot: A", (255, 255, 255)) is first, "Cached surface should be reused"
+    assert cache.render(font, "Robot: A", (128, 128, 128)) is not first, "Color is part of the key"
+
+    cache.render(font, "Robot: A", (255, 255, 255))  # touch, so gray is now oldest
+    cache.render(font, "Robot: B", (255, 255, 255))
+    assert len(cache) == 2, f"Cache should hold 2 entries, has {len(cache)}"
+    assert cache.render(font, "Robot: A", (255, 255, 255)) is first, "Recently used entry was evicted"
+    assert cache.hits == 3 and cache.misses == 3, f"Unexpected stats: {cache.hits}/{cache.misses}"
+
+    print("[OK] Text cache LRU test passed!")
+
+def test_port_allocator_reuses_released_ports():
+    """Test that freed command ports are reused and never handed out twice"""
+    allocator = PortAllocator()
+    ports = [allocator.allocate() for _ in range(4)]
+    assert ports == [COMMAND_PORT_BASE + i for i in range(4)], f"Unexpected ports: {ports}"
+
+    # Removing a robot used to make len(robots) collide with a live port
+    allocator.release(ports[1])
+    allocator.release(ports[1])  # double release is harmless
+    assert allocator.allocate() == ports[1], "Lowest released port should be reused"
+    assert allocator.allocate() == COMMAND_PORT_BASE + 4, "New port expected after reuse"
+
+    allocator.reset()
+    assert allocator.allocate() == COMMAND_PORT_BASE, "Reset should start over"
+
+    print("[OK] Port allocator test passed!")
+
+def test_robot_registry_indexes_and_expiry():
+    """Test registry indexes stay consistent and only stale robots expire"""
+    registry = RobotRegistry(timeout=10.0)
+    a = registry.add("a", "10.0.0.1", now=0.0)
+    b = registry.add("b", "10.0.0.1", now=1.0)
+    c = registry.add("c", "10.0.0.2", now=2.0)
+    assert {r.robot_id for r in registry.by_ip("10.0.0.1")} == {"a", "b"}, "IP index mismatch"
+    assert registry.by_port(c.port) is c, "Port index mismatch"
+    assert registry.next_deadline() == 10.0, "Earliest deadline should be a's"
+
+    version = registry.version
+    assert registry.set_connected("a") and not registry.set_connected("a"), "Only real changes count"
+    assert registry.version == version + 1, "Connection change should bump the version"
+
+    registry.touch("a", now=9.0)
+    expired = registry.expire(now=11.5)
+    assert [r.robot_id for r in expired] == ["b"], f"Only b is stale at 11.5: {expired}"
+    assert "b" not in registry and registry.by_port(b.port) is None, "Expired robot still indexed"
+    assert registry.next_deadline() == 12.0, "c expires next"
+    assert registry.add("d", "10.0.0.3", now=12.0).port == b.port, "Freed port should be reused"
+
+    assert [r.robot_id for r in registry.expire(now=19.5)] == ["c", "a"], "Expiry follows last_seen"
+    assert registry.by_ip("10.0.0.1") == () and len(registry) == 1, "Only d should remain"
+    assert a.port not in (r.port for r in registry.values()), "a's port should be free"
+
+    # A robot removed and rediscovered leaves its old entry behind; it must
+    # not be pushed again alongside the new one
+    registry.remove("d")
+    registry.add("d", "10.0.0.3", now=20.0)
+    assert registry.expire(now=25.0) == [] and len(registry._deadlines) == 1, \
+        f"Expected one heap entry for d: {registry._deadlines}"
+
+    print("[OK] Robot registry test passed!")
+
+def test_discovery_parse_cache():
+    """Test repeat DISCOVER payloads are recognised from the receive buffer"""
+    station = DriverStation(headless=True, discovery_port=0)
+    try:
+        buffer = bytearray(b"DISCOVER:Bot:10.0.0.5:4000:v2,estop-ack")
+        address = ('10.0.0.5', 4000)
+        parsed = station._parse_discovery(memoryview(buffer), address)
+        assert parsed == ("Bot", "10.0.0.5", 4000, frozenset({"v2", "estop-ack"})), f"Bad parse: {parsed}"
+        assert station._parse_discovery(memoryview(buffer), address) is parsed, "A repeat should hit the cache"
+
+        buffer[-1:] = b"X"  # the next datagram reuses the buffer
+        assert "estop-acX" in station._parse_discovery(memoryview(buffer), address)[3], "Changed payload"
+        assert station._parse_discovery(memoryview(b"DISCOVER:Bot"), address) is None, "Too short"
+        assert station._parse_discovery(memoryview(b"HELLO"), address) is None
+    finally:
+        station.shutdown()
+
+    print("[OK] Discovery parse cache test passed!")
+
+def test_estop_ack_sender():
+    """Test e-stop acks only count when they come from the robot they name"""
+    station = DriverStation(headless=True, discovery_port=0)
+    try:
+        # Discovery replies and e-stops go to a discard port nobody listens on
+        station._handle_datagram(memoryview(b"DISCOVER:AckBot:127.0.0.1:9:estop-ack"), ('127.0.0.1', 9))
+        station.set_emergency_stop(True)
+        ack = memoryview(f"ESTOP_ACK:AckBot:{station.estop.sequence}".encode())
+        station._handle_datagram(ack, ('10.9.9.9', 9))
+        assert station.estop.acks["AckBot"].latency_s is None, "An ack from another host should be ignored"
+        station._handle_datagram(ack, ('127.0.0.1', station.robots["AckBot"].port))
+        assert station.estop.acks["AckBot"].latency_s is not None, "The robot's own ack should count"
+    finally:
+        station.shutdown()
+
+    print("[OK] E-stop ack sender test passed!")
+
+def test_hit_grid_priority():
+    """Test that overlapping click regions resolve in registration order"""
+    grid = HitGrid(cell_size=50)
+    clicks = []
+    grid.add(pygame.Rect(0, 0, 100, 100), lambda pos: clicks.append("first") or pos[0] < 50)
+    grid.add(pygame.Rect(40, 40, 100, 100), lambda pos: clicks.append("second") or True)
+
+    assert grid.hit((45, 45)), "Click inside first region should be handled"
+    assert clicks == ["first"], f"First region should win: {clicks}"
+    assert grid.hit((60, 60)), "Declined click should fall through"
+    assert clicks[-1] == "second", f"Second region should get declined clicks: {clicks}"
+    assert not grid.hit((500, 500)), "Click outside every region should be unhandled"
+
+    print("[OK] Hit grid priority test passed!")
+
+def test_compact_robot_rows():
+    """Test a large fleet fits many rows whose click regions stay clear of the buttons"""
+    station = DriverStation(headless=True, discovery_port=0)
+    try:
+        assert VISIBLE_ROWS >= 10, f"Only {VISIBLE_ROWS} rows visible"
+        for i in range(64):
+            # Discovery replies go to a discard port nobody listens on
+            station._handle_datagram(memoryview(f"DISCOVER:bot{i:02d}:127.0.0.1:9".encode()), ('127.0.0.1', 9))
+        station._robots_state()
+        rows_bottom = LIST_TOP + VISIBLE_ROWS * ROW_PITCH
+        assert rows_bottom <= PAIR_BUTTON_RECT.top, "Rows overlap the pair button"
+
+        station._handle_mouse_click((100, LIST_TOP + 5 * ROW_PITCH + ROW_HEIGHT // 2))
+        assert station.selected_robot == "bot05", f"Wrong row selected: {station.selected_robot}"
+        station.selected_robot = None
+        station._handle_mouse_click((PAIR_BUTTON_RECT.left + 10, PAIR_BUTTON_RECT.top + 5))
+        station._handle_mouse_click((100, rows_bottom + 5))
+        assert station.selected_robot is None, "Clicks on the pair button or below the rows select no robot"
+    finally:
+        station.shutdown()
+
+    print("[OK] Compact robot rows test passed!")
+
+def test_headless_control_commands():
+    """Test discovery, pairing and teleop driven entirely by control commands"""
+    station = DriverStation(headless=True, discovery_port=0)
+    robot = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    robot.bind(('127.0.0.1', 0))
+    robot.settimeout(1.0)
+    command = None
+    try:
+        assert station.screen is None, "Headless station should not open a window"
+
+        # Handshake as a demo robot would
+        robot_port = robot.getsockname()[1]
+        discovery_address = ('127.0.0.1', station.udp_socket.getsockname()[1])
+        robot.sendto(f"DISCOVER:HeadlessBot:127.0.0.1:{robot_port}".encode(), discovery_address)
+        reply, _ = robot.recvfrom(1024)
+        assert reply.startswith(b"PORT:HeadlessBot:"), f"Unexpected reply: {reply}"
+        command_port = int(reply.split(b":")[2])
+
+        command = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        command.bind(('127.0.0.1', command_port))
+        command.settimeout(1.0)
+
+        assert execute_command(station, "axes 0 10 20 30 40 1").startswith("OK")
+        assert execute_command(station, "pair HeadlessBot 0").startswith("OK")
+        assert execute_command(station, "status teleop") == "OK status teleop"
+        assert execute_command(station, "pair NoSuchBot 0").startswith("ERR")
+        assert execute_command(station, "bogus").startswith("ERR")
+        assert "HeadlessBot" in execute_command(station, "robots")
+
+        # Status message first, then controller data from the transmit tick
+        status, _ = command.recvfrom(1024)
+        assert status == b"HeadlessBot:teleop", f"Unexpected status: {status}"
+        station._publish_controller_snapshots()
+        station._transmit_controller_data()
+        packet, _ = command.recvfrom(1024)
+        assert packet[16:24] == bytes([10, 20, 30, 40, 127, 127, 1, 0]), f"Bad packet: {packet}"
+    finally:
+        robot.close()
+        if command is not None:
+            command.close()
+        station.shutdown()
+
+    print("[OK] Headless control command test passed!")
+
+def test_protocol_v2_negotiation():
+    """Test v2 is offered only to robots that advertise it, and packets carry sequence numbers"""
+    station = DriverStation(headless=True, discovery_port=0)
+    robot = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    robot.bind(('127.0.0.1', 0))
+    robot.settimeout(1.0)
+    command = None
+    try:
+        address = robot.getsockname()
+        station._handle_datagram(memoryview(f"DISCOVER:OldBot:127.0.0.1:{address[1]}".encode()), address)
+        assert robot.recv(64).count(b":") == 2, "Robots without v2 get the plain PORT reply"
+        station._handle_datagram(memoryview(f"DISCOVER:NewBot:127.0.0.1:{address[1]}:v2".encode()),
+                                 address)
+        _, robot_id, port, version, slot = robot.recv(64).decode().split(":")
+        assert (robot_id, version) == ("NewBot", "v2"), f"Expected a v2 reply for {robot_id}"
+        assert int(slot) == station.robots["NewBot"].slot == int(port) - station.robots.ports.base
+
+        command = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        command.bind(('127.0.0.1', int(port)))
+        command.settimeout(1.0)
+        station.set_virtual_controller(0, 10, 20, 30, 40, 1)
+        station.pair("NewBot", 0)
+        station.set_game_status("teleop")
+        assert command.recv(64) == b"NewBot:teleop", "Status is unchanged in v2"
+
+        sequences = []
+        for left_x in (10, 90):
+            station.set_virtual_controller(0, left_x, 20, 30, 40, 1)
+            station._publish_controller_snapshots()
+            station._transmit_controller_data()
+            packet = command.recv(64)
+            assert len(packet) == 17 and packet[0] == 2, f"Expected a v2 packet: {packet}"
+            assert packet[1:3] == int(slot).to_bytes(2, "big"), "Packet should carry the slot"
+            assert packet[9:17] == bytes([left_x, 20, 30, 40, 127, 127, 1, 0]), f"Bad payload: {packet}"
+            sequences.append(int.from_bytes(packet[3:5], "big"))
+        assert sequences[1] == sequences[0] + 1, f"Sequence should advance per packet: {sequences}"
+    finally:
+        robot.close()
+        if command is not None:
+            command.close()
+        station.shutdown()
+
+    print("[OK] Protocol v2 negotiation test passed!")
+
+def test_unpair_closes_pooled_socket():
+    """Test unpairing releases the robot's connected socket"""
+    station = DriverStation(headless=True, discovery_port=0, connected_sockets=True)
+    discovery = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    discovery.bind(('127.0.0.1', 0))
+    discovery.settimeout(1.0)
+    try:
+        address = discovery.getsockname()
+        station._handle_datagram(memoryview(f"DISCOVER:PoolBot:127.0.0.1:{address[1]}".encode()), address)
+        discovery.recv(64)
+        station.set_virtual_controller(0, 0, 0, 0, 0)
+        station.pair("PoolBot", 0)
+        assert "PoolBot" in station.socket_pool, "Pairing should open a connected socket"
+        station.unpair("PoolBot")
+        assert "PoolBot" not in station.socket_pool, "Unpairing should close the connected socket"
+    finally:
+        discovery.close()
+        station.shutdown()
+
+    print("[OK] Unpair socket test passed!")
+
+def test_estop_bursts_and_cancel():
+    """Test e-stop is repeated in bursts and a release cancels pending repeats"""
+    # The robot's command socket takes a free port first and the station
+    # allocates from it, so the test never collides with fixed ports
+    command = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    command.bind(('127.0.0.1', 0))
+    command.settimeout(0.3)
+    station = DriverStation(headless=True, discovery_port=0, estop_bursts=3,
+                            command_port_base=command.getsockname()[1])
+    discovery = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    discovery.bind(('127.0.0.1', 0))
+    discovery.settimeout(1.0)
+    try:
+        address = discovery.getsockname()
+        station._handle_datagram(memoryview(f"DISCOVER:StopBot:127.0.0.1:{address[1]}".encode()), address)
+        command_port = int(discovery.recv(64).split(b":")[2])
+        assert command_port == command.getsockname()[1], "Station should allocate from the given base"
+
+        station.set_emergency_stop(True)
+        report = station.last_fanout
+        assert report.kind == "estop" and report.datagrams == 2, f"Unexpected first burst: {report}"
+        assert [command.recv(16) for _ in range(3)] == [b"ESTOP"] * 3, "Expected three e-stop bursts"
+        deadline = time.monotonic() + 1.0
+        while not report.done and time.monotonic() < deadline:
+            time.sleep(0.01)  # done once the timer finds no repeats left
+        assert report.done, "The fan-out should finish after its last burst"
+        assert report.bursts == 3 and report.last_datagram_s >= report.first_burst_s, "Bursts not recorded"
+
+        # Release right away: the pending ESTOP repeats must not re-engage the robot
+        station.set_emergency_stop(True)
+        station.set_emergency_stop(False)
+        received = []
+        try:
+            while True:
+                received.append(command.recv(16))
+        except socket.timeout:
+            pass
+        assert received[-1] == b"ESTOP_OFF", f"Release must be the last word: {received}"
+        assert received.count(b"ESTOP") == 1, f"Pending ESTOP bursts should be cancelled: {received}"
+    finally:
+        discovery.close()
+        command.close()
+        station.shutdown()
+
+    print("[OK] E-stop burst test passed!")
+
+if __name__ == "__main__":
+    print("Running driver station tests...\n")
+
+    test_transmit_scheduler_rate()
+    test_controller_snapshot()
+    test_text_cache_lru()
+    test_port_allocator_reuses_released_ports()
+    test_robot_registry_indexes_and_expiry()
+    test_discovery_parse_cache()
+    test_estop_ack_sender()
+    test_hit_grid_priority()
+    test_compact_robot_rows()
+    test_headless_control_commands()
+    test_protocol_v2_negotiation()
+    test_unpair_closes_pooled_socket()
+    test_estop_bursts_and_cancel()
+
+    print("\n[SUCCESS] All driver station tests passed!")
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Tests for reliable e-stop delivery and acknowledgements
+"""
+
+import threading
+import time
+
+from demo_mode import SimulatedRobot
+from driver_station import DriverStation
+from estop import EstopTarget, ReliableEstop, parse_estop_ack
+from headless import execute_command
+from net_engine import TimerHandle
+
+class _ManualTimers:
+    """call_later stand-in that runs timers only when asked"""
+
+    def __init__(self):
+        self.delays = []
+        self.handles = []
+
+    def call_later(self, delay, callback):
+        handle = TimerHandle(delay, callback)
+        self.delays.append(delay)
+        self.handles.append(handle)
+        return handle
+
+    def fire(self):
+        handle = self.handles[-1]
+        if not handle.cancelled:
+            handle.callback()
+
+def test_resend_until_acknowledged():
+    """Test exponential resends stop per robot on ack, and stale acks are ignored"""
+    sent = []
+    timers = _ManualTimers()
+    estop = ReliableEstop(lambda messages: sent.append(messages) or len(messages), timers.call_later,
+                          legacy_sends=2, max_attempts=4, interval=0.02, max_interval=0.05)
+    targets = [
+        EstopTarget("acker", (("10.0.0.1", 1),), True),
+        EstopTarget("quiet", (("10.0.0.2", 1),), True),
+        EstopTarget("legacy", (("10.0.0.3", 1),), False),
+    ]
+    report = estop.engage(True, targets)
+    sequence = estop.sequence
+    assert sent[0] == [(f"ESTOP:{sequence}".encode(), ("10.0.0.1", 1)),
+                       (f"ESTOP:{sequence}".encode(), ("10.0.0.2", 1)),
+                       (b"ESTOP", ("10.0.0.3", 1))], f"Unexpected first round: {sent[0]}"
+    assert estop.pending == 2, "Both ack-capable robots should be pending"
+
+    assert estop.acknowledge("acker", sequence - 1) is None, "A stale ack must not count"
+    assert estop.acknowledge("acker", sequence) is not None, "A current ack should count"
+    assert estop.acknowledge("acker", sequence) is None, "Duplicate acks are ignored"
+    assert estop.acks["acker"].latency_s is not None and estop.pending == 1
+
+    for _ in range(4):
+        timers.fire()
+    assert [len(round_) for round_ in sent] == [3, 2, 1, 1], f"Unexpected rounds: {sent}"
+    assert timers.delays == [0.02, 0.04, 0.05, 0.05], f"Backoff should double, capped: {timers.delays}"
+    assert estop.acks["quiet"].gave_up and estop.pending == 0, "Silent robot should be given up on"
+    assert report.bursts == 4 and report.datagrams == 7, f"Report not updated: {report}"
+
+    # A new change supersedes the old one's pending resends
+    estop.engage(False, targets[1:2])
+    assert sent[-1] == [(f"ESTOP_OFF:{sequence + 1}".encode(), ("10.0.0.2", 1))]
+    assert "acker" not in estop.acks, "Acks are tracked per change"
+    superseded = timers.handles[-1]
+    estop.engage(True, targets[1:2])
+    assert superseded.cancelled, "Resends of a superseded change should be cancelled"
+
+    assert parse_estop_ack(b"ESTOP_ACK:bot:42") == ("bot", 42)
+    assert parse_estop_ack(b"ESTOP_ACK:bot:x") is None
+
+    print("[OK] E-stop resend test passed!")
+
+def test_simulated_robot_acknowledges():
+    """Test the station records ack latency from a simulated robot"""
+    station = DriverStation(headless=True, discovery_port=0)
+    robot = SimulatedRobot("AckBot", discovery_port=21400, verbose=False)
+    listener = threading.Thread(target=robot.listen_for_commands, daemon=True)
+    listener.start()
+    try:
+        station_address = ('127.0.0.1', station.udp_socket.getsockname()[1])
+        robot.discovery_socket.sendto(robot.discovery_message(), station_address)
+        deadline = time.monotonic() + 2.0
+        while robot.command_socket is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert robot.command_socket is not None, "Robot never got its command port"
+
+        station.set_emergency_stop(True)
+        deadline = time.monotonic() + 2.0
+        while station.estop.pending and time.monotonic() < deadline:
+            time.sleep(0.01)
+        ack = station.estop.acks.get("AckBot")
+        assert ack is not None and ack.latency_s is not None, f"No ack recorded: {ack}"
+        assert robot.emergency_stop and robot.estop_sequence == station.estop.sequence
+        assert "estop_ack=" in execute_command(station, "robots"), "Listing should show the ack"
+
+        # A release arriving before a delayed copy of the e-stop wins
+        robot.handle_packet(f"ESTOP_OFF:{station.estop.sequence + 2}".encode())
+        robot.handle_packet(f"ESTOP:{station.estop.sequence + 1}".encode())
+        assert not robot.emergency_stop, "An older e-stop must not override a newer release"
+    finally:
+        robot.stop()
+        station.shutdown()
+
+    print("[OK] Simulated robot acknowledgement test passed!")
+
+if __name__ == "__main__":
+    print("Running e-stop tests...\n")
+
+    test_resend_until_acknowledged()
+    test_simulated_robot_acknowledges()
+
+    print("\n[SUCCESS] All e-stop tests passed!")
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Tests for the NumPy fleet packet encoder
+"""
+
+import socket
+
+from driver_station import DriverStation
+from fleet import HAVE_NUMPY, FleetPackets
+from packets import ControllerPacket
+
+def test_fleet_matches_templates():
+    """Test fleet rows hold the same bytes as per-robot templates, across growth and reuse"""
+    if not HAVE_NUMPY:
+        print("[SKIP] NumPy not installed")
+        return
+
+    fleet = FleetPackets(capacity=2)
+    robot_ids = [f"robot{i}" for i in range(5)]
+    packets = [fleet.packet(robot_id) for robot_id in robot_ids]
+    assert len(fleet.records) >= 5, "Fleet should grow past its initial capacity"
+
+    values = [(i, 2 * i, 3 * i, 255 - i, 127, 127, i % 16, 0) for i in range(5)]
+    fleet.update(robot_ids, values)
+    for robot_id, packet, row_values in zip(robot_ids, packets, values):
+        expected = ControllerPacket(robot_id)
+        expected.update(row_values)
+        assert bytes(packet.buffer) == bytes(expected.buffer), f"Fleet row differs for {robot_id}"
+        assert fleet.packet(robot_id) is packet, "Packets should be stable per robot"
+
+    # A released row is reused with the new robot's name
+    fleet.release("robot1")
+    reused = fleet.packet("newbot")
+    assert bytes(reused.buffer) == bytes(ControllerPacket("newbot").buffer), "Reused row not reset"
+    assert bytes(packets[2].buffer[16:]) == bytes(values[2]), "Other rows must be untouched"
+
+    print("[OK] Fleet encoder test passed!")
+
+def test_fleet_transmit():
+    """Test the driver station's fleet path sends the same packets as the per-robot path"""
+    if not HAVE_NUMPY:
+        print("[SKIP] NumPy not installed")
+        return
+
+    received = {}
+    for fleet_encoder in (False, True):
+        station = DriverStation(headless=True, discovery_port=0, fleet_encoder=fleet_encoder)
+        robots = []
+        try:
+            for i in range(3):
+                discovery = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                discovery.bind(('127.0.0.1', 0))
+                discovery.settimeout(1.0)
+                address = discovery.getsockname()
+                station._handle_datagram(memoryview(f"DISCOVER:bot{i}:127.0.0.1:{address[1]}".encode()), address)
+                assigned = int(discovery.recv(64).decode().split(":")[2])
+                discovery.close()
+                # Listen on the assigned command port like the firmware does
+                robot = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                robot.bind(('127.0.0.1', assigned))
+                robot.settimeout(1.0)
+                robots.append(robot)
+                station.set_virtual_controller(i, 10 * i, 20 * i, 30, 40, i)
+                station.pair(f"bot{i}", i)
+            station.set_game_status("teleop")
+            for robot in robots:
+                assert robot.recv(64).endswith(b":teleop"), "Expected the game status first"
+            station._publish_controller_snapshots()
+            station._transmit_controller_data()
+            received[fleet_encoder] = [robot.recv(64) for robot in robots]
+        finally:
+            station.shutdown()
+            for robot in robots:
+                robot.close()
+
+    assert received[True] == received[False], "Fleet and per-robot encoders should send identical packets"
+    assert all(len(packet) == 24 for packet in received[True]), "Controller packets must be 24 bytes"
+
+    print("[OK] Fleet transmit test passed!")
+
+if __name__ == "__main__":
+    print("Running fleet encoder tests...\n")
+
+    test_fleet_matches_templates()
+    test_fleet_transmit()
+
+    print("\n[SUCCESS] All fleet encoder tests passed!")
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Tests for joystick input shaping
+"""
+
+import random
+
+from input_shaping import VECTORIZE_MIN_CONTROLLERS, AxisShaper, axis_byte, shape_axis
+
+def test_default_shaping_is_linear():
+    """Test that default shaping matches the original int((v + 1) * 127.5) mapping"""
+    shaper = AxisShaper()
+    assert shaper.lut == list(range(256)), "Default lookup table should be the identity"
+    for value in (-1.0, -0.5, -0.001, 0.0, 0.25, 0.999, 1.0, 1.5, -1.5):
+        expected = max(0, min(255, int((value + 1.0) * 127.5)))
+        assert shaper.shape((value,) * 4) == (expected,) * 4, f"Linear mapping differs at {value}"
+
+    print("[OK] Default shaping test passed!")
+
+def test_deadband_expo_and_calibration():
+    """Test deadband, expo and offsets shape the stick response"""
+    assert shape_axis(0.05, deadband=0.1) == 0.0, "Inside the deadband should read zero"
+    assert shape_axis(1.0, deadband=0.1, expo=0.5) == 1.0, "Full deflection should stay full scale"
+    assert abs(abs(shape_axis(-0.55, deadband=0.1)) - 0.5) < 1e-9, "Deadband should rescale remaining travel"
+    assert 0 < shape_axis(0.5, expo=1.0) < 0.5, "Expo should soften the response near center"
+
+    shaper = AxisShaper(deadband=0.1, expo=0.3, offsets=(0.05, 0.0, 0.0, -0.05))
+    assert shaper.shape((-0.05, 0.08, -0.08, 0.05)) == (127,) * 4, "Small readings should center"
+    assert shaper.shape((1.0, -1.0, 1.0, -1.0)) == (255, 0, 255, 0), "Extremes should be preserved"
+    assert axis_byte(shape_axis(0.3, 0.1, 0.3)) == shaper.lut[axis_byte(0.3)], "LUT should match the curve"
+
+    print("[OK] Deadband, expo and calibration test passed!")
+
+def test_vectorized_matches_scalar():
+    """Test that shaping many controllers at once equals shaping each one"""
+    rng = random.Random(3)
+    shaper = AxisShaper(deadband=0.08, expo=0.4, offsets=(0.02, -0.01, 0.0, 0.03))
+    rows = [tuple(rng.uniform(-1.1, 1.1) for _ in range(4)) for _ in range(VECTORIZE_MIN_CONTROLLERS * 4)]
+    assert shaper.shape_many(rows) == [shaper.shape(row) for row in rows], \
+        "Vectorized and scalar shaping should agree"
+
+    print("[OK] Vectorized shaping test passed!")
+
+if __name__ == "__main__":
+    print("Running input shaping tests...\n")
+
+    test_default_shaping_is_linear()
+    test_deadband_expo_and_calibration()
+    test_vectorized_matches_scalar()
+
+    print("\n[SUCCESS] All input shaping tests passed!")
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Tests for controller input sources
+"""
+
+import io
+import math
+import os
+import socket
+import tempfile
+import time
+
+import pygame
+
+from driver_station import DriverStation
+from input_sources import (CIRCLE, CROSS, InputSample, PygameInput, StdinInput, TraceInput, UdpInput,
+                           WaveformInput, parse_feed_line, parse_input_spec)
+
+class _StubJoystick:
+    """Stands in for pygame.joystick.Joystick, which needs real hardware"""
+
+    def __init__(self, index):
+        self.index = index
+
+    def init(self):
+        pass
+
+    def get_instance_id(self):
+        return 100 + self.index
+
+    def get_name(self):
+        return f"Stub {self.index}"
+
+    def get_numaxes(self):
+        return 6
+
+    def get_axis(self, axis):
+        return 0.0
+
+    def get_numbuttons(self):
+        return 12
+
+    def get_button(self, button):
+        return 0
+
+def _stub_joysticks(count):
+    """Swap pygame's joystick module for count stub joysticks; returns an undo"""
+    saved = (pygame.joystick.Joystick, pygame.joystick.get_count, pygame.joystick.init, pygame.joystick.quit)
+    pygame.joystick.Joystick = _StubJoystick
+    pygame.joystick.get_count = lambda: count
+    pygame.joystick.init = pygame.joystick.quit = lambda: None
+
+    def restore():
+        (pygame.joystick.Joystick, pygame.joystick.get_count,
+         pygame.joystick.init, pygame.joystick.quit) = saved
+    return restore
+
+def _axis_event(instance_id, axis, value):
+    return pygame.event.Event(pygame.JOYAXISMOTION, instance_id=instance_id, axis=axis, value=value)
+
+def test_waveforms():
+    """Test scripted waveforms hit their expected values and stay in range"""
+    sine = WaveformInput("sine", controllers=2, period=4.0)
+    assert sine.open() == ["Sine 0", "Sine 1"]
+    sine.poll(100.0)
+    first, second = sine.poll(101.0)  # a quarter period in
+    assert math.isclose(first.axes[0], 1.0), f"Sine should peak a quarter period in: {first}"
+    assert math.isclose(first.axes[1], 0.0, abs_tol=1e-9), "Axes should be offset in phase"
+    assert math.isclose(second.axes[0], -1.0), "Controllers should be offset in phase"
+    assert first.buttons == CROSS and second.buttons == 0
+
+    step = WaveformInput("step", period=1.0, amplitude=0.5)
+    step.poll(0.0)
+    assert step.poll(0.25)[0].axes[0] == 0.5 and step.poll(0.75)[0].axes[0] == -0.5
+
+    walks = []
+    for _ in range(2):
+        walk = WaveformInput("random", controllers=3, seed=7)
+        walks.append([walk.poll(i / 100) for i in range(500)])
+    assert walks[0] == walks[1], "A seeded random walk should repeat"
+    values = [axis for samples in walks[0] for sample in samples for axis in sample.axes]
+    assert all(-1.0 <= value <= 1.0 for value in values) and len(set(values)) > 100
+
+    print("[OK] Waveform test passed!")
+
+def test_trace_record_and_playback():
+    """Test a station's input trace plays back the same readings"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "match.trace")
+        station = DriverStation(headless=True, discovery_port=0,
+                                inputs=[WaveformInput("sine", controllers=2, period=0.5)], input_trace=path)
+        try:
+            assert sorted(station.controllers) == [0, 1]
+            recorded = []
+            for _ in range(5):
+                station._update_controllers()
+                recorded.append(station.controllers[1].snapshot())
+                time.sleep(0.01)
+            try:
+                station.set_virtual_controller(0, 1, 2, 3, 4)
+                assert False, "Controllers owned by a source should reject virtual input"
+            except ValueError:
+                pass
+        finally:
+            station.shutdown()
+
+        trace = TraceInput(path, speed=1000.0)
+        assert trace.open() == ["Trace 0", "Trace 1"]
+        assert len(trace.samples) == 10
+        station = DriverStation(headless=True, discovery_port=0, inputs=[TraceInput(path, speed=1000.0)])
+        try:
+            station._update_controllers()  # starts the clock on the first sample
+            time.sleep(0.01)
+            station._update_controllers()  # a millisecond of trace is the whole match
+            assert station.controllers[1].snapshot() == recorded[-1], "Playback should end on the last reading"
+        finally:
+            station.shutdown()
+
+        looped = TraceInput(path, loop=True)
+        looped.open()
+        duration = looped.samples[-1][0]
+        looped.poll(0.0)
+        assert looped.poll(duration * 1000.5)[0] is not None, "A looped trace should keep producing"
+
+    print("[OK] Trace record and playback test passed!")
+
+def test_feeds():
+    """Test UDP and stdin feeds keep the newest reading per controller"""
+    assert parse_feed_line("1 0.5 -2 0 0 0x5 -1 3") == \
+        (1, InputSample((0.5, -1.0, 0.0, 0.0), (-1.0, 1.0), 5)), "Axes and triggers clamp, buttons take hex"
+
+    feed = UdpInput(2, port=0)
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sender.sendto(b"0 0.1 0 0 0\n0 0.2 0 0 0\nbogus\n", feed.address)
+        sender.sendto(b"5 0 0 0 0", feed.address)
+        time.sleep(0.05)
+        samples = feed.poll(0.0)
+        assert samples[0].axes[0] == 0.2 and samples[1] is None, f"Unexpected samples: {samples}"
+        assert feed.errors == 2, "Malformed lines and unknown controllers are counted"
+        assert feed.poll(0.1) == [None, None], "Readings are only reported once"
+    finally:
+        sender.close()
+        feed.close()
+
+    # Non-finite values would crash axis_byte in the input loop
+    for line in ("0 0 0 0 0 0 nan 0", "0 0 0 0 0 0 0 inf", "0 nan 0 0 0"):
+        feed.feed(line)
+    assert feed.errors == 5 and feed.poll(0.2) == [None, None], "nan and inf should be counted and ignored"
+
+    stdin = StdinInput(1, io.StringIO("0 1 1 -1 -1 1\n"))
+    stdin.open()
+    stdin._thread.join(timeout=1.0)
+    assert stdin.poll(0.0) == [InputSample((1.0, 1.0, -1.0, -1.0), None, CROSS)]
+
+    assert isinstance(parse_input_spec("random:8:0.5"), WaveformInput)
+    for spec in ("sine", "udp:x", "joystick"):
+        try:
+            parse_input_spec(spec)
+            assert False, f"'{spec}' should be rejected"
+        except ValueError:
+            pass
+
+    # An idle UI must still poll sources that do not post pygame events
+    station = DriverStation(headless=True, discovery_port=0, inputs=[WaveformInput("sine")], input_rate=100.0)
+    try:
+        assert station._idle_timeout_ms() == 10, "Idle waits should not outlast the input period"
+    finally:
+        station.shutdown()
+
+    print("[OK] Feed test passed!")
+
+def test_joystick_events():
+    """Test joystick events coalesce per joystick and idle joysticks are skipped"""
+    restore = _stub_joysticks(2)
+    try:
+        joysticks = PygameInput()
+        assert joysticks.open() == ["Stub 0", "Stub 1"]
+        assert joysticks.poll(0.0)[0] is not None, "The first poll reports the initial reading"
+        assert joysticks.poll(0.0) == [None, None], "Joysticks that did not move are skipped"
+
+        for value in (0.1, 0.2, 0.3):
+            assert joysticks.handle_event(_axis_event(100, 0, value))
+        joysticks.handle_event(_axis_event(100, 5, 1.0))
+        joysticks.handle_event(pygame.event.Event(pygame.JOYBUTTONDOWN, instance_id=100, button=1))
+        first, second = joysticks.poll(0.1)
+        assert first == InputSample((0.3, 0.0, 0.0, 0.0), (0.0, 1.0), CIRCLE), f"Unexpected sample: {first}"
+        assert second is None and joysticks.events == 5
+        joysticks.handle_event(pygame.event.Event(pygame.JOYBUTTONUP, instance_id=100, button=1))
+        assert joysticks.poll(0.2)[0].buttons == 0
+        assert not joysticks.handle_event(_axis_event(999, 0, 1.0)), "Unknown joysticks are not claimed"
+
+        # The input thread pumps the events posted to the queue on its own
+        station = DriverStation(headless=True, discovery_port=0, inputs=[PygameInput()],
+                                input_thread=True, input_rate=500.0)
+        try:
+            station.input_scheduler.start()
+            pygame.event.post(_axis_event(101, 2, 1.0))
+            deadline = time.monotonic() + 1.0
+            while station.controller_snapshots[1].right_x == 127 and time.monotonic() < deadline:
+                time.sleep(0.005)
+            assert station.controller_snapshots[1].right_x == 255, \
+                f"The input thread should publish the reading: {station.controller_snapshots[1]}"
+        finally:
+            station.shutdown()
+
+        # The idle UI wait must not take joystick events from the input thread
+        station = DriverStation(headless=True, discovery_port=0, inputs=[PygameInput()],
+                                input_thread=True)
+        try:
+            pygame.event.clear()
+            pygame.event.post(_axis_event(100, 0, 1.0))
+            started = time.monotonic()
+            station._wait_for_activity(50)
+            assert time.monotonic() - started >= 0.04, "Joystick events should not end the idle wait"
+            assert pygame.event.peek(pygame.JOYAXISMOTION), "The joystick event should stay queued"
+            assert not station._pending_events, "The UI loop should not hold joystick events"
+            pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_1))
+            started = time.monotonic()
+            station._wait_for_activity(1000)
+            assert time.monotonic() - started < 0.5, "UI events should end the idle wait"
+            pygame.event.clear()
+        finally:
+            station.shutdown()
+    finally:
+        restore()
+
+    print("[OK] Joystick event test passed!")
+
+if __name__ == "__main__":
+    print("Running input source tests...\n")
+
+    test_waveforms()
+    test_trace_record_and_playback()
+    test_feeds()
+    test_joystick_events()
+
+    print("\n[SUCCESS] All input source tests passed!")
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Tests for the multi-robot load generator
+"""
+
+import asyncio
+
+from driver_station import DriverStation
+from headless import execute_command
+from load_generator import LoadGenerator, percentile
+
+def test_percentile():
+    """Test nearest-rank percentiles"""
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50, "p50 of 1..100 should be 50"
+    assert percentile(values, 99) == 99, "p99 of 1..100 should be 99"
+    assert percentile(values, 100) == 100, "p100 should be the maximum"
+    assert percentile([7], 99.9) == 7, "Single sample is every percentile"
+    assert percentile([], 50) is None, "Empty sample has no percentile"
+
+    print("[OK] Percentile test passed!")
+
+def test_load_generator_handshakes():
+    """Test that every simulated robot completes the PORT handshake and gets data"""
+    station = DriverStation(headless=True, discovery_port=0)
+    try:
+        target = ('127.0.0.1', station.udp_socket.getsockname()[1])
+        generator = LoadGenerator(20, target=target, discovery_interval=0.2, port_base=21000)
+
+        async def drive():
+            run = asyncio.ensure_future(generator.run(1.0))
+            await asyncio.sleep(0.5)
+            # Pair one robot and stream controller data to it
+            execute_command(station, "axes 0 1 2 3 4")
+            execute_command(station, "pair Sim000 0")
+            execute_command(station, "status teleop")
+            for i in range(10):
+                execute_command(station, "axes 0 %d 2 3 4" % (10 + 10 * i))
+                station._publish_controller_snapshots()
+                station._transmit_controller_data()
+                await asyncio.sleep(0.02)
+            return await run
+
+        report = asyncio.run(drive())
+    finally:
+        station.shutdown()
+
+    assert report["connected_robots"] == 20, f"Expected 20 robots connected: {report['connected_robots']}"
+    assert report["handshake_latency_s"]["p99"] < 0.1, "Loopback handshake should be fast"
+    packets = {entry["robot_id"]: entry["controller_packets"] for entry in report["per_robot"]}
+    assert packets["Sim000"] >= 1, "Paired robot should receive controller data"
+    assert packets["Sim001"] == 0, "Unpaired robot should not receive controller data"
+
+    print("[OK] Load generator handshake test passed!")
+
+if __name__ == "__main__":
+    print("Running load generator tests...\n")
+
+    test_percentile()
+    test_load_generator_handshakes()
+
+    print("\n[SUCCESS] All load generator tests passed!")
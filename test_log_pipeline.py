@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Tests for the queued, rate-limited log pipeline
+"""
+
+import io
+import logging
+
+from driver_station import DriverStation
+from headless import execute_command
+from log_pipeline import LogPipeline, get_logger
+
+def test_rate_limit_and_sample():
+    """Test throttled call sites are cut down and report what they suppressed"""
+    stream = io.StringIO()
+    logs = LogPipeline("DEBUG", stream=stream)
+    logs.start()
+    log = get_logger("test")
+    try:
+        for i in range(50):
+            log.debug("flood %d", i, extra={"rate_limit": 1})
+        for i in range(30):
+            log.debug("sampled %d", i, extra={"sample": 10})
+        log.debug("other site", extra={"rate_limit": 1})
+        log.info("plain", extra={"fields": {"robot": "bot1", "port": 5001}})
+    finally:
+        logs.stop()
+    lines = stream.getvalue().splitlines()
+
+    assert sum("flood" in line for line in lines) == 1, f"Rate limit not applied: {lines}"
+    assert any("other site" in line for line in lines), "Call sites should be limited separately"
+    assert sum("sampled" in line for line in lines) == 3, f"Sampling not applied: {lines}"
+    assert any("(9 similar suppressed)" in line for line in lines), "Sampled lines should count skips"
+    assert lines[-1].endswith("plain robot=bot1 port=5001"), f"Fields not formatted: {lines[-1]}"
+
+    print("[OK] Rate limit and sample test passed!")
+
+def test_full_queue_drops_instead_of_blocking():
+    """Test a full queue drops records and counts them"""
+    logs = LogPipeline("INFO", queue_size=4, stream=io.StringIO())
+    log = get_logger("test")
+    # Attach without starting the writer, so nothing drains the queue
+    logging.getLogger("minibot").addHandler(logs.handler)
+    logging.getLogger("minibot").setLevel(logging.INFO)
+    try:
+        for i in range(10):
+            log.info("record %d", i)
+    finally:
+        logging.getLogger("minibot").removeHandler(logs.handler)
+    assert logs.queue.qsize() == 4 and logs.dropped == 6, f"Expected 6 drops, got {logs.dropped}"
+
+    print("[OK] Bounded queue test passed!")
+
+def test_runtime_level_change():
+    """Test the level can be changed from the headless console and the L key cycle"""
+    station = DriverStation(headless=True, discovery_port=0, log_level="WARNING")
+    try:
+        assert not get_logger("net").isEnabledFor(logging.DEBUG)
+        assert execute_command(station, "log debug") == "OK log debug"
+        assert get_logger("net").isEnabledFor(logging.DEBUG), "Level change should reach child loggers"
+        assert station.set_log_level(None) == "WARNING", "Cycling should step past DEBUG"
+        assert execute_command(station, "log loud").startswith("ERR"), "Unknown levels are rejected"
+    finally:
+        station.shutdown()
+
+    print("[OK] Runtime level change test passed!")
+
+if __name__ == "__main__":
+    print("Running log pipeline tests...\n")
+
+    test_rate_limit_and_sample()
+    test_full_queue_drops_instead_of_blocking()
+    test_runtime_level_change()
+
+    print("\n[SUCCESS] All log pipeline tests passed!")
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Tests for the event-driven network engine
+"""
+
+import socket
+import threading
+import time
+
+from net_engine import DatagramFanOut, DatagramReceiver, NetworkEngine, SocketPool
+
+def _start(engine):
+    thread = threading.Thread(target=engine.run, daemon=True)
+    thread.start()
+    return thread
+
+def _stop(engine, thread):
+    engine.stop()
+    thread.join(timeout=1.0)
+    engine.close()
+    assert not thread.is_alive(), "Engine thread should exit after stop()"
+
+def test_timers_fire_in_order():
+    """Test that timers fire by deadline, and cancelled timers never fire"""
+    engine = NetworkEngine()
+    fired = []
+    engine.call_later(0.06, lambda: fired.append("late"))
+    engine.call_later(0.02, lambda: fired.append("early"))
+    engine.call_later(0.04, lambda: fired.append("cancelled")).cancel()
+
+    thread = _start(engine)
+    time.sleep(0.15)
+    _stop(engine, thread)
+
+    assert fired == ["early", "late"], f"Unexpected timer order: {fired}"
+
+    print("[OK] Timer ordering test passed!")
+
+def test_timer_added_from_other_thread_wakes_loop():
+    """Test that scheduling an earlier timer interrupts a blocking select"""
+    engine = NetworkEngine()
+    fired = threading.Event()
+    thread = _start(engine)
+    time.sleep(0.05)  # engine is now blocked with no timeout
+
+    start = time.monotonic()
+    engine.call_later(0.01, fired.set)
+    assert fired.wait(0.5), "Timer scheduled from another thread did not fire"
+    assert time.monotonic() - start < 0.2, "Loop was not woken promptly"
+
+    _stop(engine, thread)
+
+    print("[OK] Cross-thread wakeup test passed!")
+
+def test_reader_drains_burst():
+    """Test that a reader sees every datagram of a burst"""
+    engine = NetworkEngine()
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(('127.0.0.1', 0))
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    received = []
+
+    def on_readable(sock):
+        while True:
+            try:
+                received.append(sock.recv(64))
+            except BlockingIOError:
+                return
+
+    engine.add_reader(receiver, on_readable)
+    thread = _start(engine)
+
+    for i in range(50):
+        sender.sendto(b"packet%d" % i, receiver.getsockname())
+    deadline = time.monotonic() + 1.0
+    while len(received) < 50 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    _stop(engine, thread)
+    receiver.close()
+    sender.close()
+
+    assert len(received) == 50, f"Expected 50 datagrams, got {len(received)}"
+
+    print("[OK] Reader burst drain test passed!")
+
+def _check_receiver(use_recvmmsg):
+    receiver_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver_sock.bind(('127.0.0.1', 0))
+    receiver_sock.setblocking(False)
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sender.bind(('127.0.0.1', 0))
+
+    # Fewer slots than datagrams so the ring wraps within one drain
+    receiver = DatagramReceiver(receiver_sock, slots=8, slot_size=64, use_recvmmsg=use_recvmmsg)
+    for i in range(20):
+        sender.sendto(b"DISCOVER:Robot%d:127.0.0.1" % i, receiver_sock.getsockname())
+    time.sleep(0.05)
+
+    received = []
+    handled = receiver.drain(lambda view, addr: received.append((bytes(view), addr)), 100)
+
+    assert handled == 20, f"Expected 20 datagrams, got {handled}"
+    assert received[0][0] == b"DISCOVER:Robot0:127.0.0.1", f"Bad payload: {received[0][0]}"
+    assert received[19][0] == b"DISCOVER:Robot19:127.0.0.1", f"Bad payload: {received[19][0]}"
+    assert received[0][1] == sender.getsockname(), f"Bad source address: {received[0][1]}"
+    assert receiver.drain(lambda view, addr: None, 100) == 0, "Socket should be empty"
+
+    receiver_sock.close()
+    sender.close()
+    return receiver
+
+def test_receiver_recv_into():
+    """Test draining a burst through recvfrom_into slots"""
+    receiver = _check_receiver(use_recvmmsg=False)
+    assert not receiver.uses_recvmmsg, "recvmmsg should be disabled"
+
+    print("[OK] recv_into receiver test passed!")
+
+def test_receiver_recvmmsg():
+    """Test draining a burst with recvmmsg (falls back off Linux)"""
+    _check_receiver(use_recvmmsg=True)
+
+    print("[OK] recvmmsg receiver test passed!")
+
+def test_socket_pool_connected_send():
+    """Test connected per-robot sockets deliver data and report unreachable robots"""
+    robot = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    robot.bind(('127.0.0.1', 0))
+    robot.settimeout(1.0)
+    closed = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    closed.bind(('127.0.0.1', 0))
+    closed_address = closed.getsockname()
+    closed.close()  # nothing listens here, so the kernel answers with ICMP unreachable
+
+    pool = SocketPool()
+    try:
+        sock = pool.open("bot", robot.getsockname())
+        assert pool.open("bot", robot.getsockname()) is sock, "Same address should reuse the socket"
+        assert pool.send("bot", b"hello"), "Send on a connected socket should succeed"
+        assert robot.recv(64) == b"hello", "Robot should receive the datagram"
+        assert not pool.send("missing", b"x"), "Unknown robots have no socket"
+
+        pool.open("gone", closed_address)
+        for _ in range(5):
+            pool.send("gone", b"ping")
+            time.sleep(0.01)
+        assert pool.unreachable.get("gone", 0) >= 1, "ICMP unreachable should surface per robot"
+        assert "bot" not in pool.unreachable, "Other robots are unaffected"
+
+        pool.close("gone")
+        assert "gone" not in pool and len(pool) == 1, "Closed robot should leave the pool"
+    finally:
+        pool.close_all()
+        robot.close()
+
+    print("[OK] Socket pool test passed!")
+
+def test_fanout_batches_and_skips_bad_destinations():
+    """Test fan-out delivers every datagram, with and without sendmmsg"""
+    receivers = []
+    for _ in range(3):
+        receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        receiver.bind(('127.0.0.1', 0))
+        receiver.settimeout(1.0)
+        receivers.append(receiver)
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sender.setblocking(False)
+    try:
+        for use_sendmmsg in (True, False):
+            fanout = DatagramFanOut(sender, use_sendmmsg=use_sendmmsg)
+            messages = [(b"ESTOP", receiver.getsockname()) for receiver in receivers]
+            # An invalid destination in the middle must not stop the rest
+            messages.insert(1, (b"ESTOP", ('0.0.0.0', 0)))
+            assert fanout.send(messages) == 3, f"Three datagrams should leave (sendmmsg={use_sendmmsg})"
+            assert fanout.errors == 1, "The bad destination should be counted"
+            assert [r.recv(16) for r in receivers] == [b"ESTOP"] * 3, "Every robot should get the e-stop"
+    finally:
+        sender.close()
+        for receiver in receivers:
+            receiver.close()
+
+    print("[OK] Fan-out test passed!")
+
+if __name__ == "__main__":
+    print("Running network engine tests...\n")
+
+    test_timers_fire_in_order()
+    test_timer_added_from_other_thread_wakes_loop()
+    test_reader_drains_burst()
+    test_receiver_recv_into()
+    test_receiver_recvmmsg()
+    test_socket_pool_connected_send()
+    test_fanout_batches_and_skips_bad_destinations()
+
+    print("\n[SUCCESS] All network engine tests passed!")
@@ -5,6 +5,11 @@ Test script to verify the protocol implementation matches the minibot expectatio
 
 import struct
 
+from demo_mode import SimulatedRobot
+from packets import (CONTROLLER_PACKET_SIZE, V2_PACKET_SIZE, ControllerPacket, ControllerPacketV2,
+                     SendPolicy, controller_values, decode_v2, sequence_newer)
+from driver_station import ControllerSnapshot
+
 def test_controller_packet():
     """Test that controller packet format matches minibot.cpp expectations"""
     
@@ -62,6 +67,138 @@ def test_controller_packet():
     
     print("[OK] Controller packet format test passed!")
 
+def test_controller_packet_template():
+    """Test that the cached packet template matches the hand-built format"""
+    snapshot = ControllerSnapshot(index=0, left_x=100, left_y=150, right_x=200,
+                                  right_y=127, cross=True, square=True)
+    expected = (
+        "TestRobot".encode('utf-8')[:15].ljust(16, b'\x00') +
+        struct.pack('BBBBBB', 100, 150, 200, 127, 127, 127) +
+        struct.pack('BB', 0x05, 0)
+    )
+
+    packet = ControllerPacket("TestRobot")
+    assert len(packet.buffer) == CONTROLLER_PACKET_SIZE == 24, "Template should be 24 bytes"
+    packet.update(controller_values(snapshot))
+    assert bytes(packet.buffer) == expected, f"Template mismatch: {bytes(packet.buffer)}"
+
+    # Long names are truncated so the terminator survives
+    long_packet = ControllerPacket("ARobotNameThatIsTooLong")
+    assert long_packet.buffer[15] == 0, "Robot name must stay null-terminated"
+
+    print("[OK] Controller packet template test passed!")
+
+def test_controller_packet_v2():
+    """Test the v2 layout: version, slot, sequence, timestamp, all axes, buttons"""
+    snapshot = ControllerSnapshot(index=0, left_x=100, left_y=150, right_x=200, right_y=127,
+                                  left_trigger=0, right_trigger=255, cross=True, square=True)
+    packet = ControllerPacketV2("TestRobot", slot=258)
+    assert len(packet.buffer) == V2_PACKET_SIZE == 17, f"v2 packet should be 17 bytes, got {len(packet.buffer)}"
+
+    packet.update(controller_values(snapshot))
+    packet.stamp(12.345)
+    expected = (
+        struct.pack('!BHHI', 2, 258, 1, 12345) +
+        struct.pack('BBBBBB', 100, 150, 200, 127, 0, 255) +
+        struct.pack('BB', 0x05, 0)
+    )
+    assert bytes(packet.buffer) == expected, f"v2 packet mismatch: {bytes(packet.buffer)}"
+    assert decode_v2(packet.buffer) == (258, 1, 12345, (100, 150, 200, 127, 0, 255, 5, 0))
+
+    # Sequence numbers wrap at 16 bits and stay ordered across the wrap
+    packet.sequence = 0xFFFF
+    packet.stamp(13.0)
+    assert decode_v2(packet.buffer)[1] == 0, "Sequence should wrap to 0"
+    assert sequence_newer(0, 0xFFFF) and sequence_newer(5, 3), "Wrapped sequence should be newer"
+    assert not sequence_newer(3, 5) and not sequence_newer(5, 5), "Older or repeated sequence is stale"
+
+    assert decode_v2(ControllerPacket("TestRobot").buffer) is None, "v1 packets are not v2"
+    try:
+        ControllerPacketV2("TestRobot", slot=1 << 16)
+        assert False, "Slot ids are 16 bits"
+    except ValueError:
+        pass
+
+    print("[OK] Controller packet v2 test passed!")
+
+def test_simulated_robot_v2():
+    """Test the simulator accepts v2 from the PORT reply and drops reordered packets"""
+    robot = SimulatedRobot("TestRobot", open_sockets=False, verbose=False)
+    assert robot.discovery_message().endswith(b":estop-ack,v2"), robot.discovery_message()
+    assert robot.handle_packet(b"PORT:TestRobot:12346:v2:0") == "port"
+    assert robot.protocol == 2 and robot.slot == 0, "PORT reply should switch the robot to v2"
+
+    packet = ControllerPacketV2("TestRobot", slot=0)
+    packet.update((10, 20, 30, 40, 50, 60, 1, 0))
+    packet.stamp(1.0)
+    first = bytes(packet.buffer)
+    packet.update((11, 21, 31, 41, 51, 61, 0, 0))
+    packet.stamp(1.01)
+    second = bytes(packet.buffer)
+
+    assert robot.handle_packet(second) == "controller", "Newest packet should apply"
+    assert robot.handle_packet(first) is None, "Late packet should be dropped"
+    assert robot.axes == [11, 21, 31, 41, 51, 61] and robot.stale_packets == 1, f"Got {robot.axes}"
+    assert robot.handle_packet(ControllerPacketV2("Other", slot=1).buffer) is None, "Other slots ignored"
+
+    legacy = SimulatedRobot("TestRobot", open_sockets=False, verbose=False, protocol_v2=False)
+    assert legacy.handle_packet(b"PORT:TestRobot:12346") == "port" and legacy.protocol == 1
+
+    print("[OK] Simulated robot v2 test passed!")
+
+def test_simulated_robot_default_ports():
+    """Test robots built without a discovery port each get their own"""
+    robots = [SimulatedRobot(f"PortBot{i}", verbose=False) for i in range(2)]
+    try:
+        ports = [robot.discovery_port for robot in robots]
+        assert 0 not in ports and len(set(ports)) == 2, f"Robots share a discovery port: {ports}"
+        assert robots[0].discovery_message().endswith(f":{ports[0]}:estop-ack,v2".encode())
+    finally:
+        for robot in robots:
+            robot.stop()
+
+    print("[OK] Simulated robot default port test passed!")
+
+def test_send_policy():
+    """Test deadband, button and keepalive rules for controller packets"""
+    policy = SendPolicy(deadband=2, keepalive_interval=1.0)
+    packet = ControllerPacket("TestRobot")
+    idle = (127, 127, 127, 127, 127, 127, 0, 0)
+
+    assert policy.should_send(packet, idle, 0.0), "First packet should always send"
+    packet.mark_sent(idle, 0.0)
+    # The first packet is a change like any other and is repeated
+    for _ in range(3):
+        assert policy.should_send(packet, idle, 0.0), "First packet should be repeated"
+
+    assert not policy.should_send(packet, idle, 0.5), "Idle sticks should wait for keepalive"
+    assert not policy.should_send(packet, (129,) + idle[1:], 0.5), "Move within deadband should wait"
+    assert policy.should_send(packet, (130,) + idle[1:], 0.5), "Move beyond deadband should send"
+    assert policy.should_send(packet, idle[:6] + (1, 0), 0.5), "Button change should send"
+    packet.repeats = 0  # neither change was sent
+    assert policy.should_send(packet, idle, 1.0), "Keepalive should send unchanged data"
+    assert packet.saved_count == 2, f"Expected 2 saved packets, got {packet.saved_count}"
+
+    # Returning to neutral is never held back by the deadband
+    moved = (128,) + idle[1:]
+    packet.mark_sent(moved, 1.0)
+    assert policy.should_send(packet, idle, 1.1), "Return to neutral should send"
+
+    # The return to neutral is lost on the air: it is repeated on the next
+    # few ticks even though the values no longer change
+    packet.mark_sent(idle, 1.1)
+    repeats = [policy.should_send(packet, idle, 1.1 + tick * 0.02) for tick in range(1, 6)]
+    assert repeats == [True, True, True, False, False], f"Change should be repeated 3 times: {repeats}"
+
+    # Keepalive must stay below the firmware's 5 s command timeout
+    try:
+        SendPolicy(keepalive_interval=5.0)
+        assert False, "Keepalive at the firmware timeout should be rejected"
+    except ValueError:
+        pass
+
+    print("[OK] Send policy test passed!")
+
 def test_discovery_message():
     """Test discovery message format"""
     robot_id = "TestRobot"
@@ -89,6 +226,10 @@ def test_port_assignment():
     assert parts[0] == "PORT", "First part should be PORT"
     assert parts[1] == robot_id, f"Robot ID should be {robot_id}"
     assert int(parts[2]) == port, f"Port should be {port}"
+
+    # v2 robots get their slot after the port; minibot.cpp's atoi() stops at the colon
+    parts = f"PORT:{robot_id}:{port}:v2:0".split(":")
+    assert int(parts[2]) == port and parts[3] == "v2" and int(parts[4]) == 0, "Bad v2 PORT reply"
     
     print("[OK] Port assignment format test passed!")
 
@@ -141,6 +282,11 @@ if __name__ == "__main__":
     print("Running protocol compatibility tests...\n")
     
     test_controller_packet()
+    test_controller_packet_template()
+    test_controller_packet_v2()
+    test_simulated_robot_v2()
+    test_simulated_robot_default_ports()
+    test_send_policy()
     test_discovery_message()
     test_port_assignment()
     test_game_status()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Tests for replaying flight recorder sessions
+"""
+
+import tempfile
+import threading
+import time
+
+from demo_mode import SimulatedRobot
+from driver_station import DriverStation
+from flight_recorder import read_records
+from replay import Replayer, Session
+
+def _record_session(directory: str):
+    """A short match: two robots (one v1, one v2), driving, e-stop and release"""
+    station = DriverStation(headless=True, discovery_port=0, record_dir=directory, keepalive_interval=0.1)
+    robots = [SimulatedRobot("NewBot", discovery_port=21420, verbose=False),
+              SimulatedRobot("OldBot", discovery_port=21421, verbose=False,
+                             estop_acks=False, protocol_v2=False)]
+    try:
+        station_address = ('127.0.0.1', station.udp_socket.getsockname()[1])
+        for robot in robots:
+            threading.Thread(target=robot.listen_for_commands, daemon=True).start()
+            robot.discovery_socket.sendto(robot.discovery_message(), station_address)
+        # Wait for the PORT replies, so none is recorded after the first status
+        deadline = time.monotonic() + 2.0
+        while any(robot.assigned_port is None for robot in robots) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        for index, robot in enumerate(robots):
+            station.set_virtual_controller(index, 127, 127, 127, 127)
+            station.pair(robot.robot_id, index)
+        station.set_game_status("teleop")
+        for step in range(20):
+            # 3-count steps clear the default deadband; robot 1 mostly idles on keepalives
+            station.set_virtual_controller(0, 100 + step * 3, 127, 127, 127, int(step >= 10),
+                                           left_trigger=step)
+            station.set_virtual_controller(1, 127, 127 + step // 5, 127, 127)
+            station._publish_controller_snapshots()
+            station._transmit_controller_data()
+            time.sleep(0.01)
+        station.set_emergency_stop(True)
+        time.sleep(0.05)
+        station.set_emergency_stop(False)
+        station.set_game_status("standby")
+    finally:
+        for robot in robots:
+            robot.stop()
+        station.shutdown()
+
+def test_replay_matches_recording():
+    """Test a replay at full speed reproduces the recorded packet stream"""
+    with tempfile.TemporaryDirectory() as directory:
+        _record_session(directory)
+        session = Session(read_records(directory))
+        kinds = [event.kind for event in session.events]
+        assert kinds.count("status") == 2 and kinds.count("estop") == 3, f"Unexpected events: {kinds}"
+        assert set(session.robots) == {"NewBot", "OldBot"}
+
+        result = Replayer(read_records(directory), speed=None, port_base=21430,
+                          keepalive_interval=0.1).run()
+        assert result.mismatch is None, f"Streams differ at {result.mismatch}"
+        assert len(result.actual) > 20, f"Expected controller traffic: {len(result.actual)}"
+
+        # A station with a wider deadband sends less, which the comparison catches
+        result = Replayer(read_records(directory), speed=None, port_base=21430,
+                          keepalive_interval=0.1, deadband=10).run()
+        assert result.mismatch is not None, "A behaviour change should show up as a mismatch"
+
+    print("[OK] Replay comparison test passed!")
+
+def test_replay_speed():
+    """Test replay paces events at the requested multiple of real time"""
+    with tempfile.TemporaryDirectory() as directory:
+        _record_session(directory)
+        events = Session(read_records(directory)).events
+        recorded = events[-1].timestamp - events[0].timestamp
+        result = Replayer(read_records(directory), speed=2.0, port_base=21430,
+                          keepalive_interval=0.1).run()
+        assert result.mismatch is None, f"Streams differ at {result.mismatch}"
+        assert result.elapsed_s >= recorded / 2.0 * 0.9, \
+            f"Replay took {result.elapsed_s:.3f} s for {recorded:.3f} s recorded at 2x"
+
+    print("[OK] Replay speed test passed!")
+
+def test_replay_robot_timeout():
+    """Test a robot timing out mid-session is reproduced at any replay speed"""
+    with tempfile.TemporaryDirectory() as directory:
+        station = DriverStation(headless=True, discovery_port=0, record_dir=directory, robot_timeout=0.2)
+        try:
+            # Discovery replies go to a discard port nobody listens on
+            station._handle_datagram(memoryview(b"DISCOVER:Gone:127.0.0.1:9"), ('127.0.0.1', 9))
+            deadline = time.monotonic() + 2.0
+            while "Gone" in station.robots and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert "Gone" not in station.robots, "The robot should have timed out"
+            # Only a robot that arrives after the timeout inherits the released port
+            station._handle_datagram(memoryview(b"DISCOVER:Late:127.0.0.1:9"), ('127.0.0.1', 9))
+            gone_port = station.robots["Late"].port
+        finally:
+            station.shutdown()
+
+        session = Session(read_records(directory))
+        assert [e.data for e in session.emitted if e.destination == "Late"][0] == f"PORT:Late:{gone_port}".encode()
+        result = Replayer(read_records(directory), speed=None, port_base=21440, robot_timeout=0.2).run()
+        assert result.mismatch is None, f"Streams differ at {result.mismatch}"
+
+    print("[OK] Replay robot timeout test passed!")
+
+if __name__ == "__main__":
+    print("Running replay tests...\n")
+
+    test_replay_matches_recording()
+    test_replay_speed()
+    test_replay_robot_timeout()
+
+    print("\n[SUCCESS] All replay tests passed!")
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Tests for the copy-on-write state shared between threads
+"""
+
+import threading
+import time
+
+from driver_station import DriverStation
+from state_store import CopyOnWriteDict
+
+def test_copy_on_write_dict():
+    """Test that snapshots are stable while writers publish new versions"""
+    store = CopyOnWriteDict({"a": 1})
+    snapshot = store.snapshot()
+    store["b"] = 2
+    del store["a"]
+    assert dict(snapshot) == {"a": 1}, "An old snapshot must never change"
+    assert store == {"b": 2} and store.version == 2, "Writes should publish new versions"
+    assert store.pop("missing", None) is None and store.setdefault("b", 9) == 2, "dict semantics"
+
+    errors = []
+    stop = threading.Event()
+
+    def writer():
+        i = 0
+        while not stop.is_set():
+            store[i % 50] = i
+            store.pop((i + 25) % 50, None)
+            i += 1
+
+    def reader():
+        try:
+            while not stop.is_set():
+                for key, value in store.items():
+                    assert key is not None
+        except Exception as e:  # "dictionary changed size during iteration"
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer), threading.Thread(target=reader)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.3)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    assert not errors, f"Reader failed under churn: {errors[0]!r}"
+
+    print("[OK] Copy-on-write dict test passed!")
+
+def test_transmit_under_robot_churn():
+    """Test that transmit and UI reads survive robots joining, expiring and re-pairing"""
+    station = DriverStation(headless=True, discovery_port=0)
+    station.set_virtual_controller(0, 10, 20, 30, 40)
+    station.set_game_status("teleop")
+    errors = []
+    stop = threading.Event()
+
+    def churn():
+        i = 0
+        while not stop.is_set():
+            robot_id = f"churn{i % 40}"
+            # Discovery replies go to a discard port nobody listens on
+            station._handle_datagram(memoryview(f"DISCOVER:{robot_id}:127.0.0.1:9".encode()),
+                                     ('127.0.0.1', 9))
+            station.pair(robot_id, 0)
+            if i % 3 == 0:
+                station.robots.remove(f"churn{(i + 20) % 40}")
+                station.unpair(f"churn{(i + 20) % 40}")
+            i += 1
+
+    def transmit():
+        try:
+            while not stop.is_set():
+                station._transmit_controller_data()
+                ports = [info.port for info in station.robots.values()]
+                assert len(ports) == len(set(ports)), "Two robots share a command port"
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=churn), threading.Thread(target=transmit)]
+    try:
+        for thread in threads:
+            thread.start()
+        time.sleep(0.5)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+        station.shutdown()
+    assert not errors, f"Transmit failed under churn: {errors[0]!r}"
+
+    print("[OK] Transmit under churn test passed!")
+
+def test_publish_under_controller_inserts():
+    """Test that publishing snapshots survives the CLI adding virtual controllers"""
+    station = DriverStation(headless=True, discovery_port=0)
+    errors = []
+    stop = threading.Event()
+
+    def insert():
+        # What 'axes N ...' does from the CLI or control socket thread
+        for index in range(1000):
+            if stop.is_set():
+                return
+            station.set_virtual_controller(index, index % 256, 127, 127, 127)
+
+    def publish():
+        try:
+            while not stop.is_set():
+                station._publish_controller_snapshots()
+        except Exception as e:  # "dictionary changed size during iteration"
+            errors.append(e)
+
+    threads = [threading.Thread(target=insert), threading.Thread(target=publish)]
+    try:
+        for thread in threads:
+            thread.start()
+        threads[0].join()
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+        station.shutdown()
+    assert not errors, f"Publishing failed under inserts: {errors[0]!r}"
+    assert len(station.controllers) == 1000
+
+    print("[OK] Publish under controller inserts test passed!")
+
+if __name__ == "__main__":
+    print("Running state store tests...\n")
+
+    test_copy_on_write_dict()
+    test_transmit_under_robot_churn()
+    test_publish_under_controller_inserts()
+
+    print("\n[SUCCESS] All state store tests passed!")